@@ -0,0 +1,26 @@
+"""代理判定服务 API"""
+
+from fastapi import APIRouter, Request
+
+router = APIRouter(prefix="/api/judge", tags=["代理判定"])
+
+
+@router.get("", summary="回显请求来源和请求头")
+async def judge(request: Request) -> dict:
+    """
+    代理判定服务:原样返回服务端看到的来源 IP 和请求头,
+    验证器通过代理请求该接口,据此判断代理是否可用以及匿名度
+    
+    Returns:
+        来源 IP 和请求头
+        
+    Example Response:
+        {
+            "origin": "203.0.113.7",
+            "headers": {"host": "example.com:8000", "via": "1.1 squid", ...}
+        }
+    """
+    return {
+        "origin": request.client.host if request.client else "",
+        "headers": dict(request.headers),
+    }
@@ -1,9 +1,10 @@
 """代理查询 API"""
 
 from fastapi import APIRouter, HTTPException
-from typing import List
-from app.models import ProxyModel, ProxyStatsModel, ApiResponse
-from app.core.proxy_pool import proxy_pool
+from typing import List, Optional
+from app.models import ProxyModel, ProxyProtocol, ProxyStatsModel, ProxyStrategy, ApiResponse
+from app.core.proxy_pool import ProxyPoolSaturatedError, proxy_pool
+from app.core.attribute_index import make_filters
 from app.utils import log
 
 router = APIRouter(prefix="/api/proxy", tags=["代理管理"])
@@ -12,7 +13,11 @@ router = APIRouter(prefix="/api/proxy", tags=["代理管理"])
 @router.get("/list", response_model=ApiResponse, summary="获取代理列表")
 async def get_proxy_list(
     valid_only: bool = True,
-    limit: int = 100
+    limit: int = 100,
+    country: Optional[str] = None,
+    protocol: Optional[ProxyProtocol] = None,
+    anonymity: Optional[str] = None,
+    source: Optional[str] = None,
 ) -> ApiResponse:
     """
     获取代理列表
@@ -20,15 +25,20 @@ async def get_proxy_list(
     Args:
         valid_only: 是否只返回有效代理
         limit: 返回数量限制
+        country: 按国家/地区过滤(可选)
+        protocol: 按协议过滤(可选)
+        anonymity: 按匿名度过滤(可选)
+        source: 按来源过滤(可选)
         
     Returns:
         代理列表
     """
     try:
+        filters = make_filters(country=country, protocol=protocol, anonymity=anonymity, source=source)
         if valid_only:
-            proxies = proxy_pool.get_valid_proxies()
+            proxies = proxy_pool.get_valid_proxies(filters)
         else:
-            proxies = proxy_pool.get_all_proxies()
+            proxies = proxy_pool.get_all_proxies(filters)
         
         # 限制返回数量
         proxies = proxies[:limit]
@@ -44,15 +54,32 @@ async def get_proxy_list(
 
 
 @router.get("/random", response_model=ApiResponse, summary="获取随机代理")
-async def get_random_proxy() -> ApiResponse:
+async def get_random_proxy(
+    strategy: Optional[ProxyStrategy] = None,
+    country: Optional[str] = None,
+    protocol: Optional[ProxyProtocol] = None,
+    anonymity: Optional[str] = None,
+    source: Optional[str] = None,
+) -> ApiResponse:
     """
-    获取随机代理(速度最快的)
+    按选择策略获取代理
+    
+    Args:
+        strategy: 代理选择策略,默认使用配置的策略
+        country: 按国家/地区过滤(可选)
+        protocol: 按协议过滤(可选)
+        anonymity: 按匿名度过滤(可选)
+        source: 按来源过滤(可选)
     
     Returns:
         代理信息
     """
     try:
-        proxy = proxy_pool.get_random_proxy()
+        filters = make_filters(country=country, protocol=protocol, anonymity=anonymity, source=source)
+        try:
+            proxy = proxy_pool.get_random_proxy(strategy, filters=filters)
+        except ProxyPoolSaturatedError as e:
+            return ApiResponse(success=False, message=str(e), data=None)
         
         if not proxy:
             return ApiResponse(
@@ -92,6 +119,62 @@ async def get_proxy_stats() -> ApiResponse:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/sources", response_model=ApiResponse, summary="获取代理源产出统计")
+async def get_source_stats() -> ApiResponse:
+    """
+    获取各代理源的产出统计(原始代理数、有效率、抓取耗时、连续失败次数、代理平均存活时间等)
+    
+    共享代理池模式下只有维护进程抓取代理,统计数据以维护进程为准
+    
+    Returns:
+        代理源名称 -> 统计数据,按预期每秒有效代理数从高到低排列
+    """
+    try:
+        return ApiResponse(
+            success=True,
+            message="获取代理源统计成功",
+            data=proxy_pool.fetcher.sources.snapshot()
+        )
+    except Exception as e:
+        log.error(f"获取代理源统计失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/latency", response_model=ApiResponse, summary="获取代理分阶段耗时统计")
+async def get_latency_stats(limit: int = 100) -> ApiResponse:
+    """
+    获取各代理的分阶段耗时滚动百分位(连接、TLS 握手、首字节、传输,以及大响应的传输速率)
+    
+    数据来自验证和实际请求,只统计当前进程
+    
+    Args:
+        limit: 返回数量限制
+        
+    Returns:
+        代理列表,每项包含代理 ID、代理 URL 和各阶段的 p50/p90/p99
+    """
+    try:
+        result = []
+        for proxy in proxy_pool.get_valid_proxies():
+            if proxy.id not in proxy_pool.latency:
+                continue
+            result.append({
+                "id": proxy.id,
+                "proxy_url": proxy.proxy_url,
+                "phases": proxy_pool.latency.summary(proxy.id),
+            })
+            if len(result) >= limit:
+                break
+        return ApiResponse(
+            success=True,
+            message=f"获取到 {len(result)} 个代理的耗时统计",
+            data=result
+        )
+    except Exception as e:
+        log.error(f"获取耗时统计失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.delete("/{proxy_id}", response_model=ApiResponse, summary="删除代理")
 async def delete_proxy(proxy_id: str) -> ApiResponse:
     """
@@ -148,7 +231,7 @@ async def update_proxy_pool() -> ApiResponse:
 @router.get("/test-sources", response_model=ApiResponse, summary="测试所有代理源")
 async def test_proxy_sources() -> ApiResponse:
     """
-    测试所有配置的代理源,返回每个源能获取到的代理数量
+    测试所有配置的代理源,返回每个源能获取到的代理数量(缓存有效期内复用缓存的抓取结果)
     
     Returns:
         每个代理源及其获取到的代理数量
@@ -170,56 +253,50 @@ async def test_proxy_sources() -> ApiResponse:
         }
     """
     try:
-        from app.core.proxy_fetcher import ProxyFetcher
         import asyncio
         
         log.info("开始测试所有代理源...")
-        fetcher = ProxyFetcher()
+        fetcher = proxy_pool.fetcher
         
         results = []
         total_proxies = 0
         successful_sources = 0
         
-        # 测试每个代理源
-        for source in fetcher.PROXY_SOURCES:
-            try:
-                log.info(f"测试代理源: {source}")
-                
-                # 使用线程池执行同步调用
-                loop = asyncio.get_event_loop()
-                proxies = await loop.run_in_executor(
-                    None,
-                    fetcher._fetch_from_source,
-                    source
-                )
-                
-                count = len(proxies)
-                total_proxies += count
-                
-                if count > 0:
-                    successful_sources += 1
-                    results.append({
-                        "source": source,
-                        "count": count,
-                        "status": "success"
-                    })
-                    log.info(f"✓ {source}: 获取到 {count} 个代理")
-                else:
-                    results.append({
-                        "source": source,
-                        "count": 0,
-                        "status": "no_proxies"
-                    })
-                    log.warning(f"✗ {source}: 未获取到代理")
-                    
-            except Exception as e:
+        # 在抓取线程池中并发测试所有代理源(受单源超时限制)
+        outcomes = await asyncio.gather(
+            *(fetcher.fetch_source(source) for source in fetcher.PROXY_SOURCES),
+            return_exceptions=True
+        )
+        
+        for source, outcome in zip(fetcher.PROXY_SOURCES, outcomes):
+            if isinstance(outcome, Exception):
                 results.append({
                     "source": source,
                     "count": 0,
                     "status": "failed",
-                    "error": str(e)
+                    "error": str(outcome)
+                })
+                log.error(f"✗ {source}: 测试失败 - {outcome}")
+                continue
+            
+            count = len(outcome)
+            total_proxies += count
+            
+            if count > 0:
+                successful_sources += 1
+                results.append({
+                    "source": source,
+                    "count": count,
+                    "status": "success"
+                })
+                log.info(f"✓ {source}: 获取到 {count} 个代理")
+            else:
+                results.append({
+                    "source": source,
+                    "count": 0,
+                    "status": "no_proxies"
                 })
-                log.error(f"✗ {source}: 测试失败 - {e}")
+                log.warning(f"✗ {source}: 未获取到代理")
         
         # 按获取数量降序排序
         results.sort(key=lambda x: x["count"], reverse=True)
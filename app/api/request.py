@@ -1,8 +1,10 @@
 """代理请求 API"""
 
+from urllib.parse import urlsplit
 from fastapi import APIRouter, HTTPException
 from app.models import RequestModel, ResponseModel, ApiResponse
-from app.core.proxy_pool import proxy_pool
+from app.core.proxy_pool import ProxyPoolSaturatedError, proxy_pool
+from app.core.attribute_index import make_filters
 from app.core.request_handler import request_handler
 from app.utils import log
 
@@ -30,6 +32,9 @@ async def send_proxy_request(request: RequestModel) -> ApiResponse:
             - max_retries_per_proxy: 单个代理的最大重试次数 (可选,默认 3)
             - max_proxy_switches: 最大切换代理次数 (可选,默认 5)
             - retry_on_status_codes: 触发重试的状态码列表 (可选)
+            - proxy_strategy: 代理选择策略 (可选,默认使用配置的策略)
+            - session_id: 会话 ID (可选,同一会话固定使用同一个代理)
+            - proxy_country / proxy_protocol / proxy_anonymity / proxy_source: 代理属性过滤 (可选)
     
     Returns:
         响应数据
@@ -66,11 +71,30 @@ async def send_proxy_request(request: RequestModel) -> ApiResponse:
     try:
         log.info(f"收到代理请求: {request.method} {request.url}")
         
+        # 按目标站点记录代理表现,优先使用在该站点成功过的代理
+        host = urlsplit(request.url).hostname
+        filters = make_filters(
+            country=request.proxy_country,
+            protocol=request.proxy_protocol,
+            anonymity=request.proxy_anonymity,
+            source=request.proxy_source,
+        )
+        
         # 通过代理发送请求(带重试)
         response = await request_handler.send_request_with_retry(
             request=request,
-            get_proxy_func=proxy_pool.get_random_proxy,
-            mark_invalid_func=proxy_pool.mark_proxy_invalid
+            get_proxy_func=lambda: proxy_pool.acquire_proxy(
+                request.proxy_strategy, host, request.session_id, filters
+            ),
+            mark_invalid_func=proxy_pool.mark_proxy_invalid,
+            release_proxy_func=proxy_pool.release_proxy,
+            report_result_func=lambda proxy_id, success, latency, timings=None, size=0: proxy_pool.report_result(
+                proxy_id, success, latency, host, timings, size
+            ),
+            ban_proxy_func=(lambda proxy_id: proxy_pool.ban_proxy_for_host(proxy_id, host)) if host else None,
+            reject_proxy_func=(
+                (lambda proxy_id, latency: proxy_pool.report_host_rejection(proxy_id, host, latency)) if host else None
+            ),
         )
         
         return ApiResponse(
@@ -79,6 +103,11 @@ async def send_proxy_request(request: RequestModel) -> ApiResponse:
             data=response.model_dump()
         )
         
+    except ProxyPoolSaturatedError as e:
+        # 代理都已达到并发上限:不直接请求(会暴露服务器 IP),由调用方稍后重试
+        log.warning(f"代理请求被拒绝: {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        
     except Exception as e:
         log.error(f"代理请求失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -11,18 +11,66 @@ class Settings(BaseSettings):
     host: str = "0.0.0.0"
     port: int = 8000
     debug: bool = False
+    workers: int = 1  # uvicorn worker 进程数,大于 1 时建议使用 shared 代理池模式
     
     # 代理池配置
     proxy_pool_size: int = 100
     proxy_update_interval: int = 3600  # 秒
     proxy_validation_timeout: int = 10  # 秒
     proxy_validation_url: str = "https://httpbin.org/ip"
+    proxy_judge_url: str = ""  # 代理判定服务地址(如 http://公网地址:8000/api/judge),设置后代替验证地址并测定匿名度
+    proxy_real_ip: str = ""  # 本机公网 IP(用于识别透明代理),为空时直接请求判定服务获取
+    proxy_validation_concurrency: int = 10  # 完整验证并发数(自适应模式下为初始值)
+    proxy_validation_adaptive: bool = False  # 是否按事件循环延迟和本地错误率自适应调整验证并发(AIMD)
+    proxy_validation_max_concurrency: int = 200  # 自适应模式下的最大验证并发数
+    proxy_validation_max_loop_lag: float = 0.1  # 自适应模式下可接受的事件循环延迟(秒),超过时并发减半
+    proxy_prescreen_enabled: bool = True  # 是否先用 TCP 连接快速预筛候选代理,通过后再完整验证
+    proxy_prescreen_timeout: float = 2.0  # 预筛超时(秒)
+    proxy_prescreen_concurrency: int = 200  # 预筛并发数
+    proxy_prescreen_connect: bool = True  # 验证地址为 HTTPS 时,HTTP 代理预筛是否完成 CONNECT 握手
+    proxy_selection_strategy: str = "power_of_two"  # fastest/round_robin/weighted_random/power_of_two/least_in_flight/fast_handshake/high_throughput
+    proxy_max_in_flight: int = 10  # 单个代理同时处理的请求数上限,0 表示不限制
+    proxy_health_alpha: float = 0.3  # 健康评分 EWMA 平滑系数,越大越看重最近的结果
+    proxy_latency_window: int = 64  # 每个代理保留的分阶段耗时样本数(用于滚动百分位)
+    proxy_circuit_cooldown: int = 60  # 熔断初始冷却时间(秒),每次连续熔断翻倍
+    proxy_circuit_max_cooldown: int = 1800  # 熔断最长冷却时间(秒)
+    proxy_circuit_max_trips: int = 5  # 连续熔断次数上限,超过后代理被清理
+    proxy_circuit_half_open_ratio: float = 0.05  # 分配给半开代理试探的请求比例
+    proxy_circuit_probe_interval: int = 30  # 半开代理主动探测间隔(秒)
+    proxy_revalidate_interval: int = 1800  # 代理重新验证间隔(秒),成功率低的代理间隔更短
+    proxy_revalidate_rate: float = 1.0  # 滚动重新验证速率(个/秒)
+    proxy_revalidate_jitter: float = 0.2  # 重新验证间隔的随机抖动比例
+    proxy_negative_cache_enabled: bool = True  # 是否缓存最近失效的代理,抓取到时跳过验证
+    proxy_negative_cache_ttl: int = 1800  # 失效代理缓存时长(秒)
+    proxy_negative_cache_capacity: int = 200000  # 失效代理缓存每个时间桶的容量
+    proxy_negative_cache_error_rate: float = 0.01  # 失效代理缓存误判率(误判的代理会被跳过)
+    proxy_source_max_per_fetch: int = 5  # 每次抓取最多使用的代理源数
+    proxy_source_backoff: int = 60  # 代理源抓取失败后的初始退避时间(秒),连续失败翻倍
+    proxy_source_max_backoff: int = 3600  # 代理源最长退避时间(秒)
+    proxy_source_timeout: int = 30  # 单个代理源抓取超时(秒)
+    proxy_fetch_mode: str = "thread"  # thread: 在抓取线程池中抓取; process: 在独立子进程中抓取,解析开销不影响 API
+    proxy_fetch_workers: int = 8  # 同时抓取的代理源数(抓取线程数/子进程数)
+    proxy_fetch_cache_ttl: int = 300  # 代理源原始抓取结果缓存时长(秒),0 表示不缓存
+    proxy_fetch_cache_path: str = "data/fetch_cache.db"  # 抓取结果缓存 SQLite 文件路径,为空时只缓存在内存中
+    proxy_host_scoreboard_size: int = 50000  # 按站点记录的 (代理, 站点) 条目上限
+    proxy_host_scoreboard_hosts: int = 1024  # 记录最近成功代理的站点数上限
+    proxy_host_ban_duration: int = 600  # 代理被站点拒绝后在该站点的封禁时长(秒)
+    proxy_host_affinity_ratio: float = 0.8  # 优先使用在目标站点成功过的代理的请求比例
+    proxy_session_ttl: int = 600  # 会话固定代理的空闲过期时间(秒)
+    proxy_session_max: int = 10000  # 同时保留的会话数上限
+    proxy_snapshot_enabled: bool = True  # 是否持久化代理池快照,重启时热启动
+    proxy_snapshot_path: str = "data/proxyforge.db"  # 快照 SQLite 文件路径
+    proxy_snapshot_interval: int = 60  # 快照保存间隔(秒)
+    proxy_pool_mode: str = "standalone"  # standalone: 每个进程独立代理池; shared: 多进程共享代理池
+    proxy_shared_sync_interval: float = 2.0  # 共享模式下进程间同步间隔(秒)
     
     # 请求配置
     request_timeout: int = 30  # 秒
     request_max_retries: int = 3  # 已弃用,保留向后兼容
     request_max_retries_per_proxy: int = 3  # 单个代理重试次数
     request_max_proxy_switches: int = 5  # 最大切换代理次数
+    request_client_cache_size: int = 256  # 按代理缓存的长连接客户端数上限,0 表示每次请求新建客户端
+    request_client_idle_timeout: int = 60  # 长连接客户端空闲超时(秒)
     
     # 日志配置
     log_level: str = "INFO"
@@ -0,0 +1,160 @@
+"""自适应并发限制模块"""
+
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    自适应并发限制器(AIMD)
+
+    作为异步上下文管理器限制同时进行的操作数,并按时间窗口统计吞吐量、排队数和事件循环延迟。
+    启用自适应模式时,每个窗口结束后调整并发上限:
+    - 事件循环延迟超过阈值,或本地错误(如文件描述符耗尽)比例过高时,上限减半
+    - 否则如果有操作在排队等待,上限增加固定步长,直到最大并发数
+    """
+
+    window = 1.0  # 统计/调整窗口(秒)
+    lag_interval = 0.05  # 事件循环延迟采样间隔(秒)
+    increase_step = 5  # 每个窗口的加性增长步长
+    decrease_factor = 0.5  # 乘性减小系数
+    max_error_rate = 0.05  # 本地错误比例阈值
+    min_error_samples = 10  # 窗口内操作数少于该值时不按错误比例调整
+
+    def __init__(self, limit: int, max_limit: Optional[int] = None, adaptive: bool = False, max_lag: float = 0.1):
+        """
+        Args:
+            limit: 初始并发上限(非自适应模式下固定不变)
+            max_limit: 自适应模式下的最大并发上限
+            adaptive: 是否启用自适应调整
+            max_lag: 可接受的事件循环延迟(秒)
+        """
+        self.limit = max(1, limit)
+        self.adaptive = adaptive
+        self.max_limit = max(max_limit or self.limit, self.limit) if adaptive else self.limit
+        self.max_lag = max_lag
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.total = 0  # 累计完成的操作数
+        self.probes_per_second = 0.0  # 最近一个窗口的吞吐量
+        self.loop_lag = 0.0  # 最近一个窗口内的最大事件循环延迟(秒)
+        self._window_count = 0
+        self._window_errors = 0
+        self._monitor_task: Optional[asyncio.Task] = None
+
+    @property
+    def waiting(self) -> int:
+        """排队等待的操作数"""
+        return len(self._waiters)
+
+    async def acquire(self):
+        """获取一个并发名额,达到上限时排队等待"""
+        self._ensure_monitor()
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.cancelled():
+                self._waiters.remove(waiter)
+            else:
+                # 已分配名额但调用方被取消,归还名额
+                self.release()
+            raise
+
+    def release(self):
+        """归还并发名额"""
+        self.in_flight -= 1
+        self._wake()
+
+    def record(self, local_error: bool = False):
+        """
+        记录一次完成的操作
+
+        Args:
+            local_error: 是否为本地资源错误(而不是目标本身失败)
+        """
+        self.total += 1
+        self._window_count += 1
+        self._window_errors += local_error
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+    def _wake(self):
+        """按当前上限唤醒排队的操作"""
+        while self._waiters and self.in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _ensure_monitor(self):
+        if self._monitor_task is None or self._monitor_task.done():
+            self._monitor_task = asyncio.get_running_loop().create_task(self._monitor())
+
+    async def _monitor(self):
+        """采样事件循环延迟,每个窗口结束时更新统计并调整上限,空闲一个窗口后退出"""
+        loop = asyncio.get_running_loop()
+        window_start = loop.time()
+        max_lag = 0.0
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.lag_interval)
+            now = loop.time()
+            max_lag = max(max_lag, now - started - self.lag_interval)
+            if now - window_start < self.window:
+                continue
+
+            idle = not self._window_count and not self.in_flight and not self._waiters
+            self._end_window(now - window_start, max_lag)
+            window_start, max_lag = now, 0.0
+            if idle:
+                # 空闲窗口的吞吐量已为 0;退出后不再采样,延迟也清零,避免一直报告最后一个繁忙窗口
+                self.loop_lag = 0.0
+                return
+
+    def _end_window(self, elapsed: float, lag: float):
+        """结束一个统计窗口,自适应模式下按 AIMD 调整上限"""
+        count, errors = self._window_count, self._window_errors
+        self._window_count = self._window_errors = 0
+        self.probes_per_second = count / elapsed
+        self.loop_lag = lag
+        if not self.adaptive:
+            return
+
+        overloaded = lag > self.max_lag or (
+            count >= self.min_error_samples and errors / count > self.max_error_rate
+        )
+        if overloaded:
+            self.limit = max(1, int(self.limit * self.decrease_factor))
+        elif self._waiters:
+            self.limit = min(self.max_limit, self.limit + self.increase_step)
+            self._wake()
+
+    def snapshot(self) -> Dict:
+        """
+        导出当前状态
+
+        Returns:
+            并发上限、在途数、排队数、吞吐量等
+        """
+        return {
+            "concurrency": self.limit,
+            "max_concurrency": self.max_limit,
+            "adaptive": self.adaptive,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "probes_per_second": round(self.probes_per_second, 2),
+            "loop_lag": round(self.loop_lag, 4),
+            "total": self.total,
+        }
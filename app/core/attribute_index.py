@@ -0,0 +1,135 @@
+"""代理属性索引模块"""
+
+from typing import Dict, Optional, Set, Tuple
+from app.models import ProxyModel
+
+# 支持过滤的代理属性
+FILTER_FIELDS = ("country", "protocol", "anonymity", "source")
+
+
+def normalize_value(value) -> Optional[str]:
+    """
+    规范化属性值(枚举取值、忽略大小写和首尾空白)
+
+    Args:
+        value: 属性值
+
+    Returns:
+        规范化后的字符串,空值返回 None
+    """
+    if value is None:
+        return None
+    value = str(getattr(value, "value", value)).strip().lower()
+    return value or None
+
+
+def make_filters(**filters) -> Dict[str, str]:
+    """
+    构建代理过滤条件,忽略未指定的属性
+
+    Args:
+        **filters: 属性名 -> 属性值,属性名须在 FILTER_FIELDS 中
+
+    Returns:
+        过滤条件字典
+    """
+    result = {}
+    for field, value in filters.items():
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"不支持的过滤属性: {field}")
+        value = normalize_value(value)
+        if value is not None:
+            result[field] = value
+    return result
+
+
+class AttributeIndex:
+    """
+    代理属性二级索引
+
+    按国家、协议、匿名度、来源维护 属性值 -> 代理 ID 集合,随代理池的每次变更增量更新。
+    过滤查询从最小的候选集合开始求交集,开销与匹配的代理数成正比,而不是整个代理池
+    """
+
+    def __init__(self):
+        self._keys: Dict[str, Tuple[Optional[str], ...]] = {}  # 代理 ID -> 上次索引的属性值
+        self._members: Dict[str, Dict[str, Set[str]]] = {field: {} for field in FILTER_FIELDS}
+
+    def update(self, proxy: ProxyModel):
+        """
+        代理新增或属性变化后更新索引
+
+        Args:
+            proxy: 代理模型
+        """
+        new = tuple(normalize_value(getattr(proxy, field)) for field in FILTER_FIELDS)
+        old = self._keys.get(proxy.id)
+        if old == new:
+            return
+        if old is not None:
+            self._unlink(proxy.id, old)
+        self._keys[proxy.id] = new
+        for field, value in zip(FILTER_FIELDS, new):
+            if value is not None:
+                self._members[field].setdefault(value, set()).add(proxy.id)
+
+    def remove(self, proxy_id: str):
+        """
+        从索引中移除代理
+
+        Args:
+            proxy_id: 代理 ID
+        """
+        old = self._keys.pop(proxy_id, None)
+        if old is not None:
+            self._unlink(proxy_id, old)
+
+    def lookup(self, filters: Dict[str, str]) -> Set[str]:
+        """
+        查询满足所有过滤条件的代理 ID
+
+        Args:
+            filters: 过滤条件(见 make_filters)
+
+        Returns:
+            代理 ID 集合(新建集合,可安全修改)
+        """
+        sets = []
+        for field, value in filters.items():
+            members = self._members[field].get(value)
+            if not members:
+                return set()
+            sets.append(members)
+        if not sets:
+            return set(self._keys)
+
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:])
+
+    def matches(self, proxy_id: str, filters: Dict[str, str]) -> bool:
+        """
+        代理是否满足过滤条件
+
+        Args:
+            proxy_id: 代理 ID
+            filters: 过滤条件
+
+        Returns:
+            是否满足
+        """
+        key = self._keys.get(proxy_id)
+        if key is None:
+            return False
+        values = dict(zip(FILTER_FIELDS, key))
+        return all(values[field] == value for field, value in filters.items())
+
+    def _unlink(self, proxy_id: str, key: Tuple[Optional[str], ...]):
+        """从各属性值集合中移除代理"""
+        for field, value in zip(FILTER_FIELDS, key):
+            if value is None:
+                continue
+            members = self._members[field].get(value)
+            if members is not None:
+                members.discard(proxy_id)
+                if not members:
+                    del self._members[field][value]
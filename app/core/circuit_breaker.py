@@ -0,0 +1,158 @@
+"""代理熔断器模块"""
+
+import heapq
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+from app.models import CircuitState, ProxyModel
+from app.config import settings
+
+
+class CircuitBreaker:
+    """
+    代理熔断器
+
+    代理连续失败后不再直接删除,而是进入熔断状态:
+    - CLOSED: 正常参与选择
+    - OPEN: 冷却中,不参与选择;冷却时间随连续熔断次数指数退避
+    - HALF_OPEN: 冷却结束,只接收少量试探流量(实际请求或验证探测),成功则恢复,失败则再次熔断
+    连续熔断次数超过上限的代理视为彻底失效,等待清理
+    """
+
+    def __init__(self):
+        self.cooldown = settings.proxy_circuit_cooldown
+        self.max_cooldown = settings.proxy_circuit_max_cooldown
+        self.max_trips = settings.proxy_circuit_max_trips
+        self._cooldowns: List[Tuple[datetime, str]] = []  # (冷却结束时间, 代理 ID)
+        self._half_open: Dict[str, None] = {}  # 半开代理 ID(按进入顺序)
+
+    @property
+    def half_open_count(self) -> int:
+        """半开状态代理数量"""
+        return len(self._half_open)
+
+    def is_exhausted(self, proxy: ProxyModel) -> bool:
+        """
+        代理连续熔断次数是否已超过上限
+
+        Args:
+            proxy: 代理模型
+
+        Returns:
+            是否彻底失效
+        """
+        return proxy.circuit_trips > self.max_trips
+
+    def trip(self, proxy: ProxyModel) -> bool:
+        """
+        熔断代理
+
+        Args:
+            proxy: 代理模型
+
+        Returns:
+            是否进入冷却(False 表示连续熔断次数超过上限,代理彻底失效)
+        """
+        self._half_open.pop(proxy.id, None)
+        proxy.is_valid = False
+        proxy.circuit_state = CircuitState.OPEN
+        proxy.circuit_trips += 1
+
+        if self.is_exhausted(proxy):
+            proxy.circuit_open_until = None
+            return False
+
+        cooldown = min(self.cooldown * 2 ** (proxy.circuit_trips - 1), self.max_cooldown)
+        proxy.circuit_open_until = datetime.now() + timedelta(seconds=cooldown)
+        self.schedule(proxy)
+        return True
+
+    def schedule(self, proxy: ProxyModel):
+        """
+        登记代理的冷却结束时间(用于从外部恢复的熔断状态)
+
+        Args:
+            proxy: 代理模型
+        """
+        if proxy.circuit_state == CircuitState.HALF_OPEN:
+            self._half_open[proxy.id] = None
+        elif proxy.circuit_state == CircuitState.OPEN and proxy.circuit_open_until is not None:
+            heapq.heappush(self._cooldowns, (proxy.circuit_open_until, proxy.id))
+
+    def close(self, proxy: ProxyModel):
+        """
+        恢复代理
+
+        Args:
+            proxy: 代理模型
+        """
+        self._half_open.pop(proxy.id, None)
+        proxy.is_valid = True
+        proxy.circuit_state = CircuitState.CLOSED
+        proxy.circuit_trips = 0
+        proxy.circuit_open_until = None
+
+    def forget(self, proxy_id: str):
+        """
+        移除代理的熔断记录(冷却堆中的条目惰性删除)
+
+        Args:
+            proxy_id: 代理 ID
+        """
+        self._half_open.pop(proxy_id, None)
+
+    def promote_due(self, get_proxy: Callable[[str], Optional[ProxyModel]]) -> List[str]:
+        """
+        将冷却结束的代理转为半开状态
+
+        Args:
+            get_proxy: 按 ID 获取代理的函数
+
+        Returns:
+            本次转为半开的代理 ID 列表
+        """
+        now = datetime.now()
+        promoted = []
+        while self._cooldowns and self._cooldowns[0][0] <= now:
+            open_until, proxy_id = heapq.heappop(self._cooldowns)
+            proxy = get_proxy(proxy_id)
+            # 跳过已删除、已恢复或被再次熔断(冷却时间已更新)的过期条目
+            if (
+                proxy is None
+                or proxy.circuit_state != CircuitState.OPEN
+                or proxy.circuit_open_until != open_until
+            ):
+                continue
+            proxy.circuit_state = CircuitState.HALF_OPEN
+            self._half_open[proxy_id] = None
+            promoted.append(proxy_id)
+        return promoted
+
+    def next_trial(self, is_busy: Callable[[str], bool]) -> Optional[str]:
+        """
+        选择一个空闲的半开代理进行试探,并将其移到队尾
+
+        Args:
+            is_busy: 判断代理是否已有在途请求的函数
+
+        Returns:
+            代理 ID,没有可试探的代理时返回 None
+        """
+        for proxy_id in self._half_open:
+            if not is_busy(proxy_id):
+                del self._half_open[proxy_id]
+                self._half_open[proxy_id] = None
+                return proxy_id
+        return None
+
+    def half_open_ids(self, limit: Optional[int] = None) -> List[str]:
+        """
+        获取半开代理 ID 列表
+
+        Args:
+            limit: 最大数量
+
+        Returns:
+            代理 ID 列表
+        """
+        ids = list(self._half_open)
+        return ids[:limit] if limit is not None else ids
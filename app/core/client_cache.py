@@ -0,0 +1,124 @@
+"""按代理缓存长连接客户端模块"""
+
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import AsyncIterator, List, Optional
+import httpx
+from app.models import ProxyModel
+from app.utils import log
+
+
+class _CachedClient:
+    """缓存中的客户端及其使用状态"""
+
+    __slots__ = ("client", "last_used", "in_use")
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.last_used = time.monotonic()
+        self.in_use = 0
+
+
+class ProxyClientCache:
+    """
+    按代理缓存长连接的 httpx.AsyncClient(LRU)
+
+    同一代理的请求复用同一个客户端及其连接池,重复访问同一站点时可复用已建立的
+    代理连接、CONNECT 隧道和 TLS 会话,省去每次请求的握手开销。
+    - 超过最大客户端数时关闭最久未使用的客户端
+    - 空闲超过 idle_timeout 的客户端在下次访问缓存时关闭
+    - 正在使用的客户端不会被关闭,此时允许暂时超过上限
+    """
+
+    def __init__(self, max_clients: int, idle_timeout: float):
+        """
+        Args:
+            max_clients: 最多缓存的客户端数
+            idle_timeout: 客户端空闲超时(秒),同时作为连接池中空闲连接的保活时间
+        """
+        self.max_clients = max_clients
+        self.idle_timeout = idle_timeout
+        self._clients: "OrderedDict[str, _CachedClient]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    @staticmethod
+    def _key(proxy: Optional[ProxyModel]) -> str:
+        return proxy.proxy_url if proxy else ""
+
+    def _create(self, proxy: Optional[ProxyModel]) -> httpx.AsyncClient:
+        """
+        创建客户端(超时、重定向等按请求设置)
+
+        同一代理的客户端由不相关的调用方共享,cookie 策略不允许任何域名,
+        响应中的 Set-Cookie 不会保存,避免一个调用方的会话被带到其他请求中
+        """
+        return httpx.AsyncClient(
+            proxies=proxy.to_dict() if proxy else None,
+            verify=False,
+            limits=httpx.Limits(keepalive_expiry=self.idle_timeout),
+            cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+        )
+
+    @asynccontextmanager
+    async def client(self, proxy: Optional[ProxyModel] = None) -> AsyncIterator[httpx.AsyncClient]:
+        """
+        获取代理对应的客户端,不存在时创建
+
+        Args:
+            proxy: 代理模型(可选),为 None 时返回直连客户端
+
+        Yields:
+            httpx 客户端(使用期间不会被淘汰)
+        """
+        key = self._key(proxy)
+        entry = self._clients.get(key)
+        if entry is None:
+            self.misses += 1
+            entry = self._clients[key] = _CachedClient(self._create(proxy))
+        else:
+            self.hits += 1
+            self._clients.move_to_end(key)
+        entry.in_use += 1
+        try:
+            await self._evict()
+            yield entry.client
+        finally:
+            entry.in_use -= 1
+            entry.last_used = time.monotonic()
+
+    async def _evict(self):
+        """关闭空闲超时的客户端,以及超出数量上限的最久未使用的客户端"""
+        now = time.monotonic()
+        excess = len(self._clients) - self.max_clients
+        closing: List[httpx.AsyncClient] = []
+        for key, entry in list(self._clients.items()):
+            if entry.in_use:
+                continue
+            if excess > 0 or now - entry.last_used >= self.idle_timeout:
+                del self._clients[key]
+                closing.append(entry.client)
+                excess -= 1
+            else:
+                # 按最近使用排序,后面的客户端都更新
+                break
+        for client in closing:
+            await self._close(client)
+
+    @staticmethod
+    async def _close(client: httpx.AsyncClient):
+        try:
+            await client.aclose()
+        except Exception as e:
+            log.debug(f"关闭客户端失败: {e}")
+
+    async def close(self):
+        """关闭所有客户端"""
+        clients, self._clients = list(self._clients.values()), OrderedDict()
+        for entry in clients:
+            await self._close(entry.client)
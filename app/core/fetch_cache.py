@@ -0,0 +1,112 @@
+"""代理源抓取结果缓存模块"""
+
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from app.models import ProxyModel
+from app.utils import log
+
+
+class SourceFetchCache:
+    """
+    代理源原始抓取结果缓存
+
+    按代理源缓存最近一次抓取到的原始代理,TTL 内再次抓取同一代理源时直接返回缓存,
+    避免重复爬取代理列表网站(节省解析开销,也避免出口 IP 被列表网站限流)。
+    结果同时写入 SQLite,重启后或其他进程可复用未过期的结果。
+    磁盘读写是同步阻塞调用,在事件循环中应通过 run_in_executor 执行
+    """
+
+    def __init__(self, ttl: float, path: Optional[str] = None):
+        self.ttl = ttl
+        self.path = Path(path) if path else None
+        self._memory: Dict[str, Tuple[float, List[ProxyModel]]] = {}  # 代理源 -> (抓取时间, 代理列表)
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """打开数据库连接并确保表结构存在"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS fetch_cache ("
+            " source TEXT PRIMARY KEY,"
+            " fetched_at REAL NOT NULL,"
+            " data TEXT NOT NULL"
+            ")"
+        )
+        return conn
+
+    def get(self, source: str) -> Optional[List[ProxyModel]]:
+        """
+        获取未过期的缓存结果,内存中没有时从磁盘读取
+
+        Args:
+            source: 代理源名称
+
+        Returns:
+            代理列表(副本,可安全修改),没有未过期的结果时返回 None
+        """
+        now = time.time()
+        entry = self._memory.get(source)
+        if entry is None and self.path and self.path.exists():
+            entry = self._load(source)
+            if entry is not None:
+                self._memory[source] = entry
+
+        if entry is None or now - entry[0] >= self.ttl:
+            self._memory.pop(source, None)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return [proxy.model_copy() for proxy in entry[1]]
+
+    def put(self, source: str, proxies: List[ProxyModel]):
+        """
+        保存代理源的抓取结果
+
+        Args:
+            source: 代理源名称
+            proxies: 代理列表
+        """
+        fetched_at = time.time()
+        self._memory[source] = (fetched_at, [proxy.model_copy() for proxy in proxies])
+        if not self.path:
+            return
+
+        data = json.dumps([proxy.model_dump(mode="json") for proxy in proxies])
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO fetch_cache (source, fetched_at, data) VALUES (?, ?, ?)",
+                        (source, fetched_at, data),
+                    )
+            finally:
+                conn.close()
+        except Exception as e:
+            log.debug(f"写入抓取缓存失败: {e}")
+
+    def _load(self, source: str) -> Optional[Tuple[float, List[ProxyModel]]]:
+        """从磁盘读取代理源的抓取结果"""
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT fetched_at, data FROM fetch_cache WHERE source = ?", (source,)
+                ).fetchone()
+            finally:
+                conn.close()
+        except Exception as e:
+            log.debug(f"读取抓取缓存失败: {e}")
+            return None
+
+        if row is None:
+            return None
+        fetched_at, data = row
+        return fetched_at, [ProxyModel.model_validate(item) for item in json.loads(data)]
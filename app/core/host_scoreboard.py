@@ -0,0 +1,153 @@
+"""按目标站点的代理计分板模块"""
+
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from app.config import settings
+
+
+class HostScore:
+    """单个代理在某个目标站点上的表现"""
+
+    __slots__ = ("success_rate", "ewma_latency", "successes", "failures", "banned_until")
+
+    def __init__(self):
+        self.success_rate = 1.0
+        self.ewma_latency: Optional[float] = None
+        self.successes = 0
+        self.failures = 0
+        self.banned_until = 0.0
+
+    @property
+    def score(self) -> float:
+        """站点评分(越小越优): 加权延迟 / 加权成功率"""
+        latency = self.ewma_latency if self.ewma_latency is not None else 999
+        return latency / max(self.success_rate, 0.05)
+
+
+class HostScoreboard:
+    """
+    按 (代理, 目标站点) 记录成功率、延迟和封禁状态
+
+    很多代理对通用站点可用,但被特定站点封禁。计分板让选择时优先使用最近在该站点成功过的代理,
+    并在站点级别封禁代理,而不是全局标记失效。所有结构都有容量上限,按 LRU 淘汰。
+    """
+
+    # 每个站点保留的最近成功代理数
+    recent_per_host = 32
+
+    def __init__(self):
+        self.max_entries = settings.proxy_host_scoreboard_size
+        self.max_hosts = settings.proxy_host_scoreboard_hosts
+        self.ban_duration = settings.proxy_host_ban_duration
+        self.alpha = settings.proxy_health_alpha
+        self._scores: "OrderedDict[Tuple[str, str], HostScore]" = OrderedDict()
+        self._recent: "OrderedDict[str, OrderedDict[str, None]]" = OrderedDict()  # 站点 -> 最近成功的代理
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def get(self, proxy_id: str, host: str) -> Optional[HostScore]:
+        """
+        获取代理在站点上的表现
+
+        Args:
+            proxy_id: 代理 ID
+            host: 目标站点
+
+        Returns:
+            站点表现,没有记录时返回 None
+        """
+        return self._scores.get((proxy_id, host))
+
+    def record(self, proxy_id: str, host: str, success: bool, latency: Optional[float] = None):
+        """
+        记录一次请求结果
+
+        Args:
+            proxy_id: 代理 ID
+            host: 目标站点
+            success: 是否成功
+            latency: 耗时(秒),未知时为 None
+        """
+        entry = self._touch(proxy_id, host)
+        alpha = self.alpha
+        entry.success_rate = alpha * (1.0 if success else 0.0) + (1 - alpha) * entry.success_rate
+        if latency is not None:
+            entry.ewma_latency = latency if entry.ewma_latency is None else alpha * latency + (1 - alpha) * entry.ewma_latency
+
+        if success:
+            entry.successes += 1
+            entry.banned_until = 0.0
+            recent = self._recent.get(host)
+            if recent is None:
+                recent = self._recent[host] = OrderedDict()
+                if len(self._recent) > self.max_hosts:
+                    self._recent.popitem(last=False)
+            else:
+                self._recent.move_to_end(host)
+            recent[proxy_id] = None
+            recent.move_to_end(proxy_id)
+            if len(recent) > self.recent_per_host:
+                recent.popitem(last=False)
+        else:
+            entry.failures += 1
+            self._drop_recent(proxy_id, host)
+
+    def ban(self, proxy_id: str, host: str, duration: Optional[float] = None):
+        """
+        在站点级别封禁代理
+
+        Args:
+            proxy_id: 代理 ID
+            host: 目标站点
+            duration: 封禁时长(秒),默认使用配置
+        """
+        entry = self._touch(proxy_id, host)
+        entry.banned_until = time.monotonic() + (duration if duration is not None else self.ban_duration)
+        self._drop_recent(proxy_id, host)
+
+    def is_banned(self, proxy_id: str, host: str) -> bool:
+        """
+        代理是否在站点上被封禁
+
+        Args:
+            proxy_id: 代理 ID
+            host: 目标站点
+
+        Returns:
+            是否封禁中
+        """
+        entry = self._scores.get((proxy_id, host))
+        return entry is not None and entry.banned_until > time.monotonic()
+
+    def recent_successes(self, host: str) -> List[str]:
+        """
+        获取最近在站点上成功过的代理 ID(最近的在前)
+
+        Args:
+            host: 目标站点
+
+        Returns:
+            代理 ID 列表
+        """
+        recent = self._recent.get(host)
+        return list(reversed(recent)) if recent else []
+
+    def _touch(self, proxy_id: str, host: str) -> HostScore:
+        """获取或创建记录,并标记为最近使用"""
+        key = (proxy_id, host)
+        entry = self._scores.get(key)
+        if entry is None:
+            entry = self._scores[key] = HostScore()
+            if len(self._scores) > self.max_entries:
+                self._scores.popitem(last=False)
+        else:
+            self._scores.move_to_end(key)
+        return entry
+
+    def _drop_recent(self, proxy_id: str, host: str):
+        """从站点的最近成功列表中移除代理"""
+        recent = self._recent.get(host)
+        if recent is not None:
+            recent.pop(proxy_id, None)
@@ -0,0 +1,170 @@
+"""分阶段延迟统计模块"""
+
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+from app.config import settings
+
+# 请求耗时的各个阶段: TCP 连接(经代理时含 CONNECT/SOCKS 握手)、TLS 握手、首字节时间、响应体传输
+PHASES = ("connect", "tls", "ttfb", "transfer")
+
+
+class LatencyTrace:
+    """
+    httpx trace 扩展回调,记录一次请求中 httpcore 各事件的时间点
+
+    用法: client.request(..., extensions={"trace": trace}),请求完成后调用 timings()。
+    复用连接池中的连接时没有连接和 TLS 事件,只能得到首字节和传输时间
+    """
+
+    __slots__ = ("_events",)
+
+    def __init__(self):
+        self._events: List[Tuple[str, float]] = []
+
+    async def __call__(self, event_name: str, info: dict):
+        self._events.append((event_name, time.perf_counter()))
+
+    def timings(self) -> Dict[str, float]:
+        """
+        计算各阶段耗时
+
+        Returns:
+            阶段名 -> 耗时(秒),只包含本次请求中出现的阶段
+        """
+        tcp_start = tls_first = tls_start = None
+        tls_total = 0.0
+        request_start = headers_done = body_start = body_done = None
+        for name, at in self._events:
+            if name.endswith("connect_tcp.started"):
+                tcp_start = at if tcp_start is None else tcp_start
+            elif name.endswith("start_tls.started"):
+                tls_start = at
+                tls_first = at if tls_first is None else tls_first
+            elif name.endswith("start_tls.complete") and tls_start is not None:
+                tls_total += at - tls_start
+                tls_start = None
+            elif name.endswith("send_request_headers.started"):
+                # 经 HTTP 代理访问 HTTPS 时,先有一次 CONNECT 请求,以最后一次请求为准
+                request_start = at
+            elif name.endswith("receive_response_headers.complete"):
+                headers_done = at
+            elif name.endswith("receive_response_body.started"):
+                body_start = at
+            elif name.endswith("receive_response_body.complete"):
+                body_done = at
+
+        timings = {}
+        ready = tls_first if tls_first is not None else request_start
+        if tcp_start is not None and ready is not None:
+            timings["connect"] = ready - tcp_start
+            if tls_first is not None:
+                timings["tls"] = tls_total
+        if request_start is not None and headers_done is not None and headers_done >= request_start:
+            timings["ttfb"] = headers_done - request_start
+        if body_start is not None and body_done is not None:
+            timings["transfer"] = body_done - body_start
+        return {phase: round(value, 6) for phase, value in timings.items()}
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    """有序列表的百分位数(最近秩法)"""
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+class LatencyTracker:
+    """
+    按代理记录分阶段耗时的滚动窗口,提供百分位数
+
+    每个代理每个阶段保留最近 window 个样本;响应体足够大时额外记录传输速率(字节/秒)。
+    只在当前进程内统计,不写入快照
+    """
+
+    min_rate_bytes = 16 * 1024  # 响应体小于该大小时传输时间主要是固定开销,不计入传输速率
+
+    def __init__(self, window: Optional[int] = None):
+        self.window = window or settings.proxy_latency_window
+        self._samples: Dict[str, Dict[str, Deque[float]]] = {}
+
+    def __contains__(self, proxy_id: str) -> bool:
+        return proxy_id in self._samples
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, proxy_id: str, timings: Optional[Dict[str, float]], size: int = 0):
+        """
+        记录一次请求的分阶段耗时
+
+        Args:
+            proxy_id: 代理 ID
+            timings: 阶段名 -> 耗时(秒)
+            size: 响应体字节数
+        """
+        if not timings:
+            return
+        samples = self._samples.setdefault(proxy_id, {})
+        for phase in PHASES:
+            value = timings.get(phase)
+            if value is not None:
+                samples.setdefault(phase, deque(maxlen=self.window)).append(value)
+        transfer = timings.get("transfer")
+        if size >= self.min_rate_bytes and transfer:
+            samples.setdefault("rate", deque(maxlen=self.window)).append(size / transfer)
+
+    def remove(self, proxy_id: str):
+        """
+        删除代理的全部样本
+
+        Args:
+            proxy_id: 代理 ID
+        """
+        self._samples.pop(proxy_id, None)
+
+    def percentile(self, proxy_id: str, phase: str, q: float = 0.5) -> Optional[float]:
+        """
+        获取代理某个阶段的百分位耗时
+
+        Args:
+            proxy_id: 代理 ID
+            phase: 阶段名(PHASES 之一,或 "rate" 表示传输速率)
+            q: 分位(0~1)
+
+        Returns:
+            百分位数,没有样本时返回 None
+        """
+        values = self._samples.get(proxy_id, {}).get(phase)
+        return _percentile(sorted(values), q) if values else None
+
+    def handshake(self, proxy_id: str) -> Optional[float]:
+        """连接与 TLS 握手的中位耗时之和(秒),没有连接样本时返回 None"""
+        connect = self.percentile(proxy_id, "connect")
+        if connect is None:
+            return None
+        return connect + (self.percentile(proxy_id, "tls") or 0.0)
+
+    def transfer_rate(self, proxy_id: str) -> Optional[float]:
+        """中位传输速率(字节/秒),没有大响应样本时返回 None"""
+        return self.percentile(proxy_id, "rate")
+
+    def summary(self, proxy_id: str) -> Dict[str, Dict[str, float]]:
+        """
+        导出代理各阶段的滚动百分位
+
+        Args:
+            proxy_id: 代理 ID
+
+        Returns:
+            阶段名 -> {"p50", "p90", "p99", "count"}
+        """
+        result = {}
+        for phase, values in self._samples.get(proxy_id, {}).items():
+            ordered = sorted(values)
+            result[phase] = {
+                "p50": round(_percentile(ordered, 0.5), 4),
+                "p90": round(_percentile(ordered, 0.9), 4),
+                "p99": round(_percentile(ordered, 0.99), 4),
+                "count": len(ordered),
+            }
+        return result
@@ -0,0 +1,111 @@
+"""失效代理负缓存模块"""
+
+import hashlib
+import math
+import time
+from collections import deque
+from typing import Deque, Hashable, Tuple
+from app.config import settings
+
+
+class BloomFilter:
+    """
+    布隆过滤器
+
+    按预期容量和误判率确定位数组大小和哈希次数,内存与插入数量无关
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0  # 插入次数(近似条目数)
+
+    def _positions(self, item: str):
+        """双重哈希生成 hashes 个位下标"""
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        """
+        添加元素
+
+        Args:
+            item: 元素
+        """
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class DeadProxyCache:
+    """
+    失效代理负缓存(按时间分桶的布隆过滤器)
+
+    记录最近验证失败或被清理的代理,抓取到的候选代理先查询该缓存,命中的不再送去验证。
+    缓存按 TTL 分成若干时间桶,新条目写入最新的桶,最旧的桶整体过期丢弃,
+    因此条目在 TTL 的 (1 - 1/桶数) 到 1 倍之间过期,内存上限为 桶数 × 单桶大小
+    """
+
+    buckets = 4
+
+    def __init__(self):
+        self.ttl = settings.proxy_negative_cache_ttl
+        self.capacity = settings.proxy_negative_cache_capacity
+        self.error_rate = settings.proxy_negative_cache_error_rate
+        self._span = self.ttl / self.buckets
+        self._buckets: Deque[Tuple[float, BloomFilter]] = deque()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _item(key: Hashable) -> str:
+        return repr(key)
+
+    def _rotate(self) -> BloomFilter:
+        """丢弃过期的桶,返回当前写入的桶"""
+        now = time.monotonic()
+        while self._buckets and now - self._buckets[0][0] >= self.ttl:
+            self._buckets.popleft()
+        if not self._buckets or now - self._buckets[-1][0] >= self._span:
+            self._buckets.append((now, BloomFilter(self.capacity, self.error_rate)))
+        return self._buckets[-1][1]
+
+    @property
+    def size(self) -> int:
+        """未过期的条目数(近似)"""
+        self._rotate()
+        return sum(bloom.count for _, bloom in self._buckets)
+
+    def add(self, key: Hashable):
+        """
+        记录失效代理
+
+        Args:
+            key: 代理去重键
+        """
+        self._rotate().add(self._item(key))
+
+    def check(self, key: Hashable) -> bool:
+        """
+        查询代理是否最近失效过,并计入命中/未命中次数
+
+        Args:
+            key: 代理去重键
+
+        Returns:
+            是否命中(存在误判,概率约为配置的误判率)
+        """
+        self._rotate()
+        item = self._item(key)
+        if any(item in bloom for _, bloom in self._buckets):
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
@@ -0,0 +1,118 @@
+"""代理池统计模块"""
+
+from typing import Dict, Optional, Tuple
+from app.models import ProxyModel
+
+# 单个代理对统计的贡献: (是否有效, 有效代理的速度, 来源, 协议, 熔断状态)
+Contribution = Tuple[bool, Optional[float], str, str, str]
+
+
+class PoolStats:
+    """
+    代理池增量统计
+
+    记录每个代理上一次计入统计时的贡献,代理池每次变更只需撤销旧贡献、计入新贡献,
+    查询统计时无需遍历代理池
+    """
+
+    def __init__(self):
+        self._contrib: Dict[str, Contribution] = {}
+        self.total = 0
+        self.valid = 0
+        self.speed_sum = 0.0
+        self.speed_count = 0
+        self.by_source: Dict[str, Dict[str, int]] = {}
+        self.by_protocol: Dict[str, Dict[str, int]] = {}
+        self.by_circuit: Dict[str, int] = {}
+        self.request_success = 0
+        self.request_failure = 0
+
+    @staticmethod
+    def contribution(proxy: ProxyModel) -> Contribution:
+        """
+        计算代理对统计的贡献
+
+        Args:
+            proxy: 代理模型
+
+        Returns:
+            统计贡献
+        """
+        return (
+            proxy.is_valid,
+            proxy.speed if proxy.is_valid and proxy.speed else None,
+            proxy.source or "unknown",
+            proxy.protocol.value,
+            proxy.circuit_state.value,
+        )
+
+    def update(self, proxy: ProxyModel):
+        """
+        代理新增或状态变化后更新统计
+
+        Args:
+            proxy: 代理模型
+        """
+        new = self.contribution(proxy)
+        old = self._contrib.get(proxy.id)
+        if old == new:
+            return
+        if old is not None:
+            self._apply(old, -1)
+        self._apply(new, 1)
+        self._contrib[proxy.id] = new
+
+    def remove(self, proxy_id: str):
+        """
+        代理移除后更新统计
+
+        Args:
+            proxy_id: 代理 ID
+        """
+        old = self._contrib.pop(proxy_id, None)
+        if old is not None:
+            self._apply(old, -1)
+
+    def record_request(self, success: bool):
+        """
+        记录一次实际请求结果
+
+        Args:
+            success: 是否成功
+        """
+        if success:
+            self.request_success += 1
+        else:
+            self.request_failure += 1
+
+    @property
+    def avg_speed(self) -> Optional[float]:
+        """有效代理平均速度"""
+        return self.speed_sum / self.speed_count if self.speed_count else None
+
+    def _apply(self, contrib: Contribution, sign: int):
+        """计入(sign=1)或撤销(sign=-1)一个代理的贡献"""
+        is_valid, speed, source, protocol, circuit = contrib
+        self.total += sign
+        if is_valid:
+            self.valid += sign
+        if speed is not None:
+            self.speed_sum += sign * speed
+            self.speed_count += sign
+            if not self.speed_count:
+                # 清零浮点累计误差
+                self.speed_sum = 0.0
+
+        for table, key in ((self.by_source, source), (self.by_protocol, protocol)):
+            bucket = table.setdefault(key, {"total": 0, "valid": 0})
+            bucket["total"] += sign
+            if is_valid:
+                bucket["valid"] += sign
+            if not bucket["total"]:
+                del table[key]
+
+        count = self.by_circuit.get(circuit, 0) + sign
+        if count:
+            self.by_circuit[circuit] = count
+        else:
+            self.by_circuit.pop(circuit, None)
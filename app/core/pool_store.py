@@ -0,0 +1,237 @@
+"""代理池快照持久化模块"""
+
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.models import ProxyModel
+from app.utils import log
+
+
+class PoolSnapshotStore:
+    """
+    代理池快照存储
+
+    使用 SQLite(WAL 模式)保存代理及其健康数据,重启后可直接恢复代理池。
+    多进程共享代理池时,同一数据库还承载快照版本号和各进程上报的请求结果。
+    快照增量保存:每行记录最后写入时的版本号,删除的代理留下墓碑,只读进程只需读取新版本的变更。
+    所有方法都是同步阻塞调用,在事件循环中应通过 run_in_executor 执行。
+    """
+
+    tombstone_window = 1000  # 保留最近多少个版本的删除记录,落后更多的读取方需完整加载
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._saved: Optional[Dict[str, str]] = None  # 本进程上次保存的 代理 ID -> 序列化数据
+
+    def _connect(self) -> sqlite3.Connection:
+        """打开数据库连接并确保表结构存在"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS proxies ("
+            " id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " version INTEGER NOT NULL DEFAULT 0"
+            ")"
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(proxies)")}
+        if "version" not in columns:  # 兼容旧版本创建的快照
+            conn.execute("ALTER TABLE proxies ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        conn.execute("CREATE TABLE IF NOT EXISTS removed (id TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS outcomes ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " kind TEXT NOT NULL,"
+            " proxy_id TEXT NOT NULL,"
+            " success INTEGER,"
+            " latency REAL"
+            ")"
+        )
+        return conn
+
+    @staticmethod
+    def _meta(conn: sqlite3.Connection, key: str) -> int:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _set_meta(conn: sqlite3.Connection, key: str, value: int):
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    def save(self, proxies: Iterable[ProxyModel]) -> Optional[int]:
+        """
+        保存代理池快照
+
+        本进程第一次保存时整体替换上一份快照;之后只写入与上次保存相比新增、变化和删除的代理,
+        没有变化时不写入,版本号也不变
+
+        Args:
+            proxies: 代理列表
+
+        Returns:
+            写入(含删除)的代理数量,快照未变化时返回 None
+        """
+        now = time.time()
+        current = {p.id: p.model_dump_json() for p in proxies if p.id}
+        full = self._saved is None
+        if full:
+            changed, removed = current, []
+        else:
+            changed = {pid: data for pid, data in current.items() if self._saved.get(pid) != data}
+            removed = [pid for pid in self._saved if pid not in current]
+            if not changed and not removed:
+                return None
+
+        conn = self._connect()
+        try:
+            with conn:
+                version = self._meta(conn, "version") + 1
+                if full:
+                    # 整体替换时没有墓碑,版本更早的读取方需完整加载
+                    conn.execute("DELETE FROM proxies")
+                    conn.execute("DELETE FROM removed")
+                    self._set_meta(conn, "horizon", version)
+                elif version - self.tombstone_window > self._meta(conn, "horizon"):
+                    conn.execute("DELETE FROM removed WHERE version <= ?", (version - self.tombstone_window,))
+                    self._set_meta(conn, "horizon", version - self.tombstone_window)
+                conn.executemany(
+                    "INSERT INTO proxies (id, data, updated_at, version) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT(id) DO UPDATE SET"
+                    " data = excluded.data, updated_at = excluded.updated_at, version = excluded.version",
+                    [(pid, data, now, version) for pid, data in changed.items()],
+                )
+                conn.executemany("DELETE FROM removed WHERE id = ?", [(pid,) for pid in changed])
+                conn.executemany("DELETE FROM proxies WHERE id = ?", [(pid,) for pid in removed])
+                conn.executemany(
+                    "INSERT OR REPLACE INTO removed (id, version) VALUES (?, ?)",
+                    [(pid, version) for pid in removed],
+                )
+                self._set_meta(conn, "version", version)
+        finally:
+            conn.close()
+        self._saved = current
+        return len(changed) + len(removed)
+
+    def version(self) -> int:
+        """
+        获取快照版本号(每次保存递增)
+
+        Returns:
+            版本号,快照不存在时返回 0
+        """
+        if not self.path.exists():
+            return 0
+
+        conn = self._connect()
+        try:
+            return self._meta(conn, "version")
+        finally:
+            conn.close()
+
+    def changes(self, since: int) -> Tuple[int, bool, List[ProxyModel], List[str]]:
+        """
+        读取指定版本之后的快照变更
+
+        Args:
+            since: 读取方已加载的版本号
+
+        Returns:
+            (当前版本号, 是否为完整快照, 新增或变化的代理, 删除的代理 ID);
+            读取方落后太多(所需的删除记录已清理)时返回完整快照
+        """
+        if not self.path.exists():
+            return 0, True, [], []
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN")  # 在同一个读事务中读取,保证版本号与数据一致
+            version = self._meta(conn, "version")
+            full = since < self._meta(conn, "horizon")
+            if full:
+                rows = conn.execute("SELECT data FROM proxies").fetchall()
+                removed = []
+            else:
+                rows = conn.execute("SELECT data FROM proxies WHERE version > ?", (since,)).fetchall()
+                removed = [pid for (pid,) in conn.execute("SELECT id FROM removed WHERE version > ?", (since,))]
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return version, full, self._parse(rows), removed
+
+    def push_outcomes(self, outcomes: List[Tuple[str, str, Optional[bool], Optional[float]]]):
+        """
+        追加代理使用结果,供维护进程汇总
+
+        Args:
+            outcomes: (类型, 代理 ID, 是否成功, 耗时) 列表
+        """
+        if not outcomes:
+            return
+
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO outcomes (kind, proxy_id, success, latency) VALUES (?, ?, ?, ?)",
+                    outcomes,
+                )
+        finally:
+            conn.close()
+
+    def pop_outcomes(self) -> List[Tuple[str, str, Optional[bool], Optional[float]]]:
+        """
+        取出并删除所有已上报的代理使用结果
+
+        Returns:
+            (类型, 代理 ID, 是否成功, 耗时) 列表,按上报顺序排列
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                rows = conn.execute(
+                    "SELECT seq, kind, proxy_id, success, latency FROM outcomes ORDER BY seq"
+                ).fetchall()
+                if rows:
+                    conn.execute("DELETE FROM outcomes WHERE seq <= ?", (rows[-1][0],))
+        finally:
+            conn.close()
+        return [
+            (kind, proxy_id, None if success is None else bool(success), latency)
+            for _, kind, proxy_id, success, latency in rows
+        ]
+
+    def load(self) -> List[ProxyModel]:
+        """
+        读取代理池快照
+
+        Returns:
+            代理列表,快照不存在时返回空列表
+        """
+        if not self.path.exists():
+            return []
+
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT data FROM proxies").fetchall()
+        finally:
+            conn.close()
+        return self._parse(rows)
+
+    @staticmethod
+    def _parse(rows: List[Tuple[str]]) -> List[ProxyModel]:
+        """解析快照行,跳过无法解析的代理"""
+        proxies = []
+        for (data,) in rows:
+            try:
+                proxies.append(ProxyModel.model_validate_json(data))
+            except Exception as e:
+                log.debug(f"解析快照代理失败: {e}")
+        return proxies
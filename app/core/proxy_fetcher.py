@@ -1,9 +1,16 @@
 """代理获取模块 - 集成 pyfreeproxy"""
 
 import asyncio
-from typing import List
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Container, Dict, List, Optional
 from freeproxy.modules import BuildProxiedSession, ProxyInfo
 from app.models import ProxyModel, ProxyProtocol
+from app.core.fetch_cache import SourceFetchCache
+from app.scrape_worker import ProxyRow, ScrapeProcessSupervisor, proxy_info_to_row
+from app.core.source_scheduler import SourceScheduler
+from app.config import settings
 from app.utils import log
 
 
@@ -37,72 +44,192 @@ class ProxyFetcher:
     ]
     
     def __init__(self):
-        self._source_index = 0  # 用于轮换代理源
+        self.sources = SourceScheduler(self.PROXY_SOURCES)  # 按产出选择代理源
+        self.source_timeout = settings.proxy_source_timeout
+        # 专用线程池执行同步的 pyfreeproxy 调用,不占用事件循环的默认线程池
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.proxy_fetch_workers, thread_name_prefix="proxy-fetch"
+        )
+        self._running: set = set()  # 线程仍在运行的代理源(包括已超时但未结束的)
+        # process 模式下在独立子进程中抓取,解析开销不影响 API 请求处理
+        self.mode = settings.proxy_fetch_mode
+        self._supervisor = (
+            ScrapeProcessSupervisor(settings.proxy_fetch_workers)
+            if self.mode == "process"
+            else None
+        )
+        # 代理源原始抓取结果缓存,TTL 为 0 时不缓存
+        self.cache = (
+            SourceFetchCache(settings.proxy_fetch_cache_ttl, settings.proxy_fetch_cache_path or None)
+            if settings.proxy_fetch_cache_ttl > 0
+            else None
+        )
+        self._inflight: Dict[str, asyncio.Task] = {}  # 代理源 -> 正在进行的抓取任务,并发请求共享
     
-    async def fetch_proxies(self, count: int = 50) -> List[ProxyModel]:
+    def close(self):
+        """关闭抓取线程池和抓取子进程,不等待仍在运行的抓取"""
+        if self._supervisor is not None:
+            self._supervisor.close()
+        if sys.version_info >= (3, 9):
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        else:  # Python 3.8 不支持 cancel_futures,排队中的任务仍会执行
+            self._executor.shutdown(wait=False)
+    
+    async def fetch_source(self, source: str) -> List[ProxyModel]:
+        """
+        从指定源获取代理:TTL 内优先返回缓存结果,同一代理源的并发请求共享同一次抓取
+        
+        Args:
+            source: 代理源名称
+            
+        Returns:
+            代理列表(每次调用都是独立副本,可安全修改)
+            
+        Raises:
+            RuntimeError: 该代理源上一次抓取仍未结束
+            TimeoutError: 抓取超时
+        """
+        if self.cache is not None:
+            # 缓存读写很快,放在默认线程池,不排在可能被抓取占满的抓取线程池后面
+            loop = asyncio.get_running_loop()
+            cached = await loop.run_in_executor(None, self.cache.get, source)
+            if cached is not None:
+                log.debug(f"{source} 使用缓存的抓取结果({len(cached)} 个代理)")
+                return cached
+        
+        task = self._inflight.get(source)
+        if task is None:
+            task = asyncio.ensure_future(self._scrape_source(source))
+            self._inflight[source] = task
+            task.add_done_callback(lambda _: self._inflight.pop(source, None))
+            # 所有等待方都已取消时,抓取仍会完成并写入缓存,这里取走异常避免未处理警告
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        
+        # shield: 单个等待方被取消(如流式抓取提前结束)不会取消共享的抓取
+        proxies = await asyncio.shield(task)
+        return [proxy.model_copy() for proxy in proxies]
+    
+    async def _scrape_source(self, source: str) -> List[ProxyModel]:
+        """
+        在抓取线程池或抓取子进程中从指定源获取代理,超时后不再等待,记录代理源统计并写入缓存
+        
+        Args:
+            source: 代理源名称
+            
+        Returns:
+            代理列表
+            
+        Raises:
+            RuntimeError: 该代理源上一次抓取仍未结束
+            TimeoutError: 抓取超时
+        """
+        if source in self._running:
+            raise RuntimeError(f"{source} 上一次抓取仍未结束,跳过")
+        
+        start_time = time.perf_counter()
+        try:
+            if self._supervisor is not None:
+                log.info(f"从 {source} 获取代理(子进程)...")
+                rows = await self._supervisor.scrape(source, self.source_timeout)
+                proxies = [proxy for proxy in (self._convert_row(row, source) for row in rows) if proxy]
+                log.info(f"从 {source} 获取到 {len(proxies)} 个代理")
+            else:
+                self._running.add(source)
+                future = self._executor.submit(self._fetch_from_source, source)
+                # 线程结束(包括超时后才结束)时才允许再次抓取该代理源
+                future.add_done_callback(lambda _: self._running.discard(source))
+                proxies = await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.source_timeout)
+        except asyncio.TimeoutError:
+            self.sources.record_fetch(source, 0, time.perf_counter() - start_time, error=True)
+            raise TimeoutError(f"{source} 抓取超时({self.source_timeout}s)")
+        except Exception:
+            self.sources.record_fetch(source, 0, time.perf_counter() - start_time, error=True)
+            raise
+        
+        self.sources.record_fetch(source, len(proxies), time.perf_counter() - start_time)
+        if self.cache is not None and proxies:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.cache.put, source, proxies)
+        return proxies
+    
+    async def fetch_proxies(self, count: int = 50, known_keys: Optional[Container] = None) -> List[ProxyModel]:
         """
         获取代理列表
         
         Args:
             count: 需要获取的代理数量
+            known_keys: 已知代理的去重键集合(可选),这些代理不会再返回
             
         Returns:
             代理列表
         """
+        return [proxy async for proxy in self.stream_proxies(count, known_keys)]
+    
+    async def stream_proxies(
+        self,
+        count: int = 50,
+        known_keys: Optional[Container] = None,
+        skip: Optional[Callable[[tuple], bool]] = None,
+    ) -> AsyncIterator[ProxyModel]:
+        """
+        流式获取代理:选中的代理源并发抓取,每个代理源完成后立即产出其中的新代理,
+        慢速或卡住的代理源不会阻塞其他代理源
+        
+        Args:
+            count: 需要获取的代理数量
+            known_keys: 已知代理的去重键集合(可选),在产出时检查,可随代理池变化
+            skip: 按去重键判断是否跳过代理的函数(可选,如最近失效的代理),
+                与 known_keys 一样,跳过的代理不计入 count
+            
+        Yields:
+            去重后的代理
+        """
         log.info(f"开始获取代理,目标数量: {count}")
-        proxies = []
         
+        # 按各代理源的历史产出选择代理源,预期有效代理数满足需求即可
+        selected_sources = self.sources.select(count * self.sources.valid_ratio)
+        
+        log.info(f"本次使用代理源: {', '.join(selected_sources)}")
+        
+        # 并发抓取选中的源,按完成顺序去重、跳过已知代理并限制数量
+        tasks = [asyncio.ensure_future(self.fetch_source(source)) for source in selected_sources]
+        seen = set()
+        yielded = 0
+        known_count = 0
         try:
-            # 使用线程池执行同步的 pyfreeproxy 调用
-            loop = asyncio.get_event_loop()
-            
-            # 计算需要使用的代理源数量（最多使用5个源，但会轮换）
-            sources_to_use = min(5, len(self.PROXY_SOURCES))
-            
-            # 使用轮换策略选择代理源
-            selected_sources = []
-            for i in range(sources_to_use):
-                source_idx = (self._source_index + i) % len(self.PROXY_SOURCES)
-                selected_sources.append(self.PROXY_SOURCES[source_idx])
-            
-            # 更新索引，下次从不同位置开始
-            self._source_index = (self._source_index + sources_to_use) % len(self.PROXY_SOURCES)
-            
-            log.info(f"本次使用代理源: {', '.join(selected_sources)}")
-            
-            # 从选中的源获取代理
-            for source in selected_sources:
+            for finished in asyncio.as_completed(tasks):
                 try:
-                    source_proxies = await loop.run_in_executor(
-                        None,
-                        self._fetch_from_source,
-                        source
-                    )
-                    proxies.extend(source_proxies)
-                    
-                    if len(proxies) >= count:
-                        break
-                        
+                    source_proxies = await finished
                 except Exception as e:
-                    log.warning(f"从 {source} 获取代理失败: {e}")
+                    log.warning(f"获取代理失败: {e}")
                     continue
-            
-            # 去重并限制数量
-            unique_proxies = []
-            seen = set()
-            for proxy in proxies:
-                if proxy.proxy_url not in seen:
-                    seen.add(proxy.proxy_url)
-                    unique_proxies.append(proxy)
-                    if len(unique_proxies) >= count:
+                
+                for proxy in source_proxies:
+                    key = proxy.canonical_key
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    if known_keys is not None and key in known_keys:
+                        known_count += 1
+                        continue
+                    if skip is not None and skip(key):
+                        continue
+                    yield proxy
+                    yielded += 1
+                    if yielded >= count:
                         break
-            
-            log.info(f"成功获取 {len(unique_proxies)} 个代理")
-            return unique_proxies
-            
-        except Exception as e:
-            log.error(f"获取代理失败: {e}")
-            return []
+                if yielded >= count:
+                    break
+        finally:
+            # 已获取足够代理或被取消时,不再等待其余代理源
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        
+        if known_count:
+            log.info(f"跳过 {known_count} 个代理池中已有的代理")
+        log.info(f"成功获取 {yielded} 个代理")
     
     def _fetch_from_source(self, source: str) -> List[ProxyModel]:
         """
@@ -166,8 +293,28 @@ class ProxyFetcher:
             ProxyModel
         """
         try:
+            row = proxy_info_to_row(proxy_info)
+        except Exception as e:
+            log.error(f"转换 ProxyInfo 失败: {e}")
+            return None
+        return self._convert_row(row, source)
+    
+    def _convert_row(self, row: ProxyRow, source: str) -> ProxyModel:
+        """
+        将抓取得到的代理行转换为 ProxyModel
+        
+        Args:
+            row: 代理行 (ip, port, protocol, country_code, anonymity, delay)
+            source: 代理来源
+            
+        Returns:
+            ProxyModel
+        """
+        try:
+            ip, port, protocol_str, country_code, anonymity, delay = row
+            
             # 解析协议
-            protocol_str = proxy_info.protocol.lower()
+            protocol_str = protocol_str.lower()
             if protocol_str == "http":
                 protocol = ProxyProtocol.HTTP
             elif protocol_str == "https":
@@ -181,17 +328,17 @@ class ProxyFetcher:
             
             # 创建代理模型
             proxy = ProxyModel(
-                host=proxy_info.ip,
-                port=int(proxy_info.port),
+                host=ip,
+                port=int(port),
                 protocol=protocol,
-                country=proxy_info.country_code,
-                anonymity=proxy_info.anonymity,
-                speed=proxy_info.delay / 1000.0 if proxy_info.delay else None,  # 转换为秒
+                country=country_code,
+                anonymity=anonymity,
+                speed=delay / 1000.0 if delay else None,  # 转换为秒
                 source=source,  # 设置代理来源
             )
             
             return proxy
             
         except Exception as e:
-            log.error(f"转换 ProxyInfo 失败: {e}")
+            log.error(f"转换代理失败: {e}")
             return None
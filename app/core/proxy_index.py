@@ -0,0 +1,234 @@
+"""代理选择索引模块"""
+
+import heapq
+import itertools
+import random
+from typing import Dict, List, Optional, Tuple
+
+
+class ProxyIndex:
+    """
+    代理选择索引
+
+    维护有效代理集合,随代理池的每次变更增量更新,避免每次选取时排序整个代理池:
+    - 稠密槽位数组 + 位置映射: 增删 O(1),随机选取 O(1)
+    - 按排序分值(越小越优)的小顶堆: 采用惰性删除,选取最优代理摊还 O(log n)
+    - 按槽位的树状数组(Fenwick)维护权重前缀和: 加权随机选取 O(log n)
+    """
+
+    def __init__(self):
+        self._slots: List[str] = []  # 有效代理 ID 的稠密数组
+        self._pos: Dict[str, int] = {}  # 代理 ID -> 槽位下标
+        self._rank: Dict[str, float] = {}  # 代理 ID -> 当前排序分值
+        self._heap: List[Tuple[float, int, str]] = []  # (分值, 序号, 代理 ID)
+        self._entry: Dict[str, int] = {}  # 代理 ID -> 堆中当前有效条目的序号
+        self._seq = itertools.count()
+        self._weights: List[float] = []  # 槽位 -> 权重
+        self._tree: List[float] = [0.0]  # 权重树状数组(下标从 1 开始)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, proxy_id: str) -> bool:
+        return proxy_id in self._pos
+
+    def update(self, proxy_id: str, rank: float, weight: float = 1.0):
+        """
+        新增代理或更新其排序分值
+
+        Args:
+            proxy_id: 代理 ID
+            rank: 排序分值,越小越优先
+            weight: 加权随机选取的权重
+        """
+        pos = self._pos.get(proxy_id)
+        if pos is None:
+            self._pos[proxy_id] = len(self._slots)
+            self._slots.append(proxy_id)
+            self._append_weight(weight)
+        else:
+            if self._weights[pos] != weight:
+                self._add_weight(pos, weight - self._weights[pos])
+            if self._rank.get(proxy_id) == rank:
+                return
+
+        self._rank[proxy_id] = rank
+        seq = next(self._seq)
+        self._entry[proxy_id] = seq
+        heapq.heappush(self._heap, (rank, seq, proxy_id))
+        self._maybe_compact()
+
+    def discard(self, proxy_id: str) -> bool:
+        """
+        从索引中移除代理
+
+        Args:
+            proxy_id: 代理 ID
+
+        Returns:
+            代理是否在索引中
+        """
+        pos = self._pos.pop(proxy_id, None)
+        if pos is None:
+            return False
+
+        # 用最后一个槽位填补空缺
+        last_id = self._slots.pop()
+        last_weight = self._weights.pop()
+        self._tree.pop()
+        if last_id != proxy_id:
+            self._slots[pos] = last_id
+            self._pos[last_id] = pos
+            self._add_weight(pos, last_weight - self._weights[pos])
+
+        # 堆条目惰性删除
+        self._rank.pop(proxy_id, None)
+        self._entry.pop(proxy_id, None)
+        return True
+
+    def rank_of(self, proxy_id: str) -> Optional[float]:
+        """
+        获取代理在索引中的排序分值
+
+        Args:
+            proxy_id: 代理 ID
+
+        Returns:
+            排序分值,不在索引中时返回 None
+        """
+        return self._rank.get(proxy_id)
+
+    def best(self) -> Optional[str]:
+        """
+        获取排序分值最优的代理 ID
+
+        Returns:
+            代理 ID,索引为空时返回 None
+        """
+        heap = self._heap
+        while heap:
+            _, seq, proxy_id = heap[0]
+            if self._entry.get(proxy_id) == seq:
+                return proxy_id
+            heapq.heappop(heap)
+        return None
+
+    def choice(self, rng: Optional[random.Random] = None) -> Optional[str]:
+        """
+        均匀随机选取一个代理 ID
+
+        Args:
+            rng: 随机数生成器(可选)
+
+        Returns:
+            代理 ID,索引为空时返回 None
+        """
+        if not self._slots:
+            return None
+        index = (rng or random).randrange(len(self._slots))
+        return self._slots[index]
+
+    def weighted_choice(self, rng: Optional[random.Random] = None) -> Optional[str]:
+        """
+        按权重随机选取一个代理 ID
+
+        Args:
+            rng: 随机数生成器(可选)
+
+        Returns:
+            代理 ID,索引为空或总权重为 0 时返回 None
+        """
+        n = len(self._slots)
+        total = self._prefix(n)
+        if n == 0 or total <= 0:
+            return None
+
+        # 在树状数组上二分查找前缀和首次超过目标值的槽位
+        target = (rng or random).random() * total
+        tree = self._tree
+        idx = 0
+        step = 1 << n.bit_length()
+        while step:
+            nxt = idx + step
+            if nxt <= n and tree[nxt] <= target:
+                idx = nxt
+                target -= tree[nxt]
+            step >>= 1
+        return self._slots[min(idx, n - 1)]
+
+    def slot(self, position: int) -> Optional[str]:
+        """
+        按槽位获取代理 ID(位置按索引大小取模)
+
+        Args:
+            position: 槽位位置
+
+        Returns:
+            代理 ID,索引为空时返回 None
+        """
+        if not self._slots:
+            return None
+        return self._slots[position % len(self._slots)]
+
+    def ids(self) -> List[str]:
+        """
+        获取索引中所有代理 ID
+
+        Returns:
+            代理 ID 列表
+        """
+        return list(self._slots)
+
+    def clear(self):
+        """清空索引"""
+        self._slots.clear()
+        self._pos.clear()
+        self._rank.clear()
+        self._heap.clear()
+        self._entry.clear()
+        self._weights.clear()
+        self._tree = [0.0]
+
+    def _maybe_compact(self):
+        """过期堆条目过多时重建堆,保证堆大小与有效代理数同阶"""
+        if len(self._heap) <= 2 * len(self._slots) + 64:
+            return
+        self._heap = [
+            (self._rank[pid], self._entry[pid], pid) for pid in self._slots
+        ]
+        heapq.heapify(self._heap)
+        self._rebuild_tree()
+
+    def _prefix(self, position: int) -> float:
+        """前 position 个槽位的权重和"""
+        tree = self._tree
+        total = 0.0
+        while position > 0:
+            total += tree[position]
+            position -= position & -position
+        return total
+
+    def _add_weight(self, pos: int, delta: float):
+        """槽位 pos 的权重增加 delta"""
+        self._weights[pos] += delta
+        tree = self._tree
+        i = pos + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def _append_weight(self, weight: float):
+        """在末尾追加一个槽位的权重"""
+        self._weights.append(weight)
+        i = len(self._weights)
+        low = i & -i
+        self._tree.append(weight + self._prefix(i - 1) - self._prefix(i - low))
+
+    def _rebuild_tree(self):
+        """按当前权重重建树状数组,消除浮点累计误差"""
+        tree = [0.0] + list(self._weights)
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
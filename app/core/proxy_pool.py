@@ -1,21 +1,228 @@
 """代理池管理模块"""
 
 import asyncio
+import random
+from abc import ABC, abstractmethod
+import time
 import uuid
+from collections import OrderedDict
 from datetime import datetime
-from typing import List, Optional, Dict
-from app.models import ProxyModel, ProxyStatsModel
+from typing import List, Optional, Dict, Tuple
+from app.models import CircuitState, ProxyModel, ProxyStatsModel, ProxyStrategy
 from app.core.proxy_fetcher import ProxyFetcher
+from app.core.proxy_index import ProxyIndex
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.pool_store import PoolSnapshotStore
+from app.core.pool_stats import PoolStats
+from app.core.shared_pool import MaintainerLock
+from app.core.host_scoreboard import HostScoreboard
+from app.core.revalidation import RevalidationScheduler
+from app.core.attribute_index import AttributeIndex
+from app.core.negative_cache import DeadProxyCache
+from app.core.latency import LatencyTracker
 from app.core.proxy_validator import ProxyValidator
 from app.config import settings
 from app.utils import log
 
 
+class ProxyPoolSaturatedError(Exception):
+    """代理池中有可用代理,但都已达到单个代理的并发上限"""
+
+
+class SelectionStrategy(ABC):
+    """
+    代理选择策略基类
+    
+    子类实现 select,从选择索引中挑选一个代理 ID
+    """
+    
+    name: str = ""
+    
+    @abstractmethod
+    def select(self, index: ProxyIndex, pool: "ProxyPool") -> Optional[str]:
+        """
+        选择代理
+        
+        Args:
+            index: 候选代理的选择索引
+            pool: 代理池(用于读取在途请求数等运行时状态)
+            
+        Returns:
+            代理 ID,无可用代理时返回 None
+        """
+
+
+class FastestStrategy(SelectionStrategy):
+    """最快优先:始终选择排序分值最优的代理"""
+    
+    name = ProxyStrategy.FASTEST.value
+    
+    def select(self, index: ProxyIndex, pool: "ProxyPool") -> Optional[str]:
+        return index.best()
+
+
+class RoundRobinStrategy(SelectionStrategy):
+    """轮询:依次遍历所有有效代理"""
+    
+    name = ProxyStrategy.ROUND_ROBIN.value
+    
+    def __init__(self):
+        self._cursor = 0
+    
+    def select(self, index: ProxyIndex, pool: "ProxyPool") -> Optional[str]:
+        proxy_id = index.slot(self._cursor)
+        self._cursor = (self._cursor + 1) % max(len(index), 1)
+        return proxy_id
+
+
+class WeightedRandomStrategy(SelectionStrategy):
+    """加权随机:按延迟倒数加权随机选择,越快的代理被选中的概率越高"""
+    
+    name = ProxyStrategy.WEIGHTED_RANDOM.value
+    
+    def select(self, index: ProxyIndex, pool: "ProxyPool") -> Optional[str]:
+        return index.weighted_choice(pool.rng) or index.choice(pool.rng)
+
+
+class PowerOfTwoStrategy(SelectionStrategy):
+    """二选一:随机抽取两个代理,选择在途请求更少、速度更快的一个"""
+    
+    name = ProxyStrategy.POWER_OF_TWO.value
+    
+    def select(self, index: ProxyIndex, pool: "ProxyPool") -> Optional[str]:
+        first = index.choice(pool.rng)
+        second = index.choice(pool.rng)
+        if first is None or second is None or first == second:
+            return first
+        
+        def load(proxy_id: str):
+            return pool.in_flight(proxy_id), index.rank_of(proxy_id)
+        
+        return first if load(first) <= load(second) else second
+
+
+class LeastInFlightStrategy(SelectionStrategy):
+    """最少在途:选择当前在途请求数最少的代理,空闲代理之间随机选择"""
+    
+    name = ProxyStrategy.LEAST_IN_FLIGHT.value
+    
+    # 随机抽样寻找空闲代理的最大次数
+    max_samples = 8
+    
+    def select(self, index: ProxyIndex, pool: "ProxyPool") -> Optional[str]:
+        if not len(index):
+            return None
+        
+        # 在途代理可能不在索引中(半开试探、已熔断或被过滤条件排除),只统计索引中的
+        busy = pool._in_flight
+        busy_in_index = [pid for pid in busy if pid in index]
+        if len(busy_in_index) < len(index):
+            # 存在空闲代理:空闲代理占多数时随机抽样,否则扫描(此时代理数不超过在途数的两倍)
+            if len(busy_in_index) * 2 <= len(index):
+                for _ in range(self.max_samples):
+                    proxy_id = index.choice(pool.rng)
+                    if proxy_id not in busy:
+                        return proxy_id
+            idle = [pid for pid in index.ids() if pid not in busy]
+            if idle:
+                return pool.rng.choice(idle)
+        
+        # 所有代理都有在途请求,选择在途数最少的
+        return min(
+            busy_in_index,
+            key=lambda pid: (busy[pid], index.rank_of(pid)),
+            default=None,
+        )
+
+
+class FastHandshakeStrategy(SelectionStrategy):
+    """握手最快:随机抽取几个代理,选择连接与 TLS 握手中位耗时最短的一个,适合小请求"""
+    
+    name = ProxyStrategy.FAST_HANDSHAKE.value
+    
+    samples = 3
+    
+    def select(self, index: ProxyIndex, pool: "ProxyPool") -> Optional[str]:
+        candidates = {index.choice(pool.rng) for _ in range(self.samples)} - {None}
+        
+        def key(proxy_id: str):
+            # 没有握手样本的代理排在有样本的代理之后,再按健康评分排序
+            handshake = pool.latency.handshake(proxy_id)
+            return handshake is None, handshake or 0.0, index.rank_of(proxy_id)
+        
+        return min(candidates, key=key, default=None)
+
+
+class HighThroughputStrategy(SelectionStrategy):
+    """高吞吐:随机抽取几个代理,选择中位传输速率最高的一个,适合大文件下载"""
+    
+    name = ProxyStrategy.HIGH_THROUGHPUT.value
+    
+    samples = 3
+    
+    def select(self, index: ProxyIndex, pool: "ProxyPool") -> Optional[str]:
+        candidates = {index.choice(pool.rng) for _ in range(self.samples)} - {None}
+        
+        def key(proxy_id: str):
+            rate = pool.latency.transfer_rate(proxy_id)
+            return rate is None, -(rate or 0.0), index.rank_of(proxy_id)
+        
+        return min(candidates, key=key, default=None)
+
+
+# 内置选择策略
+STRATEGIES = {
+    strategy.name: strategy
+    for strategy in (
+        FastestStrategy,
+        RoundRobinStrategy,
+        WeightedRandomStrategy,
+        PowerOfTwoStrategy,
+        LeastInFlightStrategy,
+        FastHandshakeStrategy,
+        HighThroughputStrategy,
+    )
+}
+
+
 class ProxyPool:
     """代理池管理器"""
     
+    # 选择时随机跳过不合格代理(达到并发上限或被目标站点封禁)的最大次数,超过后改为扫描
+    max_selection_skips = 16
+    
     def __init__(self):
         self.proxies: Dict[str, ProxyModel] = {}
+        self._index = ProxyIndex()  # 有效代理选择索引,随代理池变更增量维护
+        self.attributes = AttributeIndex()  # 国家/协议/匿名度/来源二级索引,用于过滤查询
+        self._by_key: Dict[Tuple[str, int, str], str] = {}  # 去重键 (主机, 端口, 协议) -> 代理 ID
+        self.dead_cache = DeadProxyCache() if settings.proxy_negative_cache_enabled else None  # 最近失效的代理
+        self._in_flight: Dict[str, int] = {}  # 代理 ID -> 在途请求数(仅记录大于 0 的)
+        self._in_flight_total = 0
+        self.max_in_flight = settings.proxy_max_in_flight  # 单个代理并发上限,0 表示不限制
+        self._saturated: set = set()  # 在途请求数达到上限的代理 ID
+        self.stats = PoolStats()  # 增量统计,随代理池变更更新
+        self._strategies: Dict[str, SelectionStrategy] = {
+            name: strategy_cls() for name, strategy_cls in STRATEGIES.items()
+        }
+        self.default_strategy = settings.proxy_selection_strategy
+        self.rng = random.Random()
+        self.health_alpha = settings.proxy_health_alpha
+        self.circuit = CircuitBreaker()  # 失败代理熔断冷却,而不是直接删除
+        self.half_open_ratio = settings.proxy_circuit_half_open_ratio
+        self.circuit_probe_interval = settings.proxy_circuit_probe_interval
+        self._circuit_task: Optional[asyncio.Task] = None
+        self.revalidation = RevalidationScheduler()  # 按到期顺序滚动重新验证代理
+        self.revalidate_rate = settings.proxy_revalidate_rate
+        self._revalidate_task: Optional[asyncio.Task] = None
+        self._revalidating: Dict[str, asyncio.Task] = {}  # 正在重新验证的代理 ID -> 验证任务
+        self.latency = LatencyTracker()  # 按代理的分阶段耗时滚动窗口(仅本进程)
+        self._pipeline_queues: tuple = ()  # 补充流水线中的预筛队列和验证队列(用于统计排队深度)
+        self.host_scores = HostScoreboard()  # 按目标站点的代理表现及封禁状态
+        self.host_affinity_ratio = settings.proxy_host_affinity_ratio
+        self._sessions: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()  # 会话 ID -> (代理 ID, 过期时间)
+        self.session_ttl = settings.proxy_session_ttl
+        self.max_sessions = settings.proxy_session_max
         self.fetcher = ProxyFetcher()
         self.validator = ProxyValidator()
         self.update_interval = settings.proxy_update_interval
@@ -24,25 +231,79 @@ class ProxyPool:
         self._update_task: Optional[asyncio.Task] = None
         self._refill_task: Optional[asyncio.Task] = None  # 防止重复补充任务
         self._refill_threshold = int(self.pool_size * 0.5)  # 当代理数低于50%时触发补充
+        self.snapshot_store = PoolSnapshotStore(settings.proxy_snapshot_path) if settings.proxy_snapshot_enabled else None
+        self.snapshot_interval = settings.proxy_snapshot_interval
+        self._snapshot_task: Optional[asyncio.Task] = None
+        
+        # 多进程共享模式:持有维护锁的进程负责抓取/验证并发布快照,其他进程读取快照并上报请求结果
+        self.shared = settings.proxy_pool_mode == "shared"
+        self.is_maintainer = True
+        self.shared_sync_interval = settings.proxy_shared_sync_interval
+        self._shared_task: Optional[asyncio.Task] = None
+        self._shared_version = 0
+        self._outbox: List[tuple] = []  # 待上报给维护进程的 (类型, 代理 ID, 是否成功, 耗时)
+        if self.shared:
+            self.snapshot_store = self.snapshot_store or PoolSnapshotStore(settings.proxy_snapshot_path)
+            self._maintainer_lock = MaintainerLock(f"{settings.proxy_snapshot_path}.lock")
     
     async def start(self):
         """启动代理池"""
         log.info("启动代理池管理器")
+        start_time = time.perf_counter()
+        
+        if self.shared:
+            self.is_maintainer = self._maintainer_lock.acquire()
+            log.info(f"共享代理池模式:当前进程为{'维护' if self.is_maintainer else '只读'}进程")
+        
+        if self.is_maintainer:
+            restored = await self._quick_start()
+        else:
+            restored = await self._reload_shared_snapshot()
+            log.info(f"从共享快照加载 {restored} 个代理,其中可用 {self.valid_count} 个")
         
+        log.info(f"代理池启动耗时 {time.perf_counter() - start_time:.2f}s")
+        
+        if self.is_maintainer:
+            self._start_maintenance_tasks()
+        if self.shared:
+            self._shared_task = asyncio.create_task(self._shared_sync_loop())
+    
+    async def _quick_start(self) -> int:
+        """
+        快速启动:优先从快照恢复,可用代理不足时快速获取少量代理
+        
+        Returns:
+            从快照恢复的代理数量
+        """
         # 快速启动策略:先获取少量代理,快速启动服务
         # 只需要 10 个有效代理即可启动,获取 50 个原始代理(预期有效率 20%)
         quick_start_count = 10  # 快速启动只需要 10 个有效代理
-        log.info(f"快速启动模式:先获取 {quick_start_count} 个有效代理")
         
-        # 快速启动时使用较小的倍数和单次尝试
-        await self.update_pool(target_count=quick_start_count, max_attempts=1, fetch_multiplier=5)
-        
-        # 启动后台任务
+        # 热启动:从快照恢复上次的代理及健康数据,有足够可用代理时直接提供服务,由滚动验证按过期程度重新验证
+        restored = await self.restore_snapshot()
+        if self.valid_count >= quick_start_count:
+            log.info(f"热启动模式:从快照恢复 {restored} 个代理,其中可用 {self.valid_count} 个")
+        else:
+            log.info(f"快速启动模式:先获取 {quick_start_count} 个有效代理")
+            
+            # 快速启动时只尝试一轮
+            await self.update_pool(target_count=quick_start_count, max_attempts=1)
+        return restored
+    
+    def _start_maintenance_tasks(self):
+        """启动维护代理池的后台任务"""
         # 1. 持续补充代理到目标数量
         self._update_task = asyncio.create_task(self._background_tasks())
+        # 2. 滚动重新验证现有代理
+        self._revalidate_task = asyncio.create_task(self._revalidation_loop())
+        # 3. 定期探测熔断冷却结束的代理
+        self._circuit_task = asyncio.create_task(self._circuit_probe_loop())
+        # 4. 定期保存代理池快照(共享模式下由同步任务负责)
+        if self.snapshot_store and not self.shared:
+            self._snapshot_task = asyncio.create_task(self._snapshot_loop())
     
     async def _background_tasks(self):
-        """后台任务:持续补充代理 + 定时更新"""
+        """后台任务:持续补充代理 + 定时补充(现有代理由滚动验证任务重新验证)"""
         # 首先补充到目标数量
         await asyncio.sleep(2)  # 等待服务完全启动
         log.info("后台任务:开始补充代理到目标数量")
@@ -52,23 +313,241 @@ class ProxyPool:
         while True:
             try:
                 await asyncio.sleep(self.update_interval)
-                log.info("定时更新代理池: 开始重新验证现有代理")
-                
-                # 先验证现有代理有效性
-                await self.validate_pool()
-                
-                # 再补充新代理
+                log.info("定时更新代理池: 补充新代理")
                 await self.update_pool()
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 log.error(f"后台任务失败: {e}")
     
+    async def _revalidation_loop(self):
+        """
+        后台任务:滚动重新验证
+        
+        每秒按配置速率取出到期的代理逐个验证,代替定时对整个代理池集中验证,
+        使出站验证流量保持平稳,且最久未验证、失败风险最高的代理最先验证
+        """
+        # 接管维护时,补登记由快照加载的代理
+        for proxy in self.proxies.values():
+            if proxy.id not in self.revalidation:
+                self.revalidation.schedule(proxy)
+        
+        # 同时进行的验证数上限:按速率和验证超时估算,避免验证变慢时堆积
+        max_pending = max(1, int(self.revalidate_rate * self.validator.timeout))
+        credit = 0.0
+        while True:
+            try:
+                await asyncio.sleep(1)
+                credit = min(credit + self.revalidate_rate, max(self.revalidate_rate, 1.0))
+                budget = min(int(credit), max_pending - len(self._revalidating))
+                if budget <= 0:
+                    continue
+                
+                for proxy_id in self.revalidation.pop_due(budget):
+                    proxy = self.proxies.get(proxy_id)
+                    if proxy is None:
+                        continue
+                    credit -= 1
+                    if proxy.circuit_state != CircuitState.CLOSED:
+                        # 熔断中的代理由半开探测负责,推迟到下一个验证间隔
+                        self.revalidation.schedule(proxy, time.time() + self.revalidation.interval)
+                        continue
+                    task = asyncio.create_task(self._revalidate_proxy(proxy))
+                    self._revalidating[proxy_id] = task
+                    task.add_done_callback(lambda _, pid=proxy_id: self._revalidating.pop(pid, None))
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                log.error(f"滚动验证任务失败: {e}")
+    
+    async def _revalidate_proxy(self, proxy: ProxyModel):
+        """
+        重新验证单个代理并安排下次验证
+        
+        Args:
+            proxy: 代理模型
+        """
+        # 验证副本,避免验证期间代理因请求失败熔断后被验证结果覆盖有效性
+        probe = await self.validator.validate_proxy(proxy.model_copy())
+        proxy.last_checked = datetime.now()
+        if proxy.id not in self.proxies:
+            return
+        if proxy.circuit_state == CircuitState.CLOSED:
+            proxy.is_valid = probe.is_valid
+            if probe.is_valid:
+                proxy.speed = probe.speed
+                proxy.anonymity = probe.anonymity
+                proxy.timings = probe.timings
+            self._apply_validation(proxy)
+            if not proxy.is_valid:
+                log.info(f"滚动验证发现代理失效,已熔断: {proxy.proxy_url}")
+        self.revalidation.schedule(proxy)
+    
+    async def _circuit_probe_loop(self):
+        """后台任务:定期用验证请求探测半开代理"""
+        while True:
+            try:
+                await asyncio.sleep(self.circuit_probe_interval)
+                await self.probe_half_open()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                log.error(f"熔断探测任务失败: {e}")
+    
+    async def _snapshot_loop(self):
+        """后台任务:定期保存代理池快照"""
+        while True:
+            try:
+                await asyncio.sleep(self.snapshot_interval)
+                await self.save_snapshot()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                log.error(f"保存代理池快照失败: {e}")
+    
+    async def _shared_sync_loop(self):
+        """
+        后台任务:共享模式下的进程间同步
+        
+        维护进程汇总其他进程上报的结果并发布快照;只读进程上报结果、加载新快照,
+        并在维护进程退出后尝试接管
+        """
+        while True:
+            try:
+                await asyncio.sleep(self.shared_sync_interval)
+                if self.is_maintainer:
+                    await self._ingest_outcomes()
+                    await self.save_snapshot()
+                    continue
+                
+                await self._flush_outbox()
+                if self._maintainer_lock.acquire():
+                    log.info("维护进程已退出,当前进程接管代理池维护")
+                    self.is_maintainer = True
+                    self._start_maintenance_tasks()
+                else:
+                    await self._reload_shared_snapshot()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                log.error(f"共享代理池同步失败: {e}")
+    
+    async def _ingest_outcomes(self):
+        """维护进程:应用其他进程上报的代理使用结果"""
+        loop = asyncio.get_event_loop()
+        outcomes = await loop.run_in_executor(None, self.snapshot_store.pop_outcomes)
+        for kind, proxy_id, success, latency in outcomes:
+            if kind == "result":
+                self.report_result(proxy_id, success, latency)
+            elif kind == "invalid":
+                self.mark_proxy_invalid(proxy_id)
+            elif kind == "remove":
+                self.remove_proxy(proxy_id)
+        if outcomes:
+            log.debug(f"汇总其他进程上报的 {len(outcomes)} 条代理使用结果")
+    
+    async def _flush_outbox(self):
+        """只读进程:上报本进程的代理使用结果"""
+        if not self._outbox:
+            return
+        outcomes, self._outbox = self._outbox, []
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, self.snapshot_store.push_outcomes, outcomes)
+    
+    async def _reload_shared_snapshot(self) -> int:
+        """
+        只读进程:快照版本变化时加载变更的代理
+
+        只读取上次加载之后写入的代理和删除记录;第一次加载或落后太多时完整加载
+        
+        Returns:
+            加载的代理数量,快照未变化时返回 0
+        """
+        loop = asyncio.get_event_loop()
+        version = await loop.run_in_executor(None, self.snapshot_store.version)
+        if version == self._shared_version:
+            return 0
+        
+        version, full, proxies, removed_ids = await loop.run_in_executor(
+            None, self.snapshot_store.changes, self._shared_version
+        )
+        self._shared_version = version
+        
+        if full:
+            loaded_ids = {proxy.id for proxy in proxies}
+            removed_ids = [pid for pid in self.proxies if pid not in loaded_ids]
+        for proxy_id in removed_ids:
+            if proxy_id in self.proxies:
+                self._drop_proxy(proxy_id)
+        for proxy in proxies:
+            current = self.proxies.get(proxy.id)
+            # 熔断状态未变化时冷却堆中已有对应条目,不再重复登记
+            rescheduled = (
+                current is None
+                or current.circuit_state != proxy.circuit_state
+                or current.circuit_open_until != proxy.circuit_open_until
+            )
+            if rescheduled:
+                self.circuit.forget(proxy.id)
+            if self.add_proxy(proxy) is proxy and rescheduled:
+                self.circuit.schedule(proxy)
+        return len(proxies)
+    
+    async def save_snapshot(self) -> int:
+        """
+        保存代理池快照,代理池与上次保存时相同则跳过
+        
+        Returns:
+            保存的代理数量,快照未变化时返回 0
+        """
+        if not self.snapshot_store:
+            return 0
+        
+        # 在事件循环中复制列表,在线程中序列化和写入
+        proxies = [proxy.model_copy() for proxy in self.proxies.values()]
+        loop = asyncio.get_event_loop()
+        count = await loop.run_in_executor(None, self.snapshot_store.save, proxies)
+        if count is None:
+            return 0
+        log.debug(f"已保存代理池快照: {count} 个代理")
+        return count
+    
+    async def restore_snapshot(self) -> int:
+        """
+        从快照恢复代理池
+        
+        Returns:
+            恢复的代理数量
+        """
+        if not self.snapshot_store:
+            return 0
+        
+        try:
+            loop = asyncio.get_event_loop()
+            proxies = await loop.run_in_executor(None, self.snapshot_store.load)
+        except Exception as e:
+            log.error(f"读取代理池快照失败: {e}")
+            return 0
+        
+        restored = 0
+        for proxy in proxies:
+            if proxy.id in self.proxies or self.circuit.is_exhausted(proxy):
+                continue
+            # 旧快照中可能存在重复代理,重复项合并到已恢复的代理
+            if self.add_proxy(proxy) is proxy:
+                self.circuit.schedule(proxy)
+                restored += 1
+        return restored
+    
     async def stop(self):
         """停止代理池"""
         log.info("停止代理池管理器")
 
-        for task in (self._update_task, self._refill_task):
+        tasks = (
+            self._update_task, self._refill_task, self._revalidate_task, self._circuit_task,
+            self._snapshot_task, self._shared_task, *self._revalidating.values(),
+        )
+        for task in tasks:
             if task and not task.done():
                 task.cancel()
                 try:
@@ -77,17 +556,41 @@ class ProxyPool:
                     pass
         self._update_task = None
         self._refill_task = None
+        self._revalidate_task = None
+        self._revalidating.clear()
+        self._circuit_task = None
+        self._snapshot_task = None
+        self._shared_task = None
+        
+        try:
+            if self.is_maintainer:
+                await self.save_snapshot()
+            else:
+                await self._flush_outbox()
+        except Exception as e:
+            log.error(f"保存代理池快照失败: {e}")
+        
+        try:
+            self.fetcher.close()
+        except Exception as e:
+            log.error(f"关闭代理获取器失败: {e}")
+        
+        if self.shared:
+            self._maintainer_lock.release()
     
     
-    async def update_pool(self, target_count: int = None, max_attempts: int = 3, fetch_multiplier: int = 5):
+    async def update_pool(self, target_count: int = None, max_attempts: int = 3):
         """
         更新代理池
         
         Args:
             target_count: 目标代理数量,默认使用配置的 pool_size
             max_attempts: 最大尝试轮数,默认 3 轮
-            fetch_multiplier: 获取倍数,默认 5 倍(考虑到 20% 有效率)
         """
+        if not self.is_maintainer:
+            log.info("当前进程不是代理池维护进程,跳过更新")
+            return
+        
         try:
             target = target_count or self.pool_size
             log.info(f"开始更新代理池,目标: {target} 个有效代理")
@@ -96,7 +599,7 @@ class ProxyPool:
             self._cleanup_invalid_proxies()
             
             # 计算需要获取的代理数量
-            current_valid = len(self.get_valid_proxies())
+            current_valid = self.valid_count
             needed = max(target - current_valid, 0)
             
             if needed == 0:
@@ -105,48 +608,32 @@ class ProxyPool:
             
             log.info(f"当前有效代理: {current_valid}/{target}, 需要补充: {needed} 个")
             
-            # 由于免费代理质量较低,获取更多代理以确保有足够的有效代理
-            # 使用可配置的倍数
-            fetch_count = needed * fetch_multiplier
+            # 由于免费代理质量较低,按各代理源观测到的有效率估算需要获取的代理数
+            fetch_count = self.fetcher.sources.estimate_fetch_count(needed)
             
             for attempt in range(1, max_attempts + 1):
                 log.info(f"第 {attempt}/{max_attempts} 轮获取代理,目标: {fetch_count} 个")
                 
-                # 获取新代理
-                new_proxies = await self.fetcher.fetch_proxies(fetch_count)
-                
-                if not new_proxies:
-                    log.warning(f"第 {attempt} 轮未获取到新代理")
-                    continue
-                
-                # 验证代理
-                valid_proxies = await self.validator.get_valid_proxies(new_proxies)
-                
-                # 添加到代理池
-                added_count = 0
-                for proxy in valid_proxies:
-                    proxy.id = str(uuid.uuid4())
-                    proxy.last_checked = datetime.now()
-                    self.proxies[proxy.id] = proxy
-                    added_count += 1
+                # 抓取、验证、入池流水线执行,达到目标后立即停止
+                added_count = await self._fill_pool(target, fetch_count)
                 
                 log.info(f"第 {attempt} 轮添加了 {added_count} 个有效代理")
                 
                 # 检查是否达到目标
-                current_valid = len(self.get_valid_proxies())
+                current_valid = self.valid_count
                 if current_valid >= target:
                     log.info(f"已达到目标代理数,当前有效代理: {current_valid}/{target}")
                     break
                 
                 # 如果还未达到目标,减少下一轮的获取数量
                 remaining = target - current_valid
-                fetch_count = remaining * fetch_multiplier
+                fetch_count = self.fetcher.sources.estimate_fetch_count(remaining)
             
             # 清理失效代理
             self._cleanup_invalid_proxies()
             
             self.last_update = datetime.now()
-            final_count = len(self.get_valid_proxies())
+            final_count = self.valid_count
             log.info(f"代理池更新完成,当前有效代理数: {final_count}/{target}")
             
             if final_count < target:
@@ -155,32 +642,421 @@ class ProxyPool:
         except Exception as e:
             log.error(f"更新代理池失败: {e}")
             
-    async def validate_pool(self):
-        """重新验证池中的所有代理"""
-        proxies = list(self.proxies.values())
+    async def _fill_pool(self, target: int, fetch_count: int) -> int:
+        """
+        流水线补充代理:候选代理从代理源流入有界预筛队列,大量预筛协程快速淘汰无法连接的代理,
+        通过预筛的代理进入验证队列,由验证协程完整验证,验证通过后立即入池;
+        有效代理数达到目标后取消剩余的抓取和验证
+        
+        Args:
+            target: 目标有效代理数
+            fetch_count: 最多获取的候选代理数
+            
+        Returns:
+            本轮新加入代理池的代理数
+        """
+        prescreen = self.validator.prescreen_enabled
+        screen_workers = self.validator.prescreen_concurrency if prescreen else 0
+        # 验证协程数取验证器的最大并发数,实际并发由验证器的并发限制控制
+        validation_workers = self.validator.max_concurrency
+        screen_queue: asyncio.Queue = asyncio.Queue(maxsize=max(screen_workers, 1) * 2)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=validation_workers * 2)
+        self._pipeline_queues = (screen_queue, queue)
+        reached = asyncio.Event()
+        start_time = time.perf_counter()
+        counts = {"added": 0, "skipped": 0, "screened_out": 0, "validated": 0}
+        
+        def reject(proxy: ProxyModel):
+            self.fetcher.sources.record_validation(proxy.source, False)
+            if self.dead_cache:
+                self.dead_cache.add(proxy.canonical_key)
+        
+        def is_dead(key: tuple) -> bool:
+            if self.dead_cache.check(key):
+                counts["skipped"] += 1
+                return True
+            return False
+        
+        async def produce():
+            # 跳过代理池中已有的代理和最近失效的代理,避免重复验证;跳过的代理不占用本轮获取数量
+            async for proxy in self.fetcher.stream_proxies(
+                fetch_count, known_keys=self._by_key, skip=is_dead if self.dead_cache else None
+            ):
+                await (screen_queue if prescreen else queue).put(proxy)
+        
+        async def screen():
+            while True:
+                proxy = await screen_queue.get()
+                try:
+                    if await self.validator.prescreen(proxy):
+                        await queue.put(proxy)
+                    else:
+                        counts["screened_out"] += 1
+                        reject(proxy)
+                except Exception as e:
+                    log.error(f"预筛代理失败: {e}")
+                finally:
+                    screen_queue.task_done()
+        
+        async def consume():
+            while True:
+                proxy = await queue.get()
+                try:
+                    await self.validator.validate_proxy(proxy, prescreen=False)
+                    counts["validated"] += 1
+                    if not proxy.is_valid:
+                        reject(proxy)
+                        continue
+                    self.fetcher.sources.record_validation(proxy.source, True)
+                    proxy.id = str(uuid.uuid4())
+                    proxy.last_checked = proxy.added_at = datetime.now()
+                    if self.add_proxy(proxy) is proxy:
+                        self.latency.record(proxy.id, proxy.timings)
+                        counts["added"] += 1
+                        if counts["added"] == 1:
+                            log.info(f"首个可用代理入池耗时 {time.perf_counter() - start_time:.2f}s")
+                    if self.valid_count >= target:
+                        reached.set()
+                except Exception as e:
+                    log.error(f"验证代理失败: {e}")
+                finally:
+                    queue.task_done()
+        
+        async def drain():
+            await producer
+            await screen_queue.join()
+            await queue.join()
+        
+        producer = asyncio.create_task(produce())
+        workers = [asyncio.create_task(screen()) for _ in range(screen_workers)]
+        workers += [asyncio.create_task(consume()) for _ in range(validation_workers)]
+        drained = asyncio.create_task(drain())
+        target_reached = asyncio.create_task(reached.wait())
+        try:
+            await asyncio.wait({drained, target_reached}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # 达到目标(或被取消)时,未完成的抓取和验证一并取消
+            tasks = [producer, drained, target_reached, *workers]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._pipeline_queues = ()
+        
+        if counts["skipped"]:
+            log.info(f"跳过 {counts['skipped']} 个最近失效的代理")
+        log.info(
+            f"流水线完成,预筛淘汰 {counts['screened_out']} 个代理,"
+            f"验证 {counts['validated']} 个代理,入池 {counts['added']} 个,"
+            f"耗时 {time.perf_counter() - start_time:.2f}s" + (",已达到目标" if reached.is_set() else "")
+        )
+        if producer.done() and not producer.cancelled() and producer.exception():
+            log.error(f"获取代理失败: {producer.exception()}")
+        return counts["added"]
+    
+    async def probe_half_open(self, limit: int = 10):
+        """
+        用验证请求探测冷却结束的半开代理,成功则恢复,失败则再次熔断
+        
+        Args:
+            limit: 单次最多探测的代理数量
+        """
+        self._promote_due_circuits()
+        
+        # 跳过正在接受实际请求试探的代理
+        proxies = [
+            self.proxies[pid] for pid in self.circuit.half_open_ids()
+            if pid in self.proxies and not self.in_flight(pid)
+        ][:limit]
         if not proxies:
-            log.info("代理池为空,跳过验证")
             return
-            
-        log.info(f"开始重新验证池中 {len(proxies)} 个代理")
         
-        # 验证所有代理(包括失效的,检查是否恢复)
-        await self.validator.validate_proxies(proxies)
+        log.info(f"探测 {len(proxies)} 个半开代理")
+        # 验证副本,探测期间代理可能因实际请求试探而恢复或再次熔断,此时不应被探测结果覆盖
+        probes = [proxy.model_copy() for proxy in proxies]
+        await self.validator.validate_proxies(probes)
         
-        # 统计验证后的有效代理数
-        valid_count = len(self.get_valid_proxies())
-        log.info(f"验证完成,当前有效代理数: {valid_count}/{self.pool_size}")
+        recovered = 0
+        for proxy, probe in zip(proxies, probes):
+            if proxy.id not in self.proxies or proxy.circuit_state != CircuitState.HALF_OPEN:
+                continue
+            proxy.is_valid = probe.is_valid
+            if probe.is_valid:
+                proxy.speed = probe.speed
+                proxy.anonymity = probe.anonymity
+                proxy.timings = probe.timings
+            self._apply_validation(proxy)
+            recovered += proxy.is_valid
+        log.info(f"半开代理探测完成,恢复: {recovered}/{len(proxies)}")
+    
+    def _apply_validation(self, proxy: ProxyModel):
+        """
+        应用验证结果:计入健康评分,并据此恢复或熔断代理
+        
+        验证会直接修改代理的有效性和速度,这里统一同步到熔断器和选择索引
+        
+        Args:
+            proxy: 已验证的代理
+        """
+        if proxy.id not in self.proxies:
+            return
+        
+        success = proxy.is_valid
+        self._record_outcome(proxy, success, proxy.speed if success else None)
+        if success:
+            self.latency.record(proxy.id, proxy.timings)
+            if proxy.circuit_state != CircuitState.CLOSED:
+                log.info(f"代理验证通过,解除熔断: {proxy.id}")
+            self.circuit.close(proxy)
+        else:
+            self.circuit.trip(proxy)
+        self._sync_proxy(proxy)
     
     def _cleanup_invalid_proxies(self):
-        """清理失效代理"""
-        invalid_ids = [pid for pid, proxy in self.proxies.items() if not proxy.is_valid]
+        """清理连续熔断次数超过上限的失效代理,冷却中的代理予以保留"""
+        invalid_ids = [
+            pid for pid, proxy in self.proxies.items()
+            if not proxy.is_valid and self.circuit.is_exhausted(proxy)
+        ]
         
         for pid in invalid_ids:
-            del self.proxies[pid]
+            if self.dead_cache:
+                self.dead_cache.add(self.proxies[pid].canonical_key)
+            self._drop_proxy(pid)
         
         if invalid_ids:
             log.info(f"清理了 {len(invalid_ids)} 个失效代理")
     
+    @property
+    def valid_count(self) -> int:
+        """有效代理数量"""
+        return len(self._index)
+    
+    @staticmethod
+    def _rank(proxy: ProxyModel) -> float:
+        """代理排序分值,越小越优先"""
+        return proxy.health_score
+    
+    @staticmethod
+    def _weight(proxy: ProxyModel) -> float:
+        """代理加权随机权重:健康评分倒数"""
+        return 1.0 / max(proxy.health_score, 0.05)
+    
+    def _sync_proxy(self, proxy: ProxyModel):
+        """
+        将代理的当前状态同步到选择索引
+        
+        Args:
+            proxy: 代理模型
+        """
+        if proxy.id not in self.proxies:
+            return
+        self._index_proxy(self._index, proxy)
+        self.attributes.update(proxy)
+        self.stats.update(proxy)
+    
+    def _index_proxy(self, index: ProxyIndex, proxy: ProxyModel):
+        """
+        按代理有效性更新选择索引
+        
+        Args:
+            index: 选择索引
+            proxy: 代理模型
+        """
+        if proxy.is_valid:
+            index.update(proxy.id, self._rank(proxy), self._weight(proxy))
+        else:
+            index.discard(proxy.id)
+    
+    def _drop_proxy(self, proxy_id: str):
+        """
+        从代理池及各索引中删除代理
+        
+        Args:
+            proxy_id: 代理 ID
+        """
+        proxy = self.proxies.pop(proxy_id)
+        if proxy.added_at and self.is_maintainer:
+            self.fetcher.sources.record_lifetime(proxy.source, (datetime.now() - proxy.added_at).total_seconds())
+        if self._by_key.get(proxy.canonical_key) == proxy_id:
+            del self._by_key[proxy.canonical_key]
+        self._index.discard(proxy_id)
+        self.attributes.remove(proxy_id)
+        self.circuit.forget(proxy_id)
+        self.revalidation.forget(proxy_id)
+        self.latency.remove(proxy_id)
+        self.stats.remove(proxy_id)
+    
+    def add_proxy(self, proxy: ProxyModel) -> ProxyModel:
+        """
+        添加代理到代理池;相同 (主机, 端口, 协议) 的代理已存在时合并到已有代理
+        
+        Args:
+            proxy: 代理模型(需已分配 ID)
+            
+        Returns:
+            代理池中的代理(合并时为已有代理)
+        """
+        key = proxy.canonical_key
+        existing_id = self._by_key.get(key)
+        if existing_id is not None and existing_id != proxy.id and existing_id in self.proxies:
+            return self._merge_proxy(self.proxies[existing_id], proxy)
+        
+        self.proxies[proxy.id] = proxy
+        self._by_key[key] = proxy.id
+        self._sync_proxy(proxy)
+        if self.is_maintainer:
+            self.revalidation.schedule(proxy)
+        return proxy
+    
+    def _merge_proxy(self, existing: ProxyModel, fresh: ProxyModel) -> ProxyModel:
+        """
+        将重复代理合并到已有代理:补全缺失属性,新代理验证通过时视为一次验证成功
+        
+        Args:
+            existing: 代理池中的代理
+            fresh: 新获取的重复代理
+            
+        Returns:
+            已有代理
+        """
+        for field in ("country", "anonymity", "source", "username", "password"):
+            if getattr(existing, field) is None and getattr(fresh, field) is not None:
+                setattr(existing, field, getattr(fresh, field))
+        if fresh.last_checked and (existing.last_checked is None or fresh.last_checked > existing.last_checked):
+            existing.last_checked = fresh.last_checked
+        
+        if fresh.is_valid and fresh.speed is not None:
+            existing.is_valid = True
+            existing.speed = fresh.speed
+            existing.timings = fresh.timings
+            if self.validator.judge_url:
+                existing.anonymity = fresh.anonymity  # 判定服务测得的匿名度优先
+            self._apply_validation(existing)
+        else:
+            self._sync_proxy(existing)
+        log.debug(f"合并重复代理: {existing.proxy_url}")
+        return existing
+    
+    def update_proxy_speed(self, proxy_id: str, speed: float):
+        """
+        更新代理速度
+        
+        Args:
+            proxy_id: 代理 ID
+            speed: 响应时间(秒)
+        """
+        proxy = self.proxies.get(proxy_id)
+        if proxy:
+            proxy.speed = speed
+            self._sync_proxy(proxy)
+    
+    def _record_outcome(self, proxy: ProxyModel, success: bool, latency: Optional[float]):
+        """
+        将一次请求结果计入代理的指数加权延迟和成功率
+        
+        Args:
+            proxy: 代理模型
+            success: 是否成功
+            latency: 耗时(秒),未知时为 None
+        """
+        alpha = self.health_alpha
+        proxy.success_rate = alpha * (1.0 if success else 0.0) + (1 - alpha) * proxy.success_rate
+        
+        if latency is not None:
+            previous = proxy.ewma_latency if proxy.ewma_latency is not None else proxy.speed
+            proxy.ewma_latency = latency if previous is None else alpha * latency + (1 - alpha) * previous
+    
+    def report_result(
+        self,
+        proxy_id: str,
+        success: bool,
+        latency: Optional[float] = None,
+        host: Optional[str] = None,
+        timings: Optional[Dict[str, float]] = None,
+        size: int = 0,
+    ):
+        """
+        上报一次实际请求的结果,更新代理健康评分
+        
+        Args:
+            proxy_id: 代理 ID
+            success: 是否成功
+            latency: 耗时(秒),未知时为 None
+            host: 目标站点(可选),用于按站点记录代理表现
+            timings: 分阶段耗时(可选),计入该代理的滚动百分位
+            size: 响应体字节数(用于计算传输速率)
+        """
+        proxy = self.proxies.get(proxy_id)
+        if proxy is None:
+            return
+        if host:
+            self.host_scores.record(proxy_id, host, success, latency)
+        self.latency.record(proxy_id, timings, size)
+        if not self.is_maintainer:
+            self._outbox.append(("result", proxy_id, success, latency))
+        
+        if success:
+            proxy.success_count += 1
+        else:
+            proxy.failure_count += 1
+        self.stats.record_request(success)
+        self._record_outcome(proxy, success, latency)
+        
+        # 半开代理的试探结果决定其恢复或再次熔断
+        if proxy.circuit_state == CircuitState.HALF_OPEN:
+            if success:
+                self.circuit.close(proxy)
+                log.info(f"半开代理试探成功,解除熔断: {proxy_id}")
+            else:
+                self._trip(proxy)
+        self._sync_proxy(proxy)
+    
+    def report_host_rejection(self, proxy_id: str, host: str, latency: Optional[float] = None):
+        """
+        上报代理被目标站点以状态码拒绝(如 403/429):代理本身可用,只计入该站点的代理评分,
+        不影响全局健康评分和熔断状态
+        
+        Args:
+            proxy_id: 代理 ID
+            host: 目标站点
+            latency: 耗时(秒),未知时为 None
+        """
+        if proxy_id in self.proxies:
+            self.host_scores.record(proxy_id, host, False, latency)
+    
+    def ban_proxy_for_host(self, proxy_id: str, host: str):
+        """
+        在目标站点级别封禁代理(代理对其他站点仍可用)
+        
+        Args:
+            proxy_id: 代理 ID
+            host: 目标站点
+        """
+        if proxy_id in self.proxies:
+            self.host_scores.ban(proxy_id, host)
+            log.info(f"代理被站点 {host} 拒绝,暂时不再用于该站点: {proxy_id}")
+    
+    def _trip(self, proxy: ProxyModel):
+        """
+        熔断代理并从选择索引中移除
+        
+        Args:
+            proxy: 代理模型
+        """
+        if self.circuit.trip(proxy):
+            log.info(
+                f"熔断代理: {proxy.id}, 连续熔断 {proxy.circuit_trips} 次, "
+                f"冷却至 {proxy.circuit_open_until:%H:%M:%S}"
+            )
+        else:
+            log.info(f"代理连续熔断 {proxy.circuit_trips} 次,已彻底失效: {proxy.id}")
+        self._sync_proxy(proxy)
+    
+    def _promote_due_circuits(self):
+        """将冷却结束的代理转为半开状态并更新统计"""
+        for proxy_id in self.circuit.promote_due(self.proxies.get):
+            self._sync_proxy(self.proxies[proxy_id])
+    
     def get_proxy(self, proxy_id: str) -> Optional[ProxyModel]:
         """
         获取指定代理
@@ -193,45 +1069,360 @@ class ProxyPool:
         """
         return self.proxies.get(proxy_id)
     
-    def get_random_proxy(self) -> Optional[ProxyModel]:
+    def _get_strategy(self, strategy: Optional[str] = None) -> SelectionStrategy:
         """
-        获取随机代理
+        获取选择策略
         
+        Args:
+            strategy: 策略名称,默认使用配置的策略
+            
         Returns:
-            代理模型
+            选择策略实例
+        """
+        name = strategy.value if isinstance(strategy, ProxyStrategy) else (strategy or self.default_strategy)
+        selector = self._strategies.get(name)
+        if selector is None:
+            log.warning(f"未知的代理选择策略: {name},使用 {ProxyStrategy.FASTEST.value}")
+            selector = self._strategies[ProxyStrategy.FASTEST.value]
+        return selector
+    
+    def get_random_proxy(
+        self,
+        strategy: Optional[str] = None,
+        host: Optional[str] = None,
+        filters: Optional[Dict[str, str]] = None,
+    ) -> Optional[ProxyModel]:
+        """
+        按选择策略获取代理
+        
+        Args:
+            strategy: 选择策略名称,默认使用配置的策略
+            host: 目标站点(可选),优先选择最近在该站点成功的代理,并跳过被该站点封禁的代理
+            filters: 代理属性过滤条件(可选,见 attribute_index.make_filters),只从匹配的代理中选择
+        
+        Returns:
+            代理模型,没有可用代理时返回 None
+            
+        Raises:
+            ProxyPoolSaturatedError: 有可用代理,但都已达到并发上限
         """
-        valid_proxies = self.get_valid_proxies()
+        valid_count = self.valid_count
 
         # 检查代理数量是否低于阈值（含空池），触发后台补充（防止重复创建任务）
-        if len(valid_proxies) < self._refill_threshold:
+        if valid_count < self._refill_threshold and self.is_maintainer:
             if self._refill_task is None or self._refill_task.done():
-                log.warning(f"代理数量不足({len(valid_proxies)}/{self.pool_size}),触发后台补充任务")
+                log.warning(f"代理数量不足({valid_count}/{self.pool_size}),触发后台补充任务")
                 self._refill_task = asyncio.create_task(self.update_pool())
 
-        if not valid_proxies:
-            log.warning("代理池中没有可用代理")
+        # 有过滤条件时,策略只在匹配代理组成的临时索引上运行
+        index = self._filtered_index(filters) if filters else self._index
+        
+        if host:
+            proxy = self._pick_host_affine(host, index)
+            if proxy:
+                return proxy
+        
+        # 按策略从索引中选择代理;验证过程中代理状态可能被直接修改,发现不一致时先同步再重选
+        selector = self._get_strategy(strategy)
+        banned_fallback = None
+        skips = 0
+        while True:
+            if skips >= self.max_selection_skips:
+                proxy = (
+                    self._scan_eligible(host, index)
+                    or banned_fallback
+                    or (self._scan_eligible(None, index) if host else None)
+                )
+                if proxy is None:
+                    # 与空池区分:调用方不应回退为直接请求
+                    log.warning("所有代理都已达到并发上限")
+                    raise ProxyPoolSaturatedError("所有代理都已达到并发上限,请稍后重试")
+                return proxy
+            
+            # 策略选中不合格代理后改为随机重选,避免确定性策略反复选中同一个代理
+            if skips:
+                proxy_id = index.choice(self.rng)
+            else:
+                proxy_id = selector.select(index, self)
+            if proxy_id is None:
+                log.warning(f"没有满足过滤条件 {filters} 的可用代理" if filters else "代理池中没有可用代理")
+                return None
+            
+            proxy = self.proxies.get(proxy_id)
+            if proxy is None:
+                self._index.discard(proxy_id)
+                index.discard(proxy_id)
+                self.attributes.remove(proxy_id)
+                self.stats.remove(proxy_id)
+                continue
+            if not proxy.is_valid or index.rank_of(proxy_id) != self._rank(proxy):
+                self._sync_proxy(proxy)
+                if index is not self._index:
+                    self._index_proxy(index, proxy)
+                continue
+            if proxy_id in self._saturated:
+                skips += 1
+                continue
+            if host and self.host_scores.is_banned(proxy_id, host):
+                # 站点封禁是软限制:找不到其他代理时仍可使用
+                banned_fallback = banned_fallback or proxy
+                skips += 1
+                continue
+            return proxy
+    
+    def _filtered_index(self, filters: Dict[str, str]) -> ProxyIndex:
+        """
+        由满足过滤条件的有效代理构建临时选择索引,开销与匹配的代理数成正比
+        
+        Args:
+            filters: 代理属性过滤条件
+            
+        Returns:
+            选择索引
+        """
+        index = ProxyIndex()
+        for proxy_id in self.attributes.lookup(filters):
+            proxy = self.proxies.get(proxy_id)
+            if proxy is not None and proxy_id in self._index:
+                index.update(proxy_id, self._rank(proxy), self._weight(proxy))
+        return index
+    
+    def _scan_eligible(self, host: Optional[str] = None, index: Optional[ProxyIndex] = None) -> Optional[ProxyModel]:
+        """
+        扫描所有有效代理,选择未达到并发上限、未被目标站点封禁的最优代理
+        
+        Args:
+            host: 目标站点(可选)
+            index: 候选代理的选择索引,默认为全部有效代理
+            
+        Returns:
+            代理模型,没有合格代理时返回 None
+        """
+        index = index if index is not None else self._index
+        best_id = None
+        best_rank = None
+        for proxy_id in index.ids():
+            if proxy_id in self._saturated or (host and self.host_scores.is_banned(proxy_id, host)):
+                continue
+            rank = index.rank_of(proxy_id)
+            if best_rank is None or rank < best_rank:
+                best_id, best_rank = proxy_id, rank
+        return self.proxies.get(best_id) if best_id else None
+    
+    def _pick_host_affine(self, host: str, index: Optional[ProxyIndex] = None) -> Optional[ProxyModel]:
+        """
+        按比例从最近在目标站点成功过的代理中选择(随机二选一,取在途更少、站点评分更优者)
+        
+        Args:
+            host: 目标站点
+            index: 候选代理的选择索引,默认为全部有效代理
+            
+        Returns:
+            代理模型,本次不使用站点亲和或没有候选时返回 None
+        """
+        if self.rng.random() >= self.host_affinity_ratio:
+            return None
+        
+        index = index if index is not None else self._index
+        candidates = [
+            pid for pid in self.host_scores.recent_successes(host)
+            if pid in index and pid not in self._saturated
+        ]
+        if not candidates:
+            return None
+        
+        def load(proxy_id: str):
+            entry = self.host_scores.get(proxy_id, host)
+            return self.in_flight(proxy_id), entry.score if entry else float("inf")
+        
+        first = self.rng.choice(candidates)
+        second = self.rng.choice(candidates)
+        proxy_id = first if load(first) <= load(second) else second
+        proxy = self.proxies.get(proxy_id)
+        return proxy if proxy and proxy.is_valid else None
+    
+    def acquire_proxy(
+        self,
+        strategy: Optional[str] = None,
+        host: Optional[str] = None,
+        session_id: Optional[str] = None,
+        filters: Optional[Dict[str, str]] = None,
+    ) -> Optional[ProxyModel]:
+        """
+        选择代理并计入在途请求,使用完毕后需调用 release_proxy
+        
+        Args:
+            strategy: 选择策略名称,默认使用配置的策略
+            host: 目标站点(可选)
+            session_id: 会话 ID(可选),同一会话固定使用同一个代理,代理失效后自动切换
+            filters: 代理属性过滤条件(可选)
+            
+        Returns:
+            代理模型,没有可用代理时返回 None
+            
+        Raises:
+            ProxyPoolSaturatedError: 有可用代理,但都已达到并发上限
+        """
+        if session_id:
+            # 会话固定的代理不受并发上限约束,保证会话出口 IP 不变
+            proxy = self._get_session_proxy(session_id, host, filters)
+            if proxy is None:
+                proxy = self.get_random_proxy(strategy, host, filters)
+                if proxy:
+                    self._pin_session(session_id, proxy.id)
+        else:
+            # 半开代理试探不区分属性,有过滤条件时不参与
+            proxy = None if filters else self._pick_half_open_trial()
+            if proxy is None:
+                proxy = self.get_random_proxy(strategy, host, filters)
+        if proxy:
+            count = self._in_flight.get(proxy.id, 0) + 1
+            self._in_flight[proxy.id] = count
+            self._in_flight_total += 1
+            if self.max_in_flight and count >= self.max_in_flight:
+                self._saturated.add(proxy.id)
+        return proxy
+    
+    def _get_session_proxy(
+        self,
+        session_id: str,
+        host: Optional[str] = None,
+        filters: Optional[Dict[str, str]] = None,
+    ) -> Optional[ProxyModel]:
+        """
+        获取会话固定的代理并续期;代理已失效、被目标站点封禁或不满足过滤条件时解除固定
+        
+        Args:
+            session_id: 会话 ID
+            host: 目标站点(可选)
+            filters: 代理属性过滤条件(可选)
+            
+        Returns:
+            代理模型,会话不存在、已过期或代理不可用时返回 None
+        """
+        now = time.monotonic()
+        
+        # 会话按最近使用排序且 TTL 相同,从头部清理过期会话
+        while self._sessions:
+            oldest_id, (_, expires_at) = next(iter(self._sessions.items()))
+            if expires_at > now:
+                break
+            del self._sessions[oldest_id]
+        
+        pinned = self._sessions.get(session_id)
+        if pinned is None:
+            return None
+        
+        proxy_id, expires_at = pinned
+        if expires_at <= now:
+            del self._sessions[session_id]
+            return None
+        
+        proxy = self.proxies.get(proxy_id)
+        if (
+            proxy is None
+            or not proxy.is_valid
+            or (host and self.host_scores.is_banned(proxy_id, host))
+            or (filters and not self.attributes.matches(proxy_id, filters))
+        ):
+            log.info(f"会话 {session_id} 固定的代理不可用,切换代理")
+            del self._sessions[session_id]
+            return None
+        
+        self._pin_session(session_id, proxy_id)
+        return proxy
+    
+    def _pin_session(self, session_id: str, proxy_id: str):
+        """
+        将会话固定到代理,并刷新过期时间
+        
+        Args:
+            session_id: 会话 ID
+            proxy_id: 代理 ID
+        """
+        self._sessions[session_id] = (proxy_id, time.monotonic() + self.session_ttl)
+        self._sessions.move_to_end(session_id)
+        if len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+    
+    def _pick_half_open_trial(self) -> Optional[ProxyModel]:
+        """
+        按比例挑选一个半开代理接受实际请求试探;没有正常代理时总是尝试半开代理
+        
+        Returns:
+            半开代理,本次不试探时返回 None
+        """
+        self._promote_due_circuits()
+        if not self.circuit.half_open_count:
+            return None
+        if self.valid_count and self.rng.random() >= self.half_open_ratio:
             return None
         
-        # 按速度排序,选择最快的代理
-        sorted_proxies = sorted(valid_proxies, key=lambda p: p.speed or 999)
-        return sorted_proxies[0] if sorted_proxies else None
+        proxy_id = self.circuit.next_trial(lambda pid: pid in self._in_flight)
+        if proxy_id is None:
+            return None
+        proxy = self.proxies.get(proxy_id)
+        if proxy is None:
+            self.circuit.forget(proxy_id)
+            return None
+        log.debug(f"半开代理试探: {proxy.proxy_url}")
+        return proxy
+    
+    def release_proxy(self, proxy_id: str):
+        """
+        释放代理的一个在途请求
+        
+        Args:
+            proxy_id: 代理 ID
+        """
+        count = self._in_flight.get(proxy_id, 0) - 1
+        if count >= 0:
+            self._in_flight_total -= 1
+        if not self.max_in_flight or count < self.max_in_flight:
+            self._saturated.discard(proxy_id)
+        if count > 0:
+            self._in_flight[proxy_id] = count
+        else:
+            self._in_flight.pop(proxy_id, None)
     
-    def get_all_proxies(self) -> List[ProxyModel]:
+    def in_flight(self, proxy_id: str) -> int:
+        """
+        获取代理的在途请求数
+        
+        Args:
+            proxy_id: 代理 ID
+            
+        Returns:
+            在途请求数
+        """
+        return self._in_flight.get(proxy_id, 0)
+    
+    def get_all_proxies(self, filters: Optional[Dict[str, str]] = None) -> List[ProxyModel]:
         """
         获取所有代理
         
+        Args:
+            filters: 代理属性过滤条件(可选)
+        
         Returns:
             代理列表
         """
+        if filters:
+            return [self.proxies[pid] for pid in self.attributes.lookup(filters) if pid in self.proxies]
         return list(self.proxies.values())
     
-    def get_valid_proxies(self) -> List[ProxyModel]:
+    def get_valid_proxies(self, filters: Optional[Dict[str, str]] = None) -> List[ProxyModel]:
         """
         获取有效代理列表
         
+        Args:
+            filters: 代理属性过滤条件(可选)
+        
         Returns:
             有效代理列表
         """
+        if filters:
+            return [p for p in self.get_all_proxies(filters) if p.is_valid]
         return [p for p in self.proxies.values() if p.is_valid]
     
     def remove_proxy(self, proxy_id: str) -> bool:
@@ -245,43 +1436,60 @@ class ProxyPool:
             是否成功
         """
         if proxy_id in self.proxies:
-            del self.proxies[proxy_id]
+            self._drop_proxy(proxy_id)
+            if not self.is_maintainer:
+                self._outbox.append(("remove", proxy_id, None, None))
             log.info(f"移除代理: {proxy_id}")
             return True
         return False
     
     def mark_proxy_invalid(self, proxy_id: str):
         """
-        标记代理为失效
+        标记代理为失效(熔断冷却,而不是直接删除)
         
         Args:
             proxy_id: 代理 ID
         """
-        if proxy_id in self.proxies:
-            self.proxies[proxy_id].is_valid = False
+        proxy = self.proxies.get(proxy_id)
+        # 已处于冷却中的代理(如半开试探失败时已被再次熔断)不重复熔断
+        if proxy and proxy.circuit_state != CircuitState.OPEN:
+            if not self.is_maintainer:
+                self._outbox.append(("invalid", proxy_id, None, None))
+            self._trip(proxy)
             log.info(f"标记代理失效: {proxy_id}")
     
     def get_stats(self) -> ProxyStatsModel:
         """
-        获取代理池统计信息
+        获取代理池统计信息(由增量统计直接生成,不遍历代理池)
         
         Returns:
             统计信息
         """
-        all_proxies = self.get_all_proxies()
-        valid_proxies = self.get_valid_proxies()
-        
-        avg_speed = None
-        if valid_proxies:
-            speeds = [p.speed for p in valid_proxies if p.speed]
-            avg_speed = sum(speeds) / len(speeds) if speeds else None
-        
+        stats = self.stats
+        validation = self.validator.stats()
         return ProxyStatsModel(
-            total_proxies=len(all_proxies),
-            valid_proxies=len(valid_proxies),
-            invalid_proxies=len(all_proxies) - len(valid_proxies),
+            total_proxies=stats.total,
+            valid_proxies=stats.valid,
+            invalid_proxies=stats.total - stats.valid,
             last_update=self.last_update,
-            avg_speed=avg_speed,
+            avg_speed=stats.avg_speed,
+            circuit_open=stats.by_circuit.get(CircuitState.OPEN.value, 0),
+            circuit_half_open=stats.by_circuit.get(CircuitState.HALF_OPEN.value, 0),
+            in_flight=self._in_flight_total,
+            max_in_flight_per_proxy=self.max_in_flight,
+            saturated_proxies=len(self._saturated),
+            request_success=stats.request_success,
+            request_failure=stats.request_failure,
+            negative_cache_hits=self.dead_cache.hits if self.dead_cache else 0,
+            negative_cache_misses=self.dead_cache.misses if self.dead_cache else 0,
+            negative_cache_size=self.dead_cache.size if self.dead_cache else 0,
+            validation_concurrency=validation["concurrency"],
+            validation_in_flight=validation["in_flight"],
+            validation_queue_depth=validation["queue_depth"] + sum(q.qsize() for q in self._pipeline_queues),
+            validation_probes_per_second=validation["probes_per_second"],
+            validation_loop_lag=validation["loop_lag"],
+            by_source={key: dict(value) for key, value in stats.by_source.items()},
+            by_protocol={key: dict(value) for key, value in stats.by_protocol.items()},
         )
 
 
@@ -1,78 +1,307 @@
 """代理验证模块"""
 
 import asyncio
+import base64
+import errno
+import re
 import time
-from typing import List
+from typing import Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
 import httpx
-from app.models import ProxyModel
+from app.models import AnonymityLevel, ProxyModel, ProxyProtocol
+from app.core.adaptive_limiter import AdaptiveConcurrencyLimiter
+from app.core.latency import LatencyTrace
 from app.config import settings
 from app.utils import log
 
 
+# 表示本机资源不足(而不是代理失效)的错误码,出现较多时自适应模式会降低验证并发
+LOCAL_ERRNOS = {errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM, errno.EADDRNOTAVAIL}
+
+
+def is_local_error(error: BaseException) -> bool:
+    """
+    判断验证异常是否由本机资源不足引起(沿异常链查找)
+    
+    Args:
+        error: 验证异常
+        
+    Returns:
+        是否为本地错误
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, httpx.PoolTimeout):
+            return True
+        if isinstance(error, OSError) and error.errno in LOCAL_ERRNOS:
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+# 代理转发请求时可能添加的、暴露代理身份或客户端 IP 的请求头
+PROXY_HEADERS = {
+    "via", "forwarded", "x-forwarded-for", "x-forwarded", "forwarded-for", "x-real-ip",
+    "client-ip", "x-client-ip", "x-originating-ip", "true-client-ip", "proxy-client-ip",
+    "x-proxy-id", "proxy-connection",
+}
+
+
+def _address_tokens(value: str) -> Set[str]:
+    """从请求头值中提取地址(去掉引号、方括号和端口)"""
+    tokens = set()
+    for token in re.split(r"[\s,;=\"\[\]]+", value):
+        if not token:
+            continue
+        tokens.add(token)
+        if token.count(":") == 1:  # IPv4:端口
+            tokens.add(token.split(":", 1)[0])
+    return tokens
+
+
+def grade_anonymity(payload: dict, real_ips: Iterable[str]) -> AnonymityLevel:
+    """
+    按判定服务回显的来源和请求头判断代理匿名度
+    
+    Args:
+        payload: 判定服务响应 {"origin": 来源 IP, "headers": 请求头}
+        real_ips: 本机真实 IP(未知时传空集合,只能区分匿名和高匿)
+        
+    Returns:
+        匿名度
+    """
+    headers = {str(key).lower(): str(value) for key, value in (payload.get("headers") or {}).items()}
+    # 兼容 httpbin 格式:origin 可能是 "客户端, 代理" 形式的列表,此时整个列表都来自转发请求头
+    origins = [item.strip() for item in str(payload.get("origin") or "").split(",") if item.strip()]
+    revealed = [value for key, value in headers.items() if key in PROXY_HEADERS]
+    if len(origins) > 1:
+        revealed += origins
+    
+    real_ips = set(real_ips)
+    if real_ips and any(real_ips & _address_tokens(value) for value in revealed):
+        return AnonymityLevel.TRANSPARENT
+    if revealed:
+        return AnonymityLevel.ANONYMOUS
+    return AnonymityLevel.ELITE
+
+
 class ProxyValidator:
     """代理验证器"""
     
     def __init__(self):
         self.validation_url = settings.proxy_validation_url
         self.timeout = settings.proxy_validation_timeout
+        self.prescreen_enabled = settings.proxy_prescreen_enabled
+        self.prescreen_timeout = settings.proxy_prescreen_timeout
+        self.prescreen_concurrency = settings.proxy_prescreen_concurrency
+        # 配置了判定服务时通过代理请求判定服务,同时测定匿名度
+        self.judge_url = settings.proxy_judge_url or None
+        self.probe_url = self.judge_url or self.validation_url
+        self._real_ips: Optional[Set[str]] = {settings.proxy_real_ip} if settings.proxy_real_ip else None
+        self._real_ip_lock = asyncio.Lock()
+        # 验证地址为 HTTPS 时,HTTP 代理的完整验证也要先建立 CONNECT 隧道,预筛可提前检查这一步
+        self._connect_target = self._parse_connect_target(self.probe_url) if settings.proxy_prescreen_connect else None
+        # 完整验证的并发限制(所有验证共享),自适应模式下按 AIMD 调整
+        self.limiter = AdaptiveConcurrencyLimiter(
+            settings.proxy_validation_concurrency,
+            max_limit=settings.proxy_validation_max_concurrency,
+            adaptive=settings.proxy_validation_adaptive,
+            max_lag=settings.proxy_validation_max_loop_lag,
+        )
+    
+    @property
+    def max_concurrency(self) -> int:
+        """完整验证可能达到的最大并发数"""
+        return self.limiter.max_limit
     
-    async def validate_proxy(self, proxy: ProxyModel) -> ProxyModel:
+    async def get_real_ips(self) -> Set[str]:
         """
-        验证单个代理
+        获取本机真实 IP:未配置时不经代理直接请求判定服务,以其看到的来源 IP 为准
+        
+        Returns:
+            本机 IP 集合,获取失败时为空集合(下次再试)
+        """
+        if self._real_ips is not None:
+            return self._real_ips
+        async with self._real_ip_lock:
+            if self._real_ips is None:
+                try:
+                    async with httpx.AsyncClient(timeout=self.timeout, verify=False) as client:
+                        response = await client.get(self.judge_url)
+                        response.raise_for_status()
+                        origin = str(response.json().get("origin") or "")
+                    self._real_ips = {item.strip() for item in origin.split(",") if item.strip()}
+                    log.info(f"判定服务看到的本机 IP: {', '.join(self._real_ips)}")
+                except Exception as e:
+                    log.warning(f"获取本机 IP 失败,暂时无法识别透明代理: {e}")
+                    return set()
+        return self._real_ips
+    
+    @staticmethod
+    def _parse_connect_target(url: str) -> Optional[Tuple[str, int]]:
+        """解析 CONNECT 预筛的目标地址,验证地址不是 HTTPS 时返回 None"""
+        parts = urlsplit(url)
+        if parts.scheme != "https" or not parts.hostname:
+            return None
+        return parts.hostname, parts.port or 443
+    
+    async def prescreen(self, proxy: ProxyModel) -> bool:
+        """
+        第一阶段预筛:与代理建立 TCP 连接,HTTP 代理再完成一次 CONNECT 握手,
+        超时很短,用于快速淘汰无法连接的代理
         
         Args:
             proxy: 代理模型
             
         Returns:
-            更新后的代理模型
+            是否通过预筛
         """
         try:
-            start_time = time.time()
+            return await asyncio.wait_for(self._prescreen(proxy), timeout=self.prescreen_timeout)
+        except Exception as e:
+            log.debug(f"代理预筛失败: {proxy.proxy_url}, 错误: {e!r}")
+            return False
+    
+    async def _prescreen(self, proxy: ProxyModel) -> bool:
+        reader, writer = await asyncio.open_connection(proxy.host, proxy.port)
+        try:
+            # HTTPS/SOCKS 代理需要 TLS 或 SOCKS 握手,只检查 TCP 连通性
+            if self._connect_target is None or proxy.protocol != ProxyProtocol.HTTP:
+                return True
+            
+            host, port = self._connect_target
+            request = f"CONNECT {host}:{port} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+            if proxy.username and proxy.password:
+                token = base64.b64encode(f"{proxy.username}:{proxy.password}".encode()).decode()
+                request += f"Proxy-Authorization: Basic {token}\r\n"
+            writer.write((request + "\r\n").encode())
+            await writer.drain()
             
-            async with httpx.AsyncClient(
-                proxies=proxy.to_dict(),
-                timeout=self.timeout,
-                verify=False,
-            ) as client:
-                response = await client.get(self.validation_url)
+            # 只检查状态行,例如 "HTTP/1.1 200 Connection established"
+            status_line = await reader.readline()
+            parts = status_line.split()
+            if len(parts) >= 2 and parts[1] == b"200":
+                return True
+            log.debug(f"代理预筛失败: {proxy.proxy_url}, CONNECT 响应: {status_line[:64]!r}")
+            return False
+        finally:
+            writer.close()
+    
+    async def validate_proxy(self, proxy: ProxyModel, prescreen: bool = True) -> ProxyModel:
+        """
+        验证单个代理:先预筛(如启用),通过后再完整请求验证地址
+        
+        Args:
+            proxy: 代理模型
+            prescreen: 是否先预筛(调用方已单独预筛时传 False)
+            
+        Returns:
+            更新后的代理模型
+        """
+        if prescreen and self.prescreen_enabled and not await self.prescreen(proxy):
+            proxy.is_valid = False
+            return proxy
+        
+        real_ips = await self.get_real_ips() if self.judge_url else set()
+        
+        async with self.limiter:
+            local_error = False
+            try:
+                start_time = time.time()
                 
-                if response.status_code == 200:
-                    proxy.is_valid = True
-                    proxy.speed = time.time() - start_time
-                    log.debug(f"代理验证成功: {proxy.proxy_url}, 速度: {proxy.speed:.2f}s")
-                else:
-                    proxy.is_valid = False
-                    log.debug(f"代理验证失败: {proxy.proxy_url}, 状态码: {response.status_code}")
+                async with httpx.AsyncClient(
+                    proxies=proxy.to_dict(),
+                    timeout=self.timeout,
+                    verify=False,
+                ) as client:
+                    trace = LatencyTrace()
+                    response = await client.get(self.probe_url, extensions={"trace": trace})
                     
-        except Exception as e:
-            proxy.is_valid = False
-            log.debug(f"代理验证异常: {proxy.proxy_url}, 错误: {e}")
+                    if response.status_code == 200:
+                        speed = time.time() - start_time
+                        if self.judge_url:
+                            # 代理返回的不是判定服务的响应(如劫持页面)时视为无效
+                            payload = response.json()
+                            if not isinstance(payload, dict) or not isinstance(payload.get("headers"), dict):
+                                raise ValueError("判定服务响应格式无效")
+                            proxy.anonymity = grade_anonymity(payload, real_ips).value
+                        proxy.is_valid = True
+                        proxy.speed = speed
+                        proxy.timings = trace.timings()
+                        log.debug(
+                            f"代理验证成功: {proxy.proxy_url}, 速度: {proxy.speed:.2f}s"
+                            + (f", 匿名度: {proxy.anonymity}" if self.judge_url else "")
+                        )
+                    else:
+                        proxy.is_valid = False
+                        log.debug(f"代理验证失败: {proxy.proxy_url}, 状态码: {response.status_code}")
+                        
+            except Exception as e:
+                proxy.is_valid = False
+                local_error = is_local_error(e)
+                log.debug(f"代理验证异常: {proxy.proxy_url}, 错误: {e}")
+            
+            self.limiter.record(local_error)
         
         return proxy
     
-    async def validate_proxies(self, proxies: List[ProxyModel], concurrency: int = 10) -> List[ProxyModel]:
+    def stats(self) -> dict:
+        """
+        验证吞吐统计
+        
+        Returns:
+            并发上限、在途验证数、排队数(queue_depth)、每秒完成的验证数等
+        """
+        stats = self.limiter.snapshot()
+        stats["queue_depth"] = stats.pop("waiting")
+        return stats
+    
+    async def validate_proxies(self, proxies: List[ProxyModel], concurrency: Optional[int] = None) -> List[ProxyModel]:
         """
         批量验证代理
         
         Args:
             proxies: 代理列表
-            concurrency: 并发数
+            concurrency: 并发数(可选),不指定时由验证器的并发限制决定
             
         Returns:
             验证后的代理列表
         """
-        log.info(f"开始验证 {len(proxies)} 个代理,并发数: {concurrency}")
+        log.info(f"开始验证 {len(proxies)} 个代理,并发数: {concurrency or self.limiter.limit}")
+        start_time = time.perf_counter()
+        
+        # 第一阶段:高并发预筛,淘汰的代理直接标记为无效
+        candidates = proxies
+        if self.prescreen_enabled:
+            screen_semaphore = asyncio.Semaphore(self.prescreen_concurrency)
+            
+            async def prescreen_with_semaphore(proxy: ProxyModel) -> bool:
+                async with screen_semaphore:
+                    return await self.prescreen(proxy)
+            
+            passed = await asyncio.gather(*(prescreen_with_semaphore(proxy) for proxy in proxies))
+            candidates = []
+            for proxy, ok in zip(proxies, passed):
+                if ok:
+                    candidates.append(proxy)
+                else:
+                    proxy.is_valid = False
+            log.info(f"预筛完成,通过: {len(candidates)}/{len(proxies)}")
         
-        # 使用信号量控制并发
-        semaphore = asyncio.Semaphore(concurrency)
+        # 第二阶段:完整验证通过预筛的代理,并发由验证器的并发限制控制,指定 concurrency 时再加一层信号量
+        semaphore = asyncio.Semaphore(concurrency) if concurrency else None
         
         async def validate_with_semaphore(proxy: ProxyModel) -> ProxyModel:
+            if semaphore is None:
+                return await self.validate_proxy(proxy, prescreen=False)
             async with semaphore:
-                return await self.validate_proxy(proxy)
+                return await self.validate_proxy(proxy, prescreen=False)
         
         # 并发验证
-        tasks = [validate_with_semaphore(proxy) for proxy in proxies]
-        validated_proxies = await asyncio.gather(*tasks)
+        tasks = [validate_with_semaphore(proxy) for proxy in candidates]
+        await asyncio.gather(*tasks)
+        validated_proxies = proxies
         
         # 统计结果
         valid_count = sum(1 for p in validated_proxies if p.is_valid)
@@ -86,17 +315,22 @@ class ProxyValidator:
         # 格式化来源统计信息
         source_info = ", ".join([f"{src}: {cnt}" for src, cnt in source_stats.items()]) if source_stats else "无"
         
-        log.info(f"代理验证完成,有效: {valid_count}/{len(proxies)}, 来源分布: {source_info}")
+        elapsed = time.perf_counter() - start_time
+        log.info(
+            f"代理验证完成,有效: {valid_count}/{len(proxies)}, 来源分布: {source_info}, "
+            f"耗时 {elapsed:.2f}s({len(candidates) / max(elapsed, 1e-6):.1f} 个/秒), "
+            f"当前并发上限: {self.limiter.limit}"
+        )
         
         return validated_proxies
     
-    async def get_valid_proxies(self, proxies: List[ProxyModel], concurrency: int = 10) -> List[ProxyModel]:
+    async def get_valid_proxies(self, proxies: List[ProxyModel], concurrency: Optional[int] = None) -> List[ProxyModel]:
         """
         获取有效代理列表
         
         Args:
             proxies: 代理列表
-            concurrency: 并发数
+            concurrency: 并发数(可选),不指定时由验证器的并发限制决定
             
         Returns:
             有效代理列表
@@ -1,8 +1,11 @@
 """请求处理模块"""
 
 import httpx
-from typing import Optional
+from typing import Callable, Optional
 from app.models import RequestModel, ResponseModel, ProxyModel
+from app.core.client_cache import ProxyClientCache
+from app.core.proxy_pool import ProxyPoolSaturatedError
+from app.core.latency import LatencyTrace
 from app.config import settings
 from app.utils import log
 
@@ -13,6 +16,17 @@ class RequestHandler:
     def __init__(self):
         self.timeout = settings.request_timeout
         self.max_retries = settings.request_max_retries
+        # 按代理缓存长连接客户端,上限为 0 时每次请求新建客户端
+        self.clients = (
+            ProxyClientCache(settings.request_client_cache_size, settings.request_client_idle_timeout)
+            if settings.request_client_cache_size > 0
+            else None
+        )
+    
+    async def close(self):
+        """关闭缓存的客户端"""
+        if self.clients is not None:
+            await self.clients.close()
     
     async def send_request(
         self, 
@@ -54,17 +68,23 @@ class RequestHandler:
         if request.json:
             kwargs["json"] = request.json
         
-        # 配置代理
-        client_kwargs = {"verify": False}
         if proxy:
-            client_kwargs["proxies"] = proxy.to_dict()
             log.info(f"使用代理发送请求: {proxy.proxy_url} -> {request.url}")
         else:
             log.info(f"直接发送请求: {request.url}")
         
-        # 发送请求
-        async with httpx.AsyncClient(**client_kwargs) as client:
-            response = await client.request(**kwargs)
+        # 发送请求,通过 trace 扩展记录连接、TLS、首字节和传输耗时
+        trace = LatencyTrace()
+        if self.clients is not None:
+            # 复用该代理的长连接客户端
+            async with self.clients.client(proxy) as client:
+                response = await client.request(**kwargs, extensions={"trace": trace})
+        else:
+            client_kwargs = {"verify": False}
+            if proxy:
+                client_kwargs["proxies"] = proxy.to_dict()
+            async with httpx.AsyncClient(**client_kwargs) as client:
+                response = await client.request(**kwargs, extensions={"trace": trace})
         
         # 构建响应
         return ResponseModel(
@@ -74,13 +94,19 @@ class RequestHandler:
             encoding=response.encoding,
             elapsed=response.elapsed.total_seconds(),
             proxy_used=proxy.proxy_url if proxy else None,
+            timings=trace.timings(),
+            size=len(response.content),
         )
     
     async def send_request_with_retry(
         self, 
         request: RequestModel,
         get_proxy_func,
-        mark_invalid_func
+        mark_invalid_func,
+        release_proxy_func: Optional[Callable[[str], None]] = None,
+        report_result_func: Optional[Callable[..., None]] = None,
+        ban_proxy_func: Optional[Callable[[str], None]] = None,
+        reject_proxy_func: Optional[Callable[[str, float], None]] = None
     ) -> ResponseModel:
         """
         发送请求并自动重试(双层重试机制)
@@ -89,11 +115,19 @@ class RequestHandler:
             request: 请求模型
             get_proxy_func: 获取代理的函数
             mark_invalid_func: 标记代理失效的函数
+            release_proxy_func: 释放代理在途请求的函数(可选),每个获取到的代理使用完毕后调用
+            report_result_func: 上报单次请求结果的函数(可选),参数为代理 ID、是否成功、耗时(秒),
+                收到响应时还有分阶段耗时和响应体字节数
+            ban_proxy_func: 代理被目标站点拒绝(状态码重试耗尽)时调用的函数(可选),
+                未提供时回退为 mark_invalid_func
+            reject_proxy_func: 每次收到需要重试的状态码时调用的函数(可选),参数为代理 ID、耗时(秒),
+                只记录代理在该站点的表现;未提供时按请求失败上报给 report_result_func
             
         Returns:
             响应模型
             
         Raises:
+            ProxyPoolSaturatedError: 所有代理都已达到并发上限(不会回退为直接请求)
             Exception: 所有重试都失败
         """
         # 处理向后兼容性: 如果只设置了 max_retries, 将其作为 max_proxy_switches
@@ -126,7 +160,7 @@ class RequestHandler:
                 
                 if not proxy:
                     log.warning(f"代理 {proxy_index + 1}/{max_proxy_switches}: 没有可用代理")
-                    # 如果没有代理,尝试直接请求
+                    # 代理池为空时,尝试直接请求(代理都达到并发上限时 get_proxy_func 抛出异常,不会走到这里)
                     try:
                         return await self.send_request(request, None)
                     except Exception as e:
@@ -150,6 +184,11 @@ class RequestHandler:
                         
                         # 检查状态码是否需要重试 (仅当用户明确指定时)
                         if retry_status_codes and response.status_code in retry_status_codes:
+                            # 代理本身可用,只是被目标站点拒绝,不计入全局健康评分和熔断
+                            if reject_proxy_func:
+                                reject_proxy_func(proxy.id, response.elapsed)
+                            elif report_result_func:
+                                report_result_func(proxy.id, False, response.elapsed, response.timings, response.size)
                             last_status_code = response.status_code
                             last_error_type = "需要重试的状态码"
                             last_error = f"HTTP {response.status_code}"
@@ -163,17 +202,24 @@ class RequestHandler:
                                 f"   说明: 该状态码在重试列表中 {retry_status_codes}"
                             )
                             
-                            # 如果是当前代理的最后一次重试,标记代理失效并切换代理
+                            # 如果是当前代理的最后一次重试,标记代理失效(或仅对该站点封禁)并切换代理
                             if retry_index >= max_retries_per_proxy - 1:
-                                mark_invalid_func(proxy.id)
-                                log.debug(f"已标记代理失效: {proxy.proxy_url}")
-                                proxy_failed = True
+                                if ban_proxy_func:
+                                    # 代理本身可用,只是被目标站点拒绝,不做全局失效标记
+                                    ban_proxy_func(proxy.id)
+                                    log.debug(f"已对目标站点封禁代理: {proxy.proxy_url}")
+                                else:
+                                    mark_invalid_func(proxy.id)
+                                    log.debug(f"已标记代理失效: {proxy.proxy_url}")
+                                    proxy_failed = True
                                 break
                             else:
                                 # 继续用当前代理重试
                                 continue
                         
                         # 状态码正常或未配置状态码过滤,返回响应
+                        if report_result_func:
+                            report_result_func(proxy.id, True, response.elapsed, response.timings, response.size)
                         log.info(
                             f"✓ 请求成功 (总尝试 {total_attempts} 次)\n"
                             f"   URL: {request.url}\n"
@@ -239,6 +285,9 @@ class RequestHandler:
                             f"   错误: {str(e)}"
                         )
                     
+                    if report_result_func:
+                        report_result_func(proxy.id, False, None)
+                    
                     # 如果是当前代理的最后一次重试,标记失效
                     if retry_index >= max_retries_per_proxy - 1:
                         proxy_failed = True
@@ -248,10 +297,17 @@ class RequestHandler:
                     mark_invalid_func(proxy.id)
                     log.info(f"代理 {proxy_index + 1}/{max_proxy_switches}: {proxy.proxy_url} 所有重试失败,已标记失效")
                     
+            except ProxyPoolSaturatedError:
+                raise
+            
             except Exception as e:
                 last_error = e
                 last_error_type = type(e).__name__
                 log.error(f"代理 {proxy_index + 1}/{max_proxy_switches}: 发生异常 - {e}")
+            
+            finally:
+                if proxy and release_proxy_func:
+                    release_proxy_func(proxy.id)
         
         # 所有代理和重试都失败,构造详细错误信息
         error_msg = (
@@ -0,0 +1,103 @@
+"""滚动重新验证调度模块"""
+
+import heapq
+import itertools
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+from app.models import ProxyModel
+from app.config import settings
+
+
+class RevalidationScheduler:
+    """
+    滚动重新验证调度器
+
+    为每个代理计算下次验证时间,按到期先后取出,代替定时对整个代理池集中验证:
+    - 距上次验证越久越先验证,每个代理的数据新鲜度不超过验证间隔
+    - 成功率越低(失效风险越高)验证间隔越短
+    - 加入随机抖动,避免大量代理同时到期
+    """
+
+    def __init__(self):
+        self.interval = settings.proxy_revalidate_interval
+        self.jitter = settings.proxy_revalidate_jitter
+        self.rng = random.Random()
+        self._heap: List[Tuple[float, int, str]] = []  # (到期时间戳, 序号, 代理 ID)
+        self._due: Dict[str, int] = {}  # 代理 ID -> 当前有效条目的序号
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def __contains__(self, proxy_id: str) -> bool:
+        return proxy_id in self._due
+
+    def next_due(self, proxy: ProxyModel, now: Optional[float] = None) -> float:
+        """
+        计算代理下次验证的时间
+
+        Args:
+            proxy: 代理模型
+            now: 当前时间戳(可选)
+
+        Returns:
+            到期时间戳
+        """
+        now = now if now is not None else time.time()
+        if proxy.last_checked is None:
+            return now
+
+        # 成功率 1.0 时使用完整间隔,成功率越低间隔越短(最短为 1/4)
+        interval = self.interval * (0.25 + 0.75 * min(max(proxy.success_rate, 0.0), 1.0))
+        interval *= self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+        return proxy.last_checked.timestamp() + interval
+
+    def schedule(self, proxy: ProxyModel, due: Optional[float] = None):
+        """
+        登记或更新代理的下次验证时间
+
+        Args:
+            proxy: 代理模型
+            due: 到期时间戳,默认按代理状态计算
+        """
+        seq = next(self._seq)
+        self._due[proxy.id] = seq
+        heapq.heappush(self._heap, (due if due is not None else self.next_due(proxy), seq, proxy.id))
+        self._maybe_compact()
+
+    def forget(self, proxy_id: str):
+        """
+        取消代理的验证计划(堆中条目惰性删除)
+
+        Args:
+            proxy_id: 代理 ID
+        """
+        self._due.pop(proxy_id, None)
+
+    def pop_due(self, limit: int, now: Optional[float] = None) -> List[str]:
+        """
+        取出已到期的代理,最久未验证的在前
+
+        Args:
+            limit: 最多取出的数量
+            now: 当前时间戳(可选)
+
+        Returns:
+            代理 ID 列表(取出后需重新 schedule)
+        """
+        now = now if now is not None else time.time()
+        heap = self._heap
+        due_ids = []
+        while heap and len(due_ids) < limit and heap[0][0] <= now:
+            _, seq, proxy_id = heapq.heappop(heap)
+            if self._due.get(proxy_id) == seq:
+                del self._due[proxy_id]
+                due_ids.append(proxy_id)
+        return due_ids
+
+    def _maybe_compact(self):
+        """过期条目过多时重建堆"""
+        if len(self._heap) > 2 * len(self._due) + 64:
+            self._heap = [entry for entry in self._heap if self._due.get(entry[2]) == entry[1]]
+            heapq.heapify(self._heap)
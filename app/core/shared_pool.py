@@ -0,0 +1,65 @@
+"""多进程共享代理池模块"""
+
+from pathlib import Path
+from typing import IO, Optional
+from app.utils import log
+
+try:
+    import fcntl
+except ImportError:  # Windows 不支持 fcntl
+    fcntl = None
+
+
+class MaintainerLock:
+    """
+    维护进程文件锁
+
+    多个 uvicorn worker 共享代理池时,持有该锁的进程负责抓取、验证并发布代理池快照,
+    其他进程只读取快照并上报请求结果。持锁进程退出后锁自动释放,其他进程可接管。
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._file: Optional[IO] = None
+
+    @property
+    def held(self) -> bool:
+        """当前进程是否持有锁"""
+        return self._file is not None
+
+    def acquire(self) -> bool:
+        """
+        尝试以非阻塞方式获取锁
+
+        Returns:
+            是否持有锁
+        """
+        if self._file is not None:
+            return True
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        file = open(self.path, "a")
+        if fcntl is None:
+            log.warning("当前平台不支持文件锁,每个进程独立维护代理池")
+            self._file = file
+            return True
+
+        try:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            file.close()
+            return False
+
+        self._file = file
+        return True
+
+    def release(self):
+        """释放锁"""
+        if self._file is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,220 @@
+"""代理源调度模块"""
+
+import math
+import time
+from typing import Dict, List, Optional
+from app.config import settings
+
+
+class SourceStats:
+    """单个代理源的产出统计"""
+
+    __slots__ = (
+        "name", "fetches", "failures", "failure_streak", "backoff_until",
+        "raw_per_fetch", "fetch_latency", "valid_ratio", "validated", "valid",
+        "lifetime_total", "lifetime_count",
+    )
+
+    # 未观测到数据时的先验:每次抓取 50 个原始代理、有效率 20%、抓取耗时 5 秒
+    prior_raw = 50.0
+    prior_ratio = 0.2
+    prior_latency = 5.0
+
+    def __init__(self, name: str):
+        self.name = name
+        self.fetches = 0
+        self.failures = 0
+        self.failure_streak = 0
+        self.backoff_until = 0.0
+        self.raw_per_fetch: Optional[float] = None  # 每次抓取的原始代理数(EWMA)
+        self.fetch_latency: Optional[float] = None  # 抓取耗时(秒,EWMA)
+        self.valid_ratio: Optional[float] = None  # 验证通过率(EWMA)
+        self.validated = 0
+        self.valid = 0
+        self.lifetime_total = 0.0
+        self.lifetime_count = 0
+
+    @property
+    def expected_valid(self) -> float:
+        """单次抓取预期得到的有效代理数"""
+        raw = self.raw_per_fetch if self.raw_per_fetch is not None else self.prior_raw
+        ratio = self.valid_ratio if self.valid_ratio is not None else self.prior_ratio
+        return raw * ratio
+
+    @property
+    def valid_per_second(self) -> float:
+        """预期每秒抓取耗时得到的有效代理数,用于分配抓取预算"""
+        latency = self.fetch_latency if self.fetch_latency is not None else self.prior_latency
+        return self.expected_valid / max(latency, 0.1)
+
+    @property
+    def avg_lifetime(self) -> Optional[float]:
+        """该来源代理从入池到被清理的平均存活时间(秒)"""
+        return self.lifetime_total / self.lifetime_count if self.lifetime_count else None
+
+    def to_dict(self) -> Dict:
+        """导出统计数据"""
+        return {
+            "fetches": self.fetches,
+            "failures": self.failures,
+            "failure_streak": self.failure_streak,
+            "backoff_remaining": max(0.0, round(self.backoff_until - time.monotonic(), 1)),
+            "raw_per_fetch": self.raw_per_fetch,
+            "fetch_latency": self.fetch_latency,
+            "validated": self.validated,
+            "valid": self.valid,
+            "valid_ratio": self.valid_ratio,
+            "expected_valid": round(self.expected_valid, 2),
+            "valid_per_second": round(self.valid_per_second, 3),
+            "avg_lifetime": self.avg_lifetime,
+        }
+
+
+class SourceScheduler:
+    """
+    按产出调度代理源
+
+    记录每个代理源的原始代理数、有效率、抓取耗时、连续失败次数和代理存活时间,
+    每次抓取按"预期每秒有效代理数"从高到低选择代理源,直到预期有效代理数满足需求。
+    抓取失败(异常或空结果)的代理源按指数退避暂停使用。未抓取过的代理源使用先验估计,
+    因此会在需要时被尝试
+    """
+
+    alpha = 0.3  # 抓取统计 EWMA 平滑系数
+    ratio_alpha = 0.05  # 有效率 EWMA 平滑系数(每个验证结果更新一次)
+
+    def __init__(self, sources: List[str]):
+        self.max_sources = settings.proxy_source_max_per_fetch
+        self.backoff = settings.proxy_source_backoff
+        self.max_backoff = settings.proxy_source_max_backoff
+        self._stats: Dict[str, SourceStats] = {name: SourceStats(name) for name in sources}
+
+    def get(self, source: str) -> Optional[SourceStats]:
+        """
+        获取代理源统计
+
+        Args:
+            source: 代理源名称
+
+        Returns:
+            统计数据,未知代理源返回 None
+        """
+        return self._stats.get(source)
+
+    def select(self, needed_valid: float) -> List[str]:
+        """
+        选择本次抓取使用的代理源
+
+        Args:
+            needed_valid: 需要的有效代理数
+
+        Returns:
+            代理源名称列表,预期产出最高的在前
+        """
+        now = time.monotonic()
+        available = [stats for stats in self._stats.values() if stats.backoff_until <= now]
+        if not available:
+            # 所有代理源都在退避中,使用最早结束退避的一个
+            available = [min(self._stats.values(), key=lambda stats: stats.backoff_until)]
+
+        available.sort(key=lambda stats: stats.valid_per_second, reverse=True)
+        selected = []
+        expected = 0.0
+        for stats in available:
+            selected.append(stats.name)
+            expected += stats.expected_valid
+            if expected >= needed_valid or len(selected) >= self.max_sources:
+                break
+        return selected
+
+    @property
+    def valid_ratio(self) -> float:
+        """所有代理源的总体有效率,以先验有效率作为 20 个虚拟样本平滑(样本少时接近 20%)"""
+        validated = sum(stats.validated for stats in self._stats.values())
+        valid = sum(stats.valid for stats in self._stats.values())
+        return (valid + SourceStats.prior_ratio * 20) / (validated + 20)
+
+    def estimate_fetch_count(self, needed_valid: int) -> int:
+        """
+        按观测到的总体有效率估算需要获取的原始代理数(代替固定倍数)
+
+        Args:
+            needed_valid: 需要的有效代理数
+
+        Returns:
+            需要获取的原始代理数
+        """
+        return min(math.ceil(needed_valid / max(self.valid_ratio, 0.02)), needed_valid * 50)
+
+    def record_fetch(self, source: str, raw_count: int, latency: float, error: bool = False):
+        """
+        记录一次抓取结果
+
+        Args:
+            source: 代理源名称
+            raw_count: 获取到的原始代理数
+            latency: 抓取耗时(秒)
+            error: 是否抓取异常
+        """
+        stats = self._stats.get(source)
+        if stats is None:
+            return
+
+        stats.fetches += 1
+        if error or raw_count == 0:
+            stats.failures += 1
+            stats.failure_streak += 1
+            stats.backoff_until = time.monotonic() + min(
+                self.backoff * 2 ** (stats.failure_streak - 1), self.max_backoff
+            )
+        else:
+            stats.failure_streak = 0
+            stats.backoff_until = 0.0
+
+        if not error:
+            stats.raw_per_fetch = self._ewma(stats.raw_per_fetch, raw_count, self.alpha)
+            stats.fetch_latency = self._ewma(stats.fetch_latency, latency, self.alpha)
+
+    def record_validation(self, source: Optional[str], valid: bool):
+        """
+        记录该来源一个候选代理的验证结果
+
+        Args:
+            source: 代理源名称
+            valid: 是否验证通过
+        """
+        stats = self._stats.get(source) if source else None
+        if stats is None:
+            return
+        stats.validated += 1
+        stats.valid += valid
+        prior = stats.valid_ratio if stats.valid_ratio is not None else SourceStats.prior_ratio
+        stats.valid_ratio = self._ewma(prior, 1.0 if valid else 0.0, self.ratio_alpha)
+
+    def record_lifetime(self, source: Optional[str], seconds: float):
+        """
+        记录该来源一个代理从入池到被清理的存活时间
+
+        Args:
+            source: 代理源名称
+            seconds: 存活时间(秒)
+        """
+        stats = self._stats.get(source) if source else None
+        if stats is None:
+            return
+        stats.lifetime_total += seconds
+        stats.lifetime_count += 1
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        导出所有代理源的统计数据
+
+        Returns:
+            代理源名称 -> 统计数据,按预期每秒有效代理数从高到低排列
+        """
+        ranked = sorted(self._stats.values(), key=lambda stats: stats.valid_per_second, reverse=True)
+        return {stats.name: stats.to_dict() for stats in ranked}
+
+    @staticmethod
+    def _ewma(current: Optional[float], value: float, alpha: float) -> float:
+        return value if current is None else alpha * value + (1 - alpha) * current
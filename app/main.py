@@ -4,7 +4,8 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.proxy_pool import proxy_pool
-from app.api import proxy, request
+from app.core.request_handler import request_handler
+from app.api import judge, proxy, request
 from app.utils import log
 from app.config import settings
 
@@ -22,6 +23,7 @@ async def lifespan(app: FastAPI):
     # 关闭时
     log.info("ProxyForge 关闭中...")
     await proxy_pool.stop()
+    await request_handler.close()
     log.info("ProxyForge 已关闭")
 
 
@@ -45,6 +47,7 @@ app.add_middleware(
 # 注册路由
 app.include_router(proxy.router)
 app.include_router(request.router)
+app.include_router(judge.router)
 
 
 @app.get("/", tags=["根路径"])
@@ -77,6 +80,7 @@ def main():
         host=settings.host,
         port=settings.port,
         reload=settings.debug,
+        workers=settings.workers,
     )
 
 
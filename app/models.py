@@ -1,7 +1,7 @@
 """数据模型定义"""
 
 from pydantic import BaseModel, Field, HttpUrl
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime
 from enum import Enum
 
@@ -14,6 +14,31 @@ class ProxyProtocol(str, Enum):
     SOCKS5 = "socks5"
 
 
+class AnonymityLevel(str, Enum):
+    """代理匿名度(由判定服务测定)"""
+    TRANSPARENT = "transparent"  # 透露了本机真实 IP
+    ANONYMOUS = "anonymous"  # 隐藏了真实 IP,但暴露了代理身份(Via、X-Forwarded-For 等)
+    ELITE = "elite"  # 高匿,与直接访问无法区分
+
+
+class CircuitState(str, Enum):
+    """代理熔断状态"""
+    CLOSED = "closed"  # 正常
+    OPEN = "open"  # 熔断冷却中
+    HALF_OPEN = "half_open"  # 半开试探中
+
+
+class ProxyStrategy(str, Enum):
+    """代理选择策略"""
+    FASTEST = "fastest"  # 最快优先
+    ROUND_ROBIN = "round_robin"  # 轮询
+    WEIGHTED_RANDOM = "weighted_random"  # 按延迟倒数加权随机
+    POWER_OF_TWO = "power_of_two"  # 随机二选一
+    LEAST_IN_FLIGHT = "least_in_flight"  # 最少在途请求
+    FAST_HANDSHAKE = "fast_handshake"  # 连接/TLS 握手最快(适合小请求)
+    HIGH_THROUGHPUT = "high_throughput"  # 传输速率最高(适合大文件下载)
+
+
 class ProxyModel(BaseModel):
     """代理信息模型"""
     id: Optional[str] = None
@@ -25,10 +50,30 @@ class ProxyModel(BaseModel):
     country: Optional[str] = None
     anonymity: Optional[str] = None
     speed: Optional[float] = None  # 响应时间(秒)
+    ewma_latency: Optional[float] = None  # 指数加权平均延迟(秒),由验证和实际请求共同更新
+    success_rate: float = 1.0  # 指数加权成功率
+    success_count: int = 0  # 实际请求成功次数
+    failure_count: int = 0  # 实际请求失败次数
     last_checked: Optional[datetime] = None
+    added_at: Optional[datetime] = None  # 加入代理池的时间
+    timings: Optional[Dict[str, float]] = None  # 最近一次验证的分阶段耗时(秒): connect/tls/ttfb/transfer
     is_valid: bool = True
+    circuit_state: CircuitState = CircuitState.CLOSED  # 熔断状态
+    circuit_trips: int = 0  # 连续熔断次数
+    circuit_open_until: Optional[datetime] = None  # 熔断冷却结束时间
     source: Optional[str] = None  # 代理来源
     
+    @property
+    def health_score(self) -> float:
+        """健康评分(越小越优): 加权延迟 / 加权成功率"""
+        latency = self.ewma_latency if self.ewma_latency is not None else (self.speed or 999)
+        return latency / max(self.success_rate, 0.05)
+    
+    @property
+    def canonical_key(self) -> Tuple[str, int, str]:
+        """去重键: (主机, 端口, 协议),同一键视为同一个代理"""
+        return self.host.strip().lower(), self.port, self.protocol.value
+    
     @property
     def proxy_url(self) -> str:
         """获取代理 URL"""
@@ -72,6 +117,18 @@ class RequestModel(BaseModel):
         None, 
         description="触发重试的 HTTP 状态码列表,默认为 None (不基于状态码重试),可设置如 [403, 429, 502, 503]"
     )
+    proxy_strategy: Optional[ProxyStrategy] = Field(
+        None,
+        description="代理选择策略,默认使用配置 PROXY_SELECTION_STRATEGY"
+    )
+    session_id: Optional[str] = Field(
+        None,
+        description="会话 ID,同一会话的请求固定使用同一个代理(出口 IP),代理失效时自动切换"
+    )
+    proxy_country: Optional[str] = Field(None, description="只使用该国家/地区的代理")
+    proxy_protocol: Optional[ProxyProtocol] = Field(None, description="只使用该协议的代理")
+    proxy_anonymity: Optional[str] = Field(None, description="只使用该匿名度的代理")
+    proxy_source: Optional[str] = Field(None, description="只使用该来源的代理")
 
 
 class ResponseModel(BaseModel):
@@ -82,6 +139,8 @@ class ResponseModel(BaseModel):
     encoding: Optional[str] = None
     elapsed: float  # 请求耗时(秒)
     proxy_used: Optional[str] = None  # 使用的代理
+    timings: Optional[Dict[str, float]] = None  # 分阶段耗时(秒): connect/tls/ttfb/transfer
+    size: int = 0  # 响应体字节数
 
 
 class ProxyStatsModel(BaseModel):
@@ -91,6 +150,23 @@ class ProxyStatsModel(BaseModel):
     invalid_proxies: int
     last_update: Optional[datetime] = None
     avg_speed: Optional[float] = None
+    circuit_open: int = 0  # 熔断冷却中的代理数
+    circuit_half_open: int = 0  # 半开试探中的代理数
+    in_flight: int = 0  # 在途请求数
+    max_in_flight_per_proxy: int = 0  # 单个代理并发上限(0 表示不限制)
+    saturated_proxies: int = 0  # 已达到并发上限的代理数
+    request_success: int = 0  # 实际请求成功次数
+    request_failure: int = 0  # 实际请求失败次数
+    negative_cache_hits: int = 0  # 命中失效代理缓存而跳过验证的候选代理数
+    negative_cache_misses: int = 0  # 未命中失效代理缓存的候选代理数
+    negative_cache_size: int = 0  # 失效代理缓存中未过期的条目数(近似)
+    validation_concurrency: int = 0  # 当前验证并发上限
+    validation_in_flight: int = 0  # 进行中的完整验证数
+    validation_queue_depth: int = 0  # 等待验证的候选代理数(含补充流水线队列)
+    validation_probes_per_second: float = 0.0  # 最近一秒完成的完整验证数
+    validation_loop_lag: float = 0.0  # 最近一秒内的最大事件循环延迟(秒)
+    by_source: Dict[str, Dict[str, int]] = {}  # 按来源统计 {来源: {"total": 总数, "valid": 有效数}}
+    by_protocol: Dict[str, Dict[str, int]] = {}  # 按协议统计 {协议: {"total": 总数, "valid": 有效数}}
 
 
 class ApiResponse(BaseModel):
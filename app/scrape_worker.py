@@ -0,0 +1,189 @@
+"""
+代理源抓取子进程模块
+
+该模块是抓取子进程的入口(python -m app.scrape_worker <代理源>),只依赖标准库
+(pyfreeproxy 在子进程中按需导入)。子进程是全新的解释器,不会重新导入主进程的 __main__,
+也不会连带初始化全局代理池、线程池和日志文件处理器,不要在这里导入 app 的其他模块
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# 子进程与主进程之间传递的紧凑行格式: (ip, port, protocol, country_code, anonymity, delay)
+ProxyRow = Tuple[str, int, str, Optional[str], Optional[str], Optional[float]]
+
+
+def proxy_info_to_row(proxy_info) -> ProxyRow:
+    """
+    将 pyfreeproxy 的 ProxyInfo 转换为紧凑行
+
+    Args:
+        proxy_info: ProxyInfo 对象
+
+    Returns:
+        代理行
+    """
+    return (
+        proxy_info.ip,
+        int(proxy_info.port),
+        proxy_info.protocol,
+        proxy_info.country_code,
+        proxy_info.anonymity,
+        proxy_info.delay,
+    )
+
+
+def encode_rows(rows: List[ProxyRow]) -> bytes:
+    """代理行编码为紧凑的 JSON 字节串(数组的数组,无多余空白)"""
+    return json.dumps(rows, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def decode_rows(data: bytes) -> List[ProxyRow]:
+    """解码 encode_rows 生成的字节串"""
+    return [tuple(row) for row in json.loads(data)]
+
+
+def scrape_rows(source: str) -> List[ProxyRow]:
+    """
+    用 pyfreeproxy 抓取指定代理源,返回代理行
+
+    Args:
+        source: 代理源名称
+
+    Returns:
+        代理行列表,无法转换的条目被跳过
+    """
+    from freeproxy.modules import BuildProxiedSession
+
+    session = BuildProxiedSession({
+        "max_pages": 1,  # 每个源只抓取1页
+        "type": source,
+        "disable_print": True,  # 禁用打印
+    })
+    try:
+        rows = []
+        for proxy_info in session.refreshproxies():
+            try:
+                rows.append(proxy_info_to_row(proxy_info))
+            except Exception:
+                continue
+        return rows
+    finally:
+        try:
+            session.close()
+        except Exception:
+            pass
+
+
+def main():
+    """子进程入口:抓取命令行指定的代理源,向标准输出写入 状态字节 + 数据 后退出"""
+    source = sys.argv[1]
+    # 结果独占原标准输出,抓取库的打印输出重定向到标准错误,不会混入结果
+    result = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    try:
+        message = b"1" + encode_rows(scrape_rows(source))
+    except Exception as e:
+        message = b"0" + f"{type(e).__name__}: {e}".encode()
+    with result:
+        result.write(message)
+
+
+class ScrapeProcessSupervisor:
+    """
+    代理源抓取子进程监管器
+
+    每次抓取在独立的子进程(python -m app.scrape_worker)中执行,HTML 解析等 CPU 开销不再与 API 请求处理
+    争用同一进程的 GIL。结果以紧凑的 JSON 行格式通过标准输出传回主进程。
+    子进程崩溃时抛出 RuntimeError,超时或被取消时终止子进程,不会遗留卡住的抓取
+    """
+
+    # 项目根目录,加入子进程的 PYTHONPATH,未安装时也能以 -m 方式启动
+    root = str(Path(__file__).resolve().parent.parent)
+
+    def __init__(self, max_workers: int):
+        """
+        Args:
+            max_workers: 同时运行的抓取子进程数上限
+        """
+        self._slots = asyncio.Semaphore(max_workers)
+        # 等待子进程输出会阻塞线程直到抓取结束或超时,使用专用线程池(每个子进程一个线程),
+        # 不占用其他任务使用的线程池
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="proxy-fetch-wait")
+        self._processes: set = set()
+
+    def _spawn(self, source: str) -> subprocess.Popen:
+        """启动抓取子进程"""
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, (self.root, env.get("PYTHONPATH"))))
+        return subprocess.Popen(
+            [sys.executable, "-m", "app.scrape_worker", source],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            env=env,
+        )
+
+    async def scrape(self, source: str, timeout: float) -> List[ProxyRow]:
+        """
+        在子进程中抓取代理源
+
+        Args:
+            source: 代理源名称
+            timeout: 超时时间(秒),包含子进程启动时间
+
+        Returns:
+            代理行列表
+
+        Raises:
+            TimeoutError: 抓取超时(子进程已被终止)
+            RuntimeError: 抓取异常或子进程崩溃
+        """
+        async with self._slots:
+            process = self._spawn(source)
+            self._processes.add(process)
+            loop = asyncio.get_running_loop()
+            try:
+                data, _ = await loop.run_in_executor(self._executor, process.communicate, None, timeout)
+            except subprocess.TimeoutExpired:
+                self._stop(process)
+                process.stdout.close()
+                raise TimeoutError(f"{source} 抓取超时({timeout}s)")
+            finally:
+                # 被取消时终止子进程,线程中的 communicate 随之返回
+                self._stop(process)
+
+        if not data:
+            raise RuntimeError(f"{source} 抓取进程异常退出(exitcode={process.returncode})")
+        if data[:1] != b"1":
+            raise RuntimeError(data[1:].decode(errors="replace"))
+        return decode_rows(data[1:])
+
+    def _stop(self, process: subprocess.Popen):
+        """终止并回收子进程"""
+        self._processes.discard(process)
+        if process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(1)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+    def close(self):
+        """终止所有仍在运行的抓取子进程,关闭等待线程池"""
+        for process in list(self._processes):
+            self._stop(process)
+        if sys.version_info >= (3, 9):
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        else:  # Python 3.8 不支持 cancel_futures,排队中的任务仍会执行
+            self._executor.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+ProxyForge - 长连接客户端缓存基准测试
+在本地启动一个目标站点和一个支持 keep-alive 的假 HTTP 代理(新建连接时模拟网络握手延迟),
+对比每次请求新建 AsyncClient 与按代理缓存客户端时,RequestHandler.send_request 的请求耗时。
+共享客户端不保存 Cookie 的检查见 tests/test_client_cache.py。
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.client_cache import ProxyClientCache  # noqa: E402
+from app.core.request_handler import RequestHandler  # noqa: E402
+from app.models import ProxyModel, RequestModel  # noqa: E402
+
+HOST = "127.0.0.1"
+ORIGIN_PORT = 18760
+PROXY_PORT = 18761
+HANDSHAKE_DELAY = 0.02  # 模拟到代理的 TCP 握手和代理到目标站点的连接耗时(秒)
+REQUESTS = 200
+BODY = b'{"ok": true}'
+
+
+async def read_head(reader: asyncio.StreamReader) -> bytes:
+    """读取 HTTP 请求/响应头,连接关闭时返回空字节串"""
+    try:
+        return await reader.readuntil(b"\r\n\r\n")
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return b""
+
+
+async def handle_origin(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """目标站点:keep-alive 连接上循环返回固定响应"""
+    while await read_head(reader):
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s" % (len(BODY), BODY)
+        )
+        await writer.drain()
+    writer.close()
+
+
+async def handle_proxy(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """假 HTTP 代理:新连接模拟握手延迟,同一客户端连接复用同一条上游连接"""
+    await asyncio.sleep(HANDSHAKE_DELAY)
+    upstream = None
+    while head := await read_head(reader):
+        request_line, _, rest = head.partition(b"\r\n")
+        method, url, version = request_line.split(b" ")
+        path = b"/" + url.split(b"/", 3)[3] if url.startswith(b"http://") else url
+        if upstream is None:
+            await asyncio.sleep(HANDSHAKE_DELAY)
+            upstream = await asyncio.open_connection(HOST, ORIGIN_PORT)
+        up_reader, up_writer = upstream
+        up_writer.write(b" ".join((method, path, version)) + b"\r\n" + rest)
+        await up_writer.drain()
+        response = await read_head(up_reader)
+        length = int(response.lower().split(b"content-length:")[1].split(b"\r\n")[0])
+        writer.write(response + await up_reader.readexactly(length))
+        await writer.drain()
+    if upstream is not None:
+        upstream[1].close()
+    writer.close()
+
+
+async def measure(handler: RequestHandler) -> list:
+    """顺序发送请求,返回每次请求耗时(毫秒)"""
+    proxy = ProxyModel(id="bench", host=HOST, port=PROXY_PORT)
+    request = RequestModel(url=f"http://{HOST}:{ORIGIN_PORT}/api")
+    latencies = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        response = await handler.send_request(request, proxy)
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200
+    return latencies
+
+
+async def run():
+    origin = await asyncio.start_server(handle_origin, HOST, ORIGIN_PORT)
+    proxy = await asyncio.start_server(handle_proxy, HOST, PROXY_PORT)
+
+    uncached = RequestHandler()
+    uncached.clients = None
+    cached = RequestHandler()
+    cached.clients = ProxyClientCache(max_clients=16, idle_timeout=60)
+
+    print(f"模拟握手延迟: {HANDSHAKE_DELAY * 1000:.0f}ms,请求数: {REQUESTS}")
+    print(f"{'模式':<12} | {'p50(ms)':>8} | {'p95(ms)':>8} | {'p99(ms)':>8} | {'平均(ms)':>8}")
+    print("-" * 58)
+    for name, handler in (("每次新建客户端", uncached), ("缓存客户端", cached)):
+        latencies = sorted(await measure(handler))
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(
+            f"{name:<12} | {statistics.median(latencies):>8.2f} | {p95:>8.2f} | "
+            f"{p99:>8.2f} | {statistics.mean(latencies):>8.2f}"
+        )
+    print(f"客户端缓存命中: {cached.clients.hits},未命中: {cached.clients.misses}")
+
+    # 关闭客户端后等待假代理和目标站点的连接处理协程退出
+    await cached.close()
+    await asyncio.sleep(0.1)
+    for server in (proxy, origin):
+        server.close()
+        await server.wait_closed()
+
+
+def main():
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
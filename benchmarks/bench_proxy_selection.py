@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+ProxyForge - 代理选择微基准测试
+对比旧的"每次排序"选取方式与索引选取方式在不同代理池规模下的单次选取耗时
+"""
+
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.proxy_pool import ProxyPool  # noqa: E402
+from app.models import ProxyModel  # noqa: E402
+
+POOL_SIZES = [1_000, 10_000, 100_000]
+SELECTIONS = 2_000
+
+
+def build_pool(size: int) -> ProxyPool:
+    """构造包含指定数量有效代理的代理池"""
+    pool = ProxyPool()
+    for i in range(size):
+        proxy = ProxyModel(
+            id=str(uuid.uuid4()),
+            host=f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}",
+            port=8080,
+            speed=random.uniform(0.1, 10.0),
+        )
+        pool.add_proxy(proxy)
+    return pool
+
+
+def legacy_select(pool: ProxyPool) -> ProxyModel:
+    """旧实现: 每次选取都过滤并排序整个代理池"""
+    valid_proxies = [p for p in pool.proxies.values() if p.is_valid]
+    return sorted(valid_proxies, key=lambda p: p.speed or 999)[0]
+
+
+def measure(func, pool: ProxyPool, rounds: int) -> float:
+    """返回单次调用的平均耗时(微秒)"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(pool)
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main():
+    print(f"{'代理数':>10} | {'排序选取(us)':>14} | {'索引选取(us)':>14}")
+    print("-" * 46)
+    for size in POOL_SIZES:
+        pool = build_pool(size)
+        # 排序方式在大池上非常慢,减少轮数
+        legacy_rounds = max(5, SELECTIONS * 1_000 // size)
+        legacy = measure(legacy_select, pool, legacy_rounds)
+        indexed = measure(ProxyPool.get_random_proxy, pool, SELECTIONS)
+        print(f"{size:>10} | {legacy:>14.1f} | {indexed:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+ProxyForge - 热启动基准测试
+写入指定规模的代理池快照,测量 ProxyPool.start() 从快照恢复到可以提供服务的耗时。
+冷启动耗时(抓取 + 验证)取决于代理源和网络,可查看服务日志中的"代理池启动耗时"。
+"""
+
+import asyncio
+import random
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.pool_store import PoolSnapshotStore  # noqa: E402
+from app.core.proxy_pool import ProxyPool  # noqa: E402
+from app.models import ProxyModel  # noqa: E402
+
+POOL_SIZES = [100, 1_000, 10_000]
+
+
+async def measure(size: int, path: str) -> float:
+    """返回从快照启动代理池的耗时(秒)"""
+    store = PoolSnapshotStore(path)
+    store.save(
+        ProxyModel(
+            id=str(uuid.uuid4()),
+            host=f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}",
+            port=8080,
+            speed=random.uniform(0.1, 10.0),
+        )
+        for i in range(size)
+    )
+
+    pool = ProxyPool()
+    pool.snapshot_store = store
+    start = time.perf_counter()
+    await pool.start()
+    elapsed = time.perf_counter() - start
+
+    # 只测量启动耗时,不运行后台验证和保存
+    pool.snapshot_store = None
+    await pool.stop()
+    assert pool.valid_count == size
+    return elapsed
+
+
+def main():
+    print(f"{'代理数':>10} | {'热启动耗时(s)':>14}")
+    print("-" * 30)
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in POOL_SIZES:
+            elapsed = asyncio.run(measure(size, str(Path(tmp) / f"snapshot_{size}.db")))
+            print(f"{size:>10} | {elapsed:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""测试公共配置:将项目根目录加入导入路径,提供测试用代理池"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.proxy_pool import ProxyPool  # noqa: E402
+from app.models import ProxyModel  # noqa: E402
+
+
+@pytest.fixture
+def pool() -> ProxyPool:
+    """不持久化、不自动补充的空代理池"""
+    pool = ProxyPool()
+    pool.snapshot_store = None
+    pool.dead_cache = None
+    pool._refill_threshold = 0
+    pool.rng.seed(0)
+    return pool
+
+
+def make_proxy(n: int, **fields) -> ProxyModel:
+    """构造第 n 个测试代理(有效,速度随 n 递增)"""
+    fields.setdefault("is_valid", True)
+    fields.setdefault("speed", 0.1 * n)
+    return ProxyModel(id=f"p{n}", host=f"10.0.0.{n}", port=8000 + n, **fields)
@@ -0,0 +1,152 @@
+"""熔断器与半开代理试探测试"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.circuit_breaker import CircuitBreaker
+from app.models import CircuitState
+from conftest import make_proxy
+
+
+@pytest.fixture
+def breaker() -> CircuitBreaker:
+    breaker = CircuitBreaker()
+    breaker.cooldown = 10
+    breaker.max_cooldown = 35
+    breaker.max_trips = 3
+    return breaker
+
+
+def half_open(pool, n: int = 1):
+    """向代理池添加一个熔断后冷却已结束的半开代理"""
+    pool.circuit.cooldown = 0
+    proxy = pool.add_proxy(make_proxy(n))
+    pool._trip(proxy)
+    pool._promote_due_circuits()
+    assert proxy.circuit_state == CircuitState.HALF_OPEN
+    return proxy
+
+
+def test_trip_backs_off_exponentially_until_exhausted(breaker):
+    proxy = make_proxy(1)
+    for trips, cooldown in ((1, 10), (2, 20), (3, 35)):
+        before = datetime.now()
+        assert breaker.trip(proxy)
+        assert proxy.circuit_state == CircuitState.OPEN and not proxy.is_valid
+        assert proxy.circuit_trips == trips
+        assert before + timedelta(seconds=cooldown) <= proxy.circuit_open_until
+        assert proxy.circuit_open_until <= datetime.now() + timedelta(seconds=cooldown)
+
+    assert not breaker.trip(proxy)
+    assert breaker.is_exhausted(proxy)
+    assert proxy.circuit_open_until is None
+
+
+def test_close_resets_backoff(breaker):
+    proxy = make_proxy(1)
+    breaker.trip(proxy)
+    breaker.trip(proxy)
+    breaker.close(proxy)
+    assert proxy.circuit_state == CircuitState.CLOSED and proxy.is_valid
+    assert proxy.circuit_trips == 0 and proxy.circuit_open_until is None
+
+    before = datetime.now()
+    breaker.trip(proxy)
+    assert proxy.circuit_open_until < before + timedelta(seconds=20)
+
+
+def test_promote_due_skips_stale_heap_entries(breaker):
+    """已删除、已恢复、被再次熔断(冷却时间已更新)的代理留下的冷却条目不会被转为半开"""
+    breaker.cooldown = 0
+    proxies = {n: make_proxy(n) for n in range(1, 6)}
+    for proxy in proxies.values():
+        breaker.trip(proxy)
+    breaker.close(proxies[1])  # 已恢复
+    breaker.trip(proxies[2])  # 再次熔断,第一个条目过期
+    removed = proxies.pop(3)  # 已删除
+    proxies[4].circuit_open_until = datetime.now() + timedelta(seconds=60)  # 冷却尚未结束
+    breaker.schedule(proxies[4])
+
+    promoted = breaker.promote_due(lambda pid: next((p for p in proxies.values() if p.id == pid), None))
+    assert sorted(promoted) == ["p2", "p5"]
+    assert proxies[1].circuit_state == CircuitState.CLOSED
+    assert proxies[4].circuit_state == CircuitState.OPEN
+    assert removed.circuit_state == CircuitState.OPEN
+    assert sorted(breaker.half_open_ids()) == ["p2", "p5"]
+
+    # 过期条目已弹出,再次调用不会重复转换
+    assert breaker.promote_due(lambda pid: None) == []
+
+
+def test_half_open_trial_success_closes_circuit(pool):
+    proxy = half_open(pool)
+    assert "p1" not in pool._index
+
+    pool.report_result("p1", True, 0.1)
+    assert proxy.circuit_state == CircuitState.CLOSED and proxy.is_valid
+    assert proxy.circuit_trips == 0
+    assert "p1" in pool._index
+    assert pool.circuit.half_open_count == 0
+
+
+def test_half_open_trial_failure_trips_again(pool):
+    proxy = half_open(pool)
+    pool.circuit.cooldown = 60
+
+    pool.report_result("p1", False)
+    assert proxy.circuit_state == CircuitState.OPEN and not proxy.is_valid
+    assert proxy.circuit_trips == 2
+    assert proxy.circuit_open_until > datetime.now() + timedelta(seconds=60)
+    assert "p1" not in pool._index
+    assert pool.circuit.half_open_count == 0
+
+
+def stub_probe(pool, probe_valid: bool, during_probe=None):
+    """替换验证器:探测期间执行 during_probe(模拟同时到达的实际请求结果),返回指定的探测结果"""
+
+    async def validate_proxies(proxies, concurrency=None):
+        await asyncio.sleep(0)
+        if during_probe:
+            during_probe()
+        for proxy in proxies:
+            proxy.is_valid = probe_valid
+            proxy.speed = 0.2 if probe_valid else None
+        return proxies
+
+    pool.validator.validate_proxies = validate_proxies
+
+
+@pytest.mark.parametrize("probe_valid", [True, False])
+def test_probe_result_applies_to_half_open_proxy(pool, probe_valid):
+    proxy = half_open(pool)
+    stub_probe(pool, probe_valid)
+
+    asyncio.run(pool.probe_half_open())
+    expected = CircuitState.CLOSED if probe_valid else CircuitState.OPEN
+    assert proxy.circuit_state == expected
+    assert ("p1" in pool._index) == probe_valid
+
+
+def test_probe_does_not_override_live_retrip(pool):
+    """探测期间实际请求试探失败、代理被再次熔断时,成功的探测结果不会恢复代理"""
+    proxy = half_open(pool)
+    pool.circuit.cooldown = 60
+    stub_probe(pool, True, during_probe=lambda: pool.report_result("p1", False))
+
+    asyncio.run(pool.probe_half_open())
+    assert proxy.circuit_state == CircuitState.OPEN and not proxy.is_valid
+    assert proxy.circuit_trips == 2
+    assert proxy.circuit_open_until > datetime.now()
+    assert "p1" not in pool._index
+
+
+def test_probe_does_not_override_live_recovery(pool):
+    """探测期间实际请求试探成功、代理已恢复时,失败的探测结果不会再次熔断"""
+    proxy = half_open(pool)
+    stub_probe(pool, False, during_probe=lambda: pool.report_result("p1", True, 0.1))
+
+    asyncio.run(pool.probe_half_open())
+    assert proxy.circuit_state == CircuitState.CLOSED and proxy.is_valid
+    assert "p1" in pool._index
@@ -0,0 +1,98 @@
+"""
+按代理缓存客户端测试
+
+在本地启动一个目标站点和一个支持 keep-alive 的 HTTP 代理,检查经缓存客户端发送的请求
+复用同一个客户端,且一个请求收到的 Set-Cookie 不会被带到其他请求中。
+"""
+
+import asyncio
+
+from app.core.client_cache import ProxyClientCache
+from app.core.request_handler import RequestHandler
+from app.models import ProxyModel, RequestModel
+
+HOST = "127.0.0.1"
+BODY = b'{"ok": true}'
+
+
+async def read_head(reader: asyncio.StreamReader) -> bytes:
+    """读取 HTTP 请求/响应头,连接关闭时返回空字节串"""
+    try:
+        return await reader.readuntil(b"\r\n\r\n")
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return b""
+
+
+def make_origin_handler(received_cookies: list):
+    """目标站点:记录收到的 Cookie 请求头,访问 /login 时下发会话 Cookie"""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        while head := await read_head(reader):
+            request_line, *header_lines = head.decode("latin-1").split("\r\n")
+            for line in header_lines:
+                name, _, value = line.partition(":")
+                if name.strip().lower() == "cookie":
+                    received_cookies.append(value.strip())
+            set_cookie = b"Set-Cookie: session=SECRET; Path=/\r\n" if request_line.split(" ")[1] == "/login" else b""
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n%sContent-Length: %d\r\n\r\n%s"
+                % (set_cookie, len(BODY), BODY)
+            )
+            await writer.drain()
+        writer.close()
+
+    return handle
+
+
+def make_proxy_handler(origin_port: int):
+    """HTTP 代理:同一客户端连接复用同一条上游连接"""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        upstream = None
+        while head := await read_head(reader):
+            request_line, _, rest = head.partition(b"\r\n")
+            method, url, version = request_line.split(b" ")
+            path = b"/" + url.split(b"/", 3)[3] if url.startswith(b"http://") else url
+            if upstream is None:
+                upstream = await asyncio.open_connection(HOST, origin_port)
+            up_reader, up_writer = upstream
+            up_writer.write(b" ".join((method, path, version)) + b"\r\n" + rest)
+            await up_writer.drain()
+            response = await read_head(up_reader)
+            length = int(response.lower().split(b"content-length:")[1].split(b"\r\n")[0])
+            writer.write(response + await up_reader.readexactly(length))
+            await writer.drain()
+        if upstream is not None:
+            upstream[1].close()
+        writer.close()
+
+    return handle
+
+
+def test_cached_client_does_not_leak_cookies():
+    """一个请求登录后,经同一代理(同一个缓存客户端)的其他请求不应带上它的会话 Cookie"""
+    received_cookies = []
+
+    async def run():
+        origin = await asyncio.start_server(make_origin_handler(received_cookies), HOST, 0)
+        origin_port = origin.sockets[0].getsockname()[1]
+        server = await asyncio.start_server(make_proxy_handler(origin_port), HOST, 0)
+        proxy = ProxyModel(id="p1", host=HOST, port=server.sockets[0].getsockname()[1])
+
+        handler = RequestHandler()
+        handler.clients = ProxyClientCache(max_clients=4, idle_timeout=60)
+        try:
+            login = await handler.send_request(RequestModel(url=f"http://{HOST}:{origin_port}/login"), proxy)
+            other = await handler.send_request(RequestModel(url=f"http://{HOST}:{origin_port}/other"), proxy)
+            return login, other, handler.clients.hits, handler.clients.misses
+        finally:
+            await handler.close()
+            for s in (server, origin):
+                s.close()
+                await s.wait_closed()
+
+    login, other, hits, misses = asyncio.run(run())
+    assert "session=SECRET" in login.headers.get("set-cookie", "")
+    assert other.status_code == 200
+    assert (hits, misses) == (1, 1)
+    assert received_cookies == []
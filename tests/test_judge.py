@@ -0,0 +1,176 @@
+"""
+代理判定服务与匿名度判定测试
+
+在本地启动挂载 app/api/judge.py 的判定服务,以及一个可按模式添加转发请求头的 HTTP 代理,
+通过 ProxyValidator.validate_proxy 验证透明、匿名、高匿代理的判定结果,
+以及代理返回非判定服务响应(劫持页面)时视为无效。
+"""
+
+import asyncio
+import socket
+
+import pytest
+import uvicorn
+from fastapi import FastAPI
+
+from app.api import judge
+from app.core.proxy_validator import ProxyValidator, grade_anonymity
+from app.models import AnonymityLevel, ProxyModel
+
+HOST = "127.0.0.1"
+
+# 代理模式 -> 转发时添加的请求头
+FORWARD_HEADERS = {
+    "transparent": ["Via: 1.1 test-proxy", "X-Forwarded-For: {client}"],
+    "anonymous": ["Via: 1.1 test-proxy"],
+    "elite": [],
+}
+HIJACK_RESPONSES = {
+    "hijack_html": (b"text/html", b"<html><body>Welcome to free WiFi</body></html>"),
+    "hijack_json": (b"application/json", b'{"ok": true}'),
+}
+
+
+def bind_socket() -> socket.socket:
+    """绑定本地随机端口"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((HOST, 0))
+    return sock
+
+
+async def read_head(reader: asyncio.StreamReader) -> bytes:
+    """读取 HTTP 请求头,连接关闭时返回空字节串"""
+    try:
+        return await reader.readuntil(b"\r\n\r\n")
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return b""
+
+
+def make_proxy_handler(mode: str, judge_port: int):
+    """
+    创建本地 HTTP 代理的连接处理函数
+
+    Args:
+        mode: transparent/anonymous/elite 按模式添加请求头后转发到判定服务;
+            hijack_* 不转发,直接返回固定的 200 响应
+        judge_port: 判定服务端口
+    """
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        head = await read_head(reader)
+        if not head:
+            writer.close()
+            return
+
+        if mode in HIJACK_RESPONSES:
+            content_type, body = HIJACK_RESPONSES[mode]
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: %s\r\nContent-Length: %d\r\nConnection: close\r\n\r\n%s"
+                % (content_type, len(body), body)
+            )
+            await writer.drain()
+            writer.close()
+            return
+
+        request_line, *header_lines = head.decode("latin-1").rstrip("\r\n").split("\r\n")
+        method, url, version = request_line.split(" ")
+        path = "/" + url.split("/", 3)[3] if url.startswith("http://") else url
+        headers = [
+            line for line in header_lines
+            if not line.lower().startswith(("connection:", "proxy-", "keep-alive:"))
+        ]
+        client_ip = writer.get_extra_info("peername")[0]
+        headers += [header.format(client=client_ip) for header in FORWARD_HEADERS[mode]]
+        headers.append("Connection: close")
+
+        up_reader, up_writer = await asyncio.open_connection(HOST, judge_port)
+        up_writer.write(("\r\n".join([f"{method} {path} {version}", *headers]) + "\r\n\r\n").encode("latin-1"))
+        await up_writer.drain()
+        writer.write(await up_reader.read())
+        await writer.drain()
+        up_writer.close()
+        writer.close()
+
+    return handle
+
+
+async def run_validation(modes):
+    """
+    启动判定服务和各模式的代理,依次验证
+
+    Args:
+        modes: 代理模式列表
+
+    Returns:
+        (模式 -> 验证后的代理, 验证器)
+    """
+    app = FastAPI()
+    app.include_router(judge.router)
+    judge_sock = bind_socket()
+    judge_port = judge_sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, log_level="critical", lifespan="off"))
+    serve_task = asyncio.create_task(server.serve(sockets=[judge_sock]))
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    proxy_servers = []
+    try:
+        validator = ProxyValidator()
+        validator.judge_url = validator.probe_url = f"http://{HOST}:{judge_port}/api/judge"
+        validator.prescreen_enabled = False
+        validator._real_ips = None
+
+        results = {}
+        for mode in modes:
+            proxy_server = await asyncio.start_server(make_proxy_handler(mode, judge_port), HOST, 0)
+            proxy_servers.append(proxy_server)
+            port = proxy_server.sockets[0].getsockname()[1]
+            results[mode] = await validator.validate_proxy(ProxyModel(host=HOST, port=port))
+        return results, validator
+    finally:
+        for proxy_server in proxy_servers:
+            proxy_server.close()
+            await proxy_server.wait_closed()
+        server.should_exit = True
+        await serve_task
+
+
+def test_validate_proxy_grades_anonymity():
+    """经本地代理请求判定服务,按添加的请求头判定匿名度"""
+    results, validator = asyncio.run(run_validation(["transparent", "anonymous", "elite"]))
+
+    # 直连判定服务得到的本机 IP
+    assert validator._real_ips == {HOST}
+    for mode, level in (
+        ("transparent", AnonymityLevel.TRANSPARENT),
+        ("anonymous", AnonymityLevel.ANONYMOUS),
+        ("elite", AnonymityLevel.ELITE),
+    ):
+        proxy = results[mode]
+        assert proxy.is_valid, mode
+        assert proxy.anonymity == level.value, mode
+        assert proxy.speed is not None
+
+
+@pytest.mark.parametrize("mode", sorted(HIJACK_RESPONSES))
+def test_validate_proxy_rejects_non_judge_response(mode):
+    """代理返回 200 但不是判定服务的响应时视为无效"""
+    results, _ = asyncio.run(run_validation([mode]))
+
+    assert not results[mode].is_valid
+
+
+@pytest.mark.parametrize(
+    "payload, level",
+    [
+        ({"origin": "198.51.100.9", "headers": {"Host": "judge"}}, AnonymityLevel.ELITE),
+        ({"origin": "198.51.100.9", "headers": {"Via": "1.1 squid"}}, AnonymityLevel.ANONYMOUS),
+        ({"origin": "198.51.100.9", "headers": {"Forwarded": 'for="203.0.113.7:5000"'}}, AnonymityLevel.TRANSPARENT),
+        # httpbin 格式:origin 为 "客户端, 代理"
+        ({"origin": "203.0.113.7, 198.51.100.9", "headers": {}}, AnonymityLevel.TRANSPARENT),
+    ],
+)
+def test_grade_anonymity(payload, level):
+    """按回显的来源和请求头判定匿名度"""
+    assert grade_anonymity(payload, {"203.0.113.7"}) == level
@@ -0,0 +1,66 @@
+"""代理池快照增量同步测试"""
+
+import asyncio
+
+from app.core.pool_store import PoolSnapshotStore
+from conftest import make_proxy
+
+
+def test_save_writes_only_changed_rows(tmp_path):
+    store = PoolSnapshotStore(str(tmp_path / "pool.db"))
+    proxies = [make_proxy(n) for n in (1, 2, 3)]
+    assert store.save(proxies) == 3
+    assert store.save(proxies) is None
+
+    proxies[0].success_count += 1
+    assert store.save(proxies) == 1
+    version, full, changed, removed = store.changes(store.version() - 1)
+    assert not full
+    assert [proxy.id for proxy in changed] == ["p1"]
+    assert removed == []
+
+
+def test_changes_report_removed_and_readded_proxies(tmp_path):
+    store = PoolSnapshotStore(str(tmp_path / "pool.db"))
+    store.save([make_proxy(n) for n in (1, 2, 3)])
+    base = store.version()
+
+    store.save([make_proxy(n) for n in (1, 3)])
+    _, full, changed, removed = store.changes(base)
+    assert not full and changed == [] and removed == ["p2"]
+
+    store.save([make_proxy(n) for n in (1, 2, 3)])
+    _, _, changed, removed = store.changes(base)
+    assert [proxy.id for proxy in changed] == ["p2"] and removed == []
+
+
+def test_new_writer_and_stale_reader_get_full_snapshot(tmp_path):
+    path = str(tmp_path / "pool.db")
+    PoolSnapshotStore(path).save([make_proxy(1), make_proxy(2)])
+    store = PoolSnapshotStore(path)
+    assert store.changes(0)[1]
+
+    # 接管的维护进程第一次保存整体替换,没有留下删除记录
+    store.save([make_proxy(3)])
+    version, full, changed, removed = store.changes(1)
+    assert full and version == 2
+    assert [proxy.id for proxy in changed] == ["p3"] and removed == []
+
+
+def test_follower_reloads_only_changed_proxies(pool, tmp_path):
+    """只读进程只加载版本号变化后写入的代理,删除的代理从代理池移除"""
+    path = str(tmp_path / "pool.db")
+    maintainer = PoolSnapshotStore(path)
+    proxies = {n: make_proxy(n) for n in (1, 2, 3)}
+    maintainer.save(proxies.values())
+    pool.snapshot_store = PoolSnapshotStore(path)
+
+    assert asyncio.run(pool._reload_shared_snapshot()) == 3
+    assert asyncio.run(pool._reload_shared_snapshot()) == 0
+
+    proxies[1].success_count += 1
+    del proxies[2]
+    maintainer.save(proxies.values())
+    assert asyncio.run(pool._reload_shared_snapshot()) == 1
+    assert set(pool.proxies) == {"p1", "p3"}
+    assert pool.proxies["p1"].success_count == 1
@@ -0,0 +1,119 @@
+"""代理选择索引测试:与按字典维护的参考实现对比"""
+
+import random
+from collections import Counter
+
+import pytest
+
+from app.core.proxy_index import ProxyIndex
+
+
+class FixedRandom:
+    """random() 依次返回给定值的随机数生成器"""
+
+    def __init__(self, *values: float):
+        self.values = list(values)
+
+    def random(self) -> float:
+        return self.values.pop(0)
+
+
+def assert_matches(index: ProxyIndex, ranks: dict, weights: dict):
+    """检查索引与参考实现(代理 ID -> 分值/权重)一致"""
+    assert len(index) == len(ranks)
+    assert sorted(index.ids()) == sorted(ranks)
+    for proxy_id, rank in ranks.items():
+        assert proxy_id in index
+        assert index.rank_of(proxy_id) == rank
+
+    best = index.best()
+    if ranks:
+        assert ranks[best] == min(ranks.values())
+    else:
+        assert best is None
+
+    # 每个前缀和都与槽位顺序下的权重累加一致
+    slot_weights = [weights[proxy_id] for proxy_id in index.ids()]
+    for n in range(len(slot_weights) + 1):
+        assert index._prefix(n) == pytest.approx(sum(slot_weights[:n]), abs=1e-9)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_operations_match_reference(seed):
+    """随机增删改(含重复更新触发的堆重建)后,成员、分值、最优代理和权重前缀和都与参考实现一致"""
+    rng = random.Random(seed)
+    index = ProxyIndex()
+    ranks, weights = {}, {}
+    for step in range(2000):
+        proxy_id = f"p{rng.randrange(40)}"
+        op = rng.random()
+        if op < 0.6:
+            # 分值取值较少,经常出现分值不变、只改权重的更新
+            rank = rng.choice([0.1, 0.5, 1.0, 2.0, rng.random()])
+            weight = rng.choice([0.0, 1.0, rng.random() * 10])
+            index.update(proxy_id, rank, weight)
+            ranks[proxy_id], weights[proxy_id] = rank, weight
+        elif op < 0.98:
+            assert index.discard(proxy_id) == (proxy_id in ranks)
+            ranks.pop(proxy_id, None)
+            weights.pop(proxy_id, None)
+        else:
+            index.clear()
+            ranks.clear()
+            weights.clear()
+        if step % 50 == 0:
+            assert_matches(index, ranks, weights)
+    assert_matches(index, ranks, weights)
+    assert len(index._heap) <= 2 * len(index) + 65
+
+
+def test_best_skips_stale_heap_entries():
+    index = ProxyIndex()
+    index.update("a", 1.0)
+    index.update("b", 2.0)
+    index.update("a", 3.0)
+    assert index.best() == "b"
+    index.discard("b")
+    assert index.best() == "a"
+    index.discard("a")
+    assert index.best() is None
+
+
+def test_weighted_choice_maps_target_to_slot():
+    """目标值落在某个槽位的权重区间内时选中该槽位,零权重槽位不会被选中"""
+    index = ProxyIndex()
+    for proxy_id, weight in (("a", 1.0), ("b", 0.0), ("c", 2.0), ("d", 3.0)):
+        index.update(proxy_id, 0.0, weight)
+
+    picks = [index.weighted_choice(FixedRandom(x)) for x in (0.0, 0.16, 0.17, 0.49, 0.51, 0.99)]
+    assert picks == ["a", "a", "c", "c", "d", "d"]
+
+
+def test_weighted_choice_none_without_weight():
+    index = ProxyIndex()
+    assert index.weighted_choice() is None
+    index.update("a", 0.0, 0.0)
+    assert index.weighted_choice() is None
+
+
+def test_weighted_distribution_after_discard_and_update():
+    """删除(末尾槽位填补空缺)和改权重后,选取频率与当前权重成比例"""
+    index = ProxyIndex()
+    for n in range(10):
+        index.update(f"p{n}", float(n), 1.0)
+    for n in (0, 4, 7):
+        index.discard(f"p{n}")
+    index.update("p2", 2.0, 5.0)
+    index.update("p9", 9.0, 0.0)
+    index.update("p5", 0.5, 3.0)
+    weights = {"p1": 1, "p2": 5, "p3": 1, "p5": 3, "p6": 1, "p8": 1, "p9": 0}
+    assert index._prefix(len(index)) == pytest.approx(sum(weights.values()))
+
+    rng = random.Random(0)
+    samples = 60000
+    counts = Counter(index.weighted_choice(rng) for _ in range(samples))
+    total = sum(weights.values())
+    assert "p9" not in counts
+    for proxy_id, weight in weights.items():
+        if weight:
+            assert counts[proxy_id] / samples == pytest.approx(weight / total, abs=0.01)
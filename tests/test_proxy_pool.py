@@ -0,0 +1,165 @@
+"""代理池选择测试"""
+
+import asyncio
+
+import pytest
+
+from app.core.attribute_index import make_filters
+from app.core.negative_cache import DeadProxyCache
+from app.core.proxy_pool import STRATEGIES, ProxyPoolSaturatedError, SelectionStrategy
+from app.core.request_handler import RequestHandler
+from app.models import CircuitState, RequestModel, ResponseModel
+from conftest import make_proxy
+
+
+def test_acquire_raises_when_all_proxies_saturated(pool):
+    """所有代理都达到并发上限时抛出异常,与空池(返回 None)区分"""
+    pool.max_in_flight = 1
+    pool.add_proxy(make_proxy(1))
+    pool.add_proxy(make_proxy(2))
+
+    assert pool.acquire_proxy() is not None
+    assert pool.acquire_proxy() is not None
+    with pytest.raises(ProxyPoolSaturatedError):
+        pool.acquire_proxy()
+
+    pool.release_proxy("p1")
+    assert pool.acquire_proxy().id == "p1"
+
+
+def test_acquire_returns_none_for_empty_pool(pool):
+    assert pool.acquire_proxy() is None
+
+
+def test_saturated_pool_never_falls_back_to_direct_request(pool):
+    """代理都达到并发上限时,请求失败而不是不经代理直接发送"""
+    pool.max_in_flight = 1
+    pool.add_proxy(make_proxy(1))
+    pool.acquire_proxy()
+
+    sent = []
+
+    async def send_request(request, proxy=None):
+        sent.append(proxy)
+        return ResponseModel(status_code=200, headers={}, content="", elapsed=0.01)
+
+    handler = RequestHandler()
+    handler.clients = None
+    handler.send_request = send_request
+    with pytest.raises(ProxyPoolSaturatedError):
+        asyncio.run(handler.send_request_with_retry(
+            RequestModel(url="http://example.com/"),
+            get_proxy_func=pool.acquire_proxy,
+            mark_invalid_func=pool.mark_proxy_invalid,
+            release_proxy_func=pool.release_proxy,
+        ))
+    assert sent == []
+
+
+def test_least_in_flight_ignores_busy_proxies_outside_filter(pool):
+    """过滤条件之外的代理在途请求再多,也不影响选择匹配的空闲代理"""
+    for n in (1, 2):
+        pool.add_proxy(make_proxy(n, country="US"))
+    for n in (3, 4, 5):
+        pool.add_proxy(make_proxy(n, country="DE"))
+        pool.acquire_proxy(filters=make_filters(country="DE"))
+
+    proxy = pool.get_random_proxy("least_in_flight", filters=make_filters(country="US"))
+    assert proxy is not None and proxy.id in {"p1", "p2"}
+
+
+def test_least_in_flight_ignores_busy_tripped_proxy(pool):
+    """在途请求期间被熔断的代理不在索引中,不影响选择空闲代理"""
+    for n in (1, 2, 3):
+        pool.add_proxy(make_proxy(n))
+    tripped = pool.acquire_proxy("fastest")
+    pool._trip(tripped)
+    pool.acquire_proxy("fastest")
+
+    proxy = pool.get_random_proxy("least_in_flight")
+    assert proxy is not None and proxy.id != tripped.id
+    assert pool.in_flight(proxy.id) == 0
+
+
+def test_strategy_without_select_cannot_be_instantiated():
+    class Incomplete(SelectionStrategy):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+@pytest.mark.parametrize("name", sorted(STRATEGIES))
+def test_builtin_strategies_select_valid_proxy(pool, name):
+    for n in (1, 2, 3):
+        pool.add_proxy(make_proxy(n))
+
+    proxy = pool.get_random_proxy(name)
+    assert proxy is not None and proxy.is_valid
+
+
+def test_dead_cache_hits_do_not_use_fetch_budget(pool):
+    """最近失效的代理在获取时跳过,不占用本轮获取数量"""
+    pool.dead_cache = DeadProxyCache()
+    candidates = [make_proxy(n, is_valid=False, speed=None) for n in range(1, 251)]
+    validated = []
+
+    async def fetch_source(source):
+        return [proxy.model_copy() for proxy in candidates]
+
+    async def validate_proxy(proxy, prescreen=True):
+        validated.append(proxy.canonical_key)
+        proxy.is_valid = False
+        return proxy
+
+    pool.fetcher.fetch_source = fetch_source
+    pool.fetcher.sources.select = lambda needed: ["stub"]
+    pool.validator.prescreen_enabled = False
+    pool.validator.validate_proxy = validate_proxy
+
+    rounds = []
+    for _ in range(2):
+        validated.clear()
+        asyncio.run(pool._fill_pool(target=1000, fetch_count=100))
+        rounds.append(set(validated))
+
+    assert len(rounds[0]) == 100
+    assert len(rounds[1]) == 100
+    assert not rounds[0] & rounds[1]
+
+
+def test_status_code_rejection_only_penalizes_host(pool):
+    """目标站点以重试状态码拒绝时只影响该站点,不改变全局评分和熔断状态"""
+    proxy = pool.add_proxy(make_proxy(1))
+    pool._trip(proxy)
+    pool.circuit.close(proxy)
+    proxy.circuit_state = CircuitState.HALF_OPEN
+    pool.circuit.schedule(proxy)
+    success_rate = proxy.success_rate
+    host = "example.com"
+
+    async def send_request(request, proxy=None):
+        return ResponseModel(status_code=429, headers={}, content="", elapsed=0.05)
+
+    handler = RequestHandler()
+    handler.clients = None
+    handler.send_request = send_request
+    with pytest.raises(Exception, match="请求失败"):
+        asyncio.run(handler.send_request_with_retry(
+            RequestModel(
+                url=f"http://{host}/", retry_on_status_codes=[429], max_proxy_switches=1, max_retries_per_proxy=2
+            ),
+            get_proxy_func=lambda: pool.proxies["p1"],
+            mark_invalid_func=pool.mark_proxy_invalid,
+            report_result_func=lambda proxy_id, success, latency, timings=None, size=0: pool.report_result(
+                proxy_id, success, latency, host, timings, size
+            ),
+            ban_proxy_func=lambda proxy_id: pool.ban_proxy_for_host(proxy_id, host),
+            reject_proxy_func=lambda proxy_id, latency: pool.report_host_rejection(proxy_id, host, latency),
+        ))
+
+    assert proxy.circuit_state == CircuitState.HALF_OPEN
+    assert proxy.success_rate == success_rate
+    assert proxy.failure_count == 0
+    assert pool.host_scores.is_banned("p1", host)
+    assert pool.host_scores.get("p1", host).success_rate < 1.0
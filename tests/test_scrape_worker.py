@@ -0,0 +1,72 @@
+"""代理源抓取子进程测试"""
+
+import asyncio
+import subprocess
+import sys
+
+import pytest
+
+from app.scrape_worker import ScrapeProcessSupervisor
+
+
+class ScriptSupervisor(ScrapeProcessSupervisor):
+    """用指定的 Python 代码代替实际抓取的监管器"""
+
+    def __init__(self, code: str):
+        super().__init__(max_workers=1)
+        self.code = code
+
+    def _spawn(self, source: str) -> subprocess.Popen:
+        return subprocess.Popen(
+            [sys.executable, "-c", self.code], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE
+        )
+
+
+def scrape(supervisor: ScrapeProcessSupervisor, timeout: float = 10):
+    try:
+        return asyncio.run(supervisor.scrape("stub", timeout))
+    finally:
+        supervisor.close()
+
+
+def test_scrape_decodes_rows():
+    code = "import sys; sys.stdout.buffer.write(b'1[[\"1.2.3.4\",8080,\"http\",\"US\",null,0.5]]')"
+    assert scrape(ScriptSupervisor(code)) == [("1.2.3.4", 8080, "http", "US", None, 0.5)]
+
+
+def test_scrape_reports_worker_error():
+    code = "import sys; sys.stdout.buffer.write(b'0KeyError: stub')"
+    with pytest.raises(RuntimeError, match="KeyError: stub"):
+        scrape(ScriptSupervisor(code))
+
+
+def test_scrape_reports_crash():
+    with pytest.raises(RuntimeError, match="exitcode=3"):
+        scrape(ScriptSupervisor("import os; os._exit(3)"))
+
+
+def test_scrape_timeout_kills_worker():
+    supervisor = ScriptSupervisor("import time; time.sleep(30)")
+    with pytest.raises(TimeoutError):
+        scrape(supervisor, timeout=0.5)
+    assert not supervisor._processes
+
+
+def test_worker_does_not_import_app_modules():
+    """抓取子进程只导入 app 包本身和 app.scrape_worker,不会初始化代理池和日志"""
+    pytest.importorskip("freeproxy")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "app.scrape_worker", "NoSuchProxiedSession"],
+        cwd=ScrapeProcessSupervisor.root,
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        timeout=60,
+    )
+    imported = {
+        line.rsplit("|", 1)[-1].strip()
+        for line in result.stderr.decode(errors="replace").splitlines()
+        if line.startswith("import time:")
+    }
+    assert {name for name in imported if name == "app" or name.startswith("app.")} == {"app"}
+    assert "loguru" not in imported
+    assert result.stdout.startswith(b"0")